@@ -23,7 +23,15 @@ setup(
         'qtpy',
         'pandas',
     ],
-    package_data={'undulator': ['VERSION']},
+    entry_points={
+        'console_scripts': [
+            'undulator-test = undulator.testrunner:main',
+        ],
+    },
+    extras_require={
+        'simulation': ['caproto'],
+    },
+    package_data={'undulator': ['VERSION', 'undulator.db']},
     include_package_data=True,
     test_suite='nose.collector',
     tests_require=['nose'],
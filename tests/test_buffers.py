@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the acquisition and display buffers."""
+
+import unittest
+
+import numpy as np
+
+from undulator.data.acquisition import AcquisitionBuffer
+from undulator.data.ringbuffer import TimeRingBuffer
+
+
+class TestAcquisitionBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = AcquisitionBuffer(['t [s]', 'x [mm]'], chunk_size=4)
+        for _i in range(10):
+            self.buffer.append((_i, 10*_i))
+
+    def test_append(self):
+        self.assertEqual(len(self.buffer), 10)
+        self.assertEqual(self.buffer.nstored, 10)
+        np.testing.assert_array_equal(
+            self.buffer.column('x [mm]'), 10*np.arange(10))
+        self.assertEqual(self.buffer.to_array().shape, (10, 2))
+
+    def test_take(self):
+        _parts = self.buffer.take()
+        self.assertEqual([len(_part) for _part in _parts], [4, 4])
+        self.assertEqual(self.buffer.nstored, 2)
+        self.assertEqual(len(self.buffer.complete_chunks()), 0)
+        _parts = self.buffer.take(partial=True)
+        np.testing.assert_array_equal(_parts[0][:, 0], [8, 9])
+        self.assertEqual(self.buffer.nstored, 0)
+        self.assertEqual(len(self.buffer), 10)
+        self.buffer.append((10, 100))
+        np.testing.assert_array_equal(self.buffer.column('t [s]'), [10])
+
+    def test_clear(self):
+        self.buffer.clear()
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.to_array().shape, (0, 2))
+
+
+class TestTimeRingBuffer(unittest.TestCase):
+
+    def test_empty(self):
+        _buffer = TimeRingBuffer(2)
+        self.assertTrue(np.isnan(_buffer.first_time()))
+        self.assertTrue(np.isnan(_buffer.last_time()))
+        self.assertTrue(np.all(np.isnan(_buffer.interp([1.0]))))
+
+    def test_wrap(self):
+        _buffer = TimeRingBuffer(1, size=5)
+        for _i in range(12):
+            _buffer.append(_i, (10*_i,))
+        self.assertEqual(len(_buffer), 5)
+        self.assertEqual(_buffer.first_time(), 7)
+        self.assertEqual(_buffer.last_time(), 11)
+        _times, _values = _buffer.get()
+        np.testing.assert_array_equal(_times, [7, 8, 9, 10, 11])
+        np.testing.assert_array_equal(_values[:, 0], 10*_times)
+
+    def test_lookups(self):
+        _buffer = TimeRingBuffer(1)
+        for _i in range(5):
+            _buffer.append(_i, (10*_i,))
+        np.testing.assert_array_equal(
+            _buffer.asof([-1, 0, 1.5, 9])[:, 0], [np.nan, 0, 10, 40])
+        np.testing.assert_array_equal(
+            _buffer.interp([-1, 0, 1.5, 9])[:, 0], [np.nan, 0, 15, 40])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the plot decimation."""
+
+import unittest
+
+import numpy as np
+
+from undulator.data import decimation
+
+
+class TestMinMaxIndices(unittest.TestCase):
+
+    def test_short(self):
+        np.testing.assert_array_equal(
+            decimation.minmax_indices(np.arange(10.), 5), np.arange(10))
+
+    def test_envelope(self):
+        _y = np.sin(np.linspace(0, 20, 10001))
+        _idx = decimation.minmax_indices(_y, 100)
+        self.assertTrue(np.all(np.diff(_idx) >= 0))
+        self.assertEqual(_idx[0], 0)
+        self.assertEqual(_idx[-1], len(_y) - 1)
+        self.assertEqual(_y[_idx].min(), _y.min())
+        self.assertEqual(_y[_idx].max(), _y.max())
+
+    def test_nan(self):
+        _y = np.arange(100.) % 7
+        _y[5] = np.nan
+        _y[10:20] = np.nan
+        _y[97] = np.nan
+        _idx = decimation.minmax_indices(_y, 10)
+        # a bin with a gap keeps its finite min and max
+        self.assertIn(0, _idx[1:3])
+        self.assertIn(6, _idx[1:3])
+        # a bin without finite values keeps its first index
+        np.testing.assert_array_equal(_idx[3:5], [10, 10])
+        self.assertTrue(np.all(np.isfinite(_y[_idx[5:-1]])))
+
+
+class TestMinMaxDecimate(unittest.TestCase):
+
+    def test_visible_range(self):
+        _x = np.arange(100000.)
+        _y = np.cos(_x/100)
+        _xd, _yd = decimation.minmax_decimate(_x, _y, 1000, 2000, nbins=50)
+        self.assertLessEqual(len(_xd), 2*50 + 4)
+        self.assertLessEqual(_xd[0], 1000)
+        self.assertGreaterEqual(_xd[-1], 2000)
+        self.assertLessEqual(_xd[-1], 2001)
+
+    def test_empty(self):
+        _xd, _yd = decimation.minmax_decimate([], [])
+        self.assertEqual(len(_xd), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the log cache."""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from undulator.data.logindex import LogCache
+
+
+class MappedLog(object):
+    """Log without memory_usage, as a memory mapped binary log."""
+
+
+class TestLogCache(unittest.TestCase):
+
+    def test_memory_limit(self):
+        _cache = LogCache(max_bytes=3*8000)
+        for _i in range(5):
+            _cache.put(_i, pd.DataFrame({'x': np.zeros(1000)}))
+        self.assertIsNone(_cache.get(0))
+        self.assertIsNotNone(_cache.get(4))
+        self.assertLessEqual(_cache.nbytes, _cache.max_bytes)
+
+    def test_entries_limit(self):
+        _cache = LogCache(max_entries=3)
+        _logs = [MappedLog() for _ in range(5)]
+        for _i, _log in enumerate(_logs):
+            _cache.put(_i, _log)
+        self.assertIsNone(_cache.get(1))
+        self.assertIs(_cache.get(2), _logs[2])
+        # the recently used log is kept
+        _cache.put(5, MappedLog())
+        self.assertIs(_cache.get(2), _logs[2])
+        self.assertIsNone(_cache.get(3))
+
+    def test_clear(self):
+        _cache = LogCache()
+        _cache.put(0, MappedLog())
+        _cache.clear()
+        self.assertIsNone(_cache.get(0))
+        self.assertEqual(_cache.nbytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
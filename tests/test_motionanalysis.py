@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the step response segmentation."""
+
+import unittest
+
+import numpy as np
+
+from undulator.data import motionanalysis
+
+
+def step_profile(targets, x0=0.0, dwell=5.0, speed=1.0, dt=0.01):
+    """Returns the times and positions of an axis moving to each target at
+    constant speed and resting dwell seconds at each one."""
+    _t, _x = [0.0], [x0]
+    for _target in targets:
+        _distance = abs(_target - _x[-1])
+        _n = int(round(_distance/speed/dt))
+        for _i in range(1, _n + 1):
+            _t.append(_t[-1] + dt)
+            _x.append(_x[-1] + np.sign(_target - _x[-1])*speed*dt)
+        _x[-1] = _target
+        for _i in range(int(round(dwell/dt))):
+            _t.append(_t[-1] + dt)
+            _x.append(_target)
+    return np.array(_t), np.array(_x)
+
+
+def step_events(targets, t_step=10.0):
+    """Returns the events of a discrete test with t_step seconds per
+    step."""
+    _events = []
+    for _i, _target in enumerate(targets):
+        _t = _i*t_step
+        _step = 'pos {0:g}: '.format(_target)
+        for _axis in motionanalysis.AXIS_NAMES:
+            _events.append((_t, _step + 'MovePos' + _axis + ' readback'))
+        _events.append((_t + 0.1, _step + 'EnMove put complete'))
+        _events.append((_t + 0.2, _step + 'MoveStatus on'))
+        _events.append((_t + 2.0, _step + 'MoveStatus off'))
+    return _events
+
+
+class TestSegmentsFromMotion(unittest.TestCase):
+
+    def test_moves(self):
+        _t, _x = step_profile([1, -1, 0])
+        _seg = motionanalysis.segments_from_motion(_t, _x, [1, -1, 0])
+        np.testing.assert_allclose(_seg['target'], [1, -1, 0])
+        np.testing.assert_allclose(_seg['t_start'], [0.01, 6.01, 13.01],
+                                   atol=0.02)
+        np.testing.assert_allclose(_seg['t_stop'], [1.0, 8.0, 14.0],
+                                   atol=0.02)
+
+    def test_target_without_move(self):
+        _t, _x = step_profile([0, 5, 0])
+        _seg = motionanalysis.segments_from_motion(_t, _x, [0, 5, 0])
+        np.testing.assert_allclose(_seg['target'], [5, 0])
+        _result = motionanalysis.analyze(
+            _t, _x, np.zeros_like(_x), _seg)
+        np.testing.assert_allclose(_result['steady_state_error'], 0,
+                                   atol=1e-9)
+
+    def test_no_targets(self):
+        _t, _x = step_profile([1])
+        _seg = motionanalysis.segments_from_motion(_t, _x, [])
+        self.assertEqual(len(_seg['target']), 0)
+
+
+class TestSegmentsFromEvents(unittest.TestCase):
+
+    def test_steps(self):
+        _seg = motionanalysis.segments_from_events(step_events([1, -1, 0]))
+        np.testing.assert_allclose(_seg['target'], [1, -1, 0])
+        np.testing.assert_allclose(_seg['t_start'], [0, 10, 20])
+        np.testing.assert_allclose(_seg['t_move'], [0.1, 10.1, 20.1])
+        np.testing.assert_allclose(_seg['t_stop'], [2, 12, 22])
+
+    def test_same_position_steps(self):
+        _seg = motionanalysis.segments_from_events(step_events([1, 1]))
+        np.testing.assert_allclose(_seg['target'], [1, 1])
+        np.testing.assert_allclose(_seg['t_move'], [0.1, 10.1])
+        np.testing.assert_allclose(_seg['t_stop'], [2, 12])
+
+    def test_steps_in_position(self):
+        _events = step_events([1])
+        for _t in (10, 20):
+            _events += [(_t, 'pos 1: MovePos' + _axis + ' readback')
+                        for _axis in motionanalysis.AXIS_NAMES]
+            _events.append((_t + 0.01, 'pos 1: in position'))
+        _seg = motionanalysis.segments_from_events(_events)
+        np.testing.assert_allclose(_seg['t_start'], [0, 10, 20])
+        np.testing.assert_allclose(_seg['t_stop'], [2, 10.01, 20.01])
+        self.assertTrue(np.all(np.isnan(_seg['t_move'][1:])))
+
+    def test_timeout(self):
+        _events = step_events([1])[:-1]
+        _events.append((300.2, 'pos 1: MoveStatus off timeout'))
+        _seg = motionanalysis.segments_from_events(_events)
+        self.assertTrue(np.isnan(_seg['t_stop'][0]))
+        self.assertEqual(motionanalysis.parse_target('Test aborted'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
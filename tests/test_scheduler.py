@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the periodic scheduler."""
+
+import time
+import threading
+import unittest
+
+try:
+    import epics  # noqa: F401
+except ImportError:
+    epics = None
+
+
+@unittest.skipIf(epics is None, 'pyepics is not installed')
+class TestPeriodicScheduler(unittest.TestCase):
+
+    def setUp(self):
+        from undulator.devices.scheduler import PeriodicScheduler
+        self.scheduler_class = PeriodicScheduler
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            self.scheduler_class(0.01, policy='wait')
+
+    def test_no_drift(self):
+        _scheduler = self.scheduler_class(0.01, policy='catchup')
+        _scheduler.start()
+        for _ in range(20):
+            _scheduler.wait()
+            time.sleep(0.005)
+        self.assertAlmostEqual(
+            _scheduler.next - _scheduler.t_start, 0.2, places=9)
+        self.assertEqual(_scheduler.ticks, 20)
+
+    def test_skip(self):
+        _scheduler = self.scheduler_class(0.01, policy='skip')
+        _scheduler.start()
+        _scheduler.wait()
+        time.sleep(0.055)
+        _scheduler.wait()
+        self.assertGreaterEqual(_scheduler.missed, 4)
+        self.assertGreater(_scheduler.next, time.monotonic())
+
+    def test_catchup(self):
+        _scheduler = self.scheduler_class(0.01, policy='catchup')
+        _scheduler.start()
+        _scheduler.wait()
+        time.sleep(0.055)
+        _t = time.monotonic()
+        for _ in range(5):
+            _scheduler.wait()
+        self.assertLess(time.monotonic() - _t, 0.01)
+        self.assertEqual(_scheduler.missed, 0)
+
+    def test_event(self):
+        _scheduler = self.scheduler_class(10)
+        _scheduler.start()
+        _scheduler.wait()
+        _event = threading.Event()
+        _event.set()
+        self.assertIsNone(_scheduler.wait(_event))
+        self.assertEqual(_scheduler.ticks, 1)
+
+    def test_stats(self):
+        _scheduler = self.scheduler_class(0.01)
+        self.assertEqual(_scheduler.stats()['ticks'], 0)
+        _scheduler.start()
+        for _ in range(5):
+            _scheduler.wait()
+        _stats = _scheduler.stats()
+        self.assertEqual(_stats['ticks'], 5)
+        self.assertAlmostEqual(_stats['target_rate'], 100)
+        self.assertIn('rate', _scheduler.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
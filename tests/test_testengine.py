@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the test engine with stub channels and display."""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+try:
+    import epics  # noqa: F401
+except ImportError:
+    epics = None
+
+
+class StubPV(object):
+    """PV with a fixed value, delivered to the monitor callbacks."""
+
+    def __init__(self, value=0.0):
+        self.value = value
+        self.connected = True
+        self.callbacks = {}
+
+    def wait_for_connection(self, timeout=None):
+        return True
+
+    def add_callback(self, callback, run_now=False, with_ctrlvars=False):
+        _index = len(self.callbacks) + 1
+        self.callbacks[_index] = callback
+        if run_now:
+            callback(value=self.value, timestamp=time.time())
+        return _index
+
+    def remove_callback(self, index):
+        self.callbacks.pop(index, None)
+
+    def put(self, value, wait=False, use_complete=False, callback=None):
+        self.value = value
+        for _callback in list(self.callbacks.values()):
+            _callback(value=value, timestamp=time.time())
+        if callback is not None:
+            callback(pvname='stub')
+
+
+class StubAxis(dict):
+    """Axis that never moves."""
+
+    def __init__(self, name):
+        super().__init__(MovePos=StubPV(0.0), Moving=StubPV(0))
+        self.name = name
+
+
+class StubUndulator(object):
+    """Undulator whose first axis has the move flag set."""
+
+    def __init__(self, axis=None):
+        self.axis = object() if axis is None else axis
+
+    def moving_axis(self):
+        return self.axis
+
+
+def make_stub_display():
+    """Returns a running thread named as the display reading thread, with
+    constant readings."""
+    from undulator.data.ringbuffer import TimeRingBuffer
+    from undulator.devices.scheduler import PeriodicScheduler
+
+    class StubDisplay(threading.Thread):
+
+        def __init__(self):
+            super().__init__(name='ThdReadDisplay', daemon=True)
+            self.x, self.y, self.z = 1.0, 2.0, 3.0
+            self.buffer = TimeRingBuffer(3)
+            self.scheduler = PeriodicScheduler(0.01)
+            self.stop_event = threading.Event()
+
+        def run(self):
+            self.scheduler.start()
+            while not self.stop_event.is_set():
+                self.scheduler.wait(self.stop_event)
+                self.buffer.append(time.time(), (self.x, self.y, self.z))
+
+    return StubDisplay()
+
+
+@unittest.skipIf(epics is None, 'pyepics is not installed')
+class TestDiscrete(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_steps_in_position(self):
+        from undulator.data import motionanalysis
+        from undulator.devices.sampler import MonitorSampler
+        from undulator.devices.testengine import ThdTestAxis
+
+        _thd = ThdTestAxis(test_pos=[1, 1], mode=0, wtime=0.1,
+                           upd_interval=0.01)
+        _axes = [StubAxis(_name) for _name in 'ABCD']
+        _thd.motorA, _thd.motorB, _thd.motorC, _thd.motorD = _axes
+        _thd.en_flags = {'EnMove': StubPV(0)}
+        _thd.undulator = StubUndulator(_axes[0])
+        # the axes are at the target, so MoveStatus never rises
+        _thd.sampler = MonitorSampler(
+            {_name: StubPV(1.0) for _name in _thd.channels})
+        _thd.start()
+        _thd.join(_thd.start_timeout)
+        self.assertFalse(_thd.is_alive())
+
+        _events = motionanalysis.read_events(
+            motionanalysis.get_events_name(_thd.log_name))
+        self.assertEqual(
+            [_name for _, _name in _events if 'in position' in _name],
+            ['pos 1: in position']*2)
+        _segments = motionanalysis.segments_from_events(_events)
+        np.testing.assert_allclose(_segments['target'], [1, 1])
+
+
+@unittest.skipIf(epics is None, 'pyepics is not installed')
+class TestDisplay(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        self.display = make_stub_display()
+        self.display.start()
+
+    def tearDown(self):
+        self.display.stop_event.set()
+        self.display.join(1)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def run_manual_test(self, nsamples=5):
+        """Runs a manual test with stub channels and returns its thread."""
+        from undulator.devices.sampler import MonitorSampler
+        from undulator.devices.testengine import ThdTestAxis
+
+        _thd = ThdTestAxis(mode=2, upd_interval=0.01)
+        _thd.undulator = StubUndulator()
+        _thd.sampler = MonitorSampler(
+            {_name: StubPV(_i) for _i, _name in enumerate(_thd.channels)})
+        _thd.manual_flag = True
+        _thd.start()
+        for _ in range(nsamples):
+            _thd.acquire_flag = True
+            time.sleep(0.05)
+        _thd.manual_flag = False
+        _thd.join(5)
+        self.assertFalse(_thd.is_alive())
+        return _thd
+
+    def test_manual_test_with_display(self):
+        from undulator.data import textlog
+
+        _thd = self.run_manual_test()
+        _info = textlog.read_header(_thd.log_name)
+        self.assertIn('display', _info['sampling'])
+        _data = textlog.read_log(_thd.log_name, _info['skiprows'])
+        self.assertEqual(len(_data), 5)
+        np.testing.assert_allclose(_data['DisplayX [mm]'], 1.0)
+        np.testing.assert_allclose(_data['DisplayZ [mm]'], 3.0)
+        np.testing.assert_allclose(_data['ActualPosA [mm]'], 0.0)
+
+    def test_display_readings_older_than_buffer(self):
+        from undulator.data import textlog
+        from undulator.data.ringbuffer import TimeRingBuffer
+
+        # the buffer only covers the last few samples when the log is
+        # flushed at the end of the test
+        self.display.buffer = TimeRingBuffer(3, size=4)
+        _thd = self.run_manual_test()
+        _data = textlog.read_log(_thd.log_name, 3)
+        self.assertEqual(len(_data), 5)
+        np.testing.assert_allclose(_data['DisplayY [mm]'], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the put transactions."""
+
+import unittest
+
+try:
+    import epics  # noqa: F401
+except ImportError:
+    epics = None
+
+
+class StubPV(object):
+    """PV whose puts complete at once, in the order they are written."""
+
+    def __init__(self, pvname, connected=True, writes=None):
+        self.pvname = pvname
+        self.connected = connected
+        self.writes = writes
+
+    def wait_for_connection(self, timeout=None):
+        return self.connected
+
+    def put(self, value, wait=False, use_complete=False, callback=None):
+        self.writes.append((self.pvname, value))
+        callback(pvname=self.pvname)
+
+
+@unittest.skipIf(epics is None, 'pyepics is not installed')
+class TestIsEqual(unittest.TestCase):
+
+    def test_precision(self):
+        from undulator.devices.transaction import is_equal
+        self.assertTrue(is_equal(1.0, 1.0 + 1e-7))
+        self.assertTrue(is_equal(0.0, 1e-10))
+        self.assertFalse(is_equal(1.0, 1.001))
+
+    def test_none(self):
+        from undulator.devices.transaction import is_equal
+        self.assertFalse(is_equal(1.0, None))
+        self.assertFalse(is_equal(None, 1.0))
+        self.assertFalse(is_equal(None, None))
+
+
+@unittest.skipIf(epics is None, 'pyepics is not installed')
+class TestPutTransaction(unittest.TestCase):
+
+    def test_stages(self):
+        from undulator.devices import transaction
+        _writes = []
+        _transaction = transaction.PutTransaction(timeout=0.1)
+        _transaction.add(StubPV('flag', writes=_writes), 1, verify=False,
+                         stage=1)
+        _transaction.add(StubPV('a', writes=_writes), 2, verify=False)
+        _transaction.add(StubPV('b', writes=_writes), 3, verify=False)
+        self.assertTrue(_transaction.run())
+        self.assertEqual(_writes, [('a', 2), ('b', 3), ('flag', 1)])
+        self.assertEqual(_transaction.failed, [])
+
+    def test_not_connected(self):
+        from undulator.devices import transaction
+        _writes = []
+        _transaction = transaction.PutTransaction(timeout=0.1)
+        _transaction.add(StubPV('a', writes=_writes), 2, verify=False)
+        _transaction.add(StubPV('b', False, _writes), 3, verify=False)
+        _transaction.add(StubPV('flag', writes=_writes), 1, verify=False,
+                         stage=1)
+        self.assertFalse(_transaction.run())
+        # the later stage is not written over a failed one
+        self.assertEqual(_writes, [('a', 2)])
+        self.assertEqual(_transaction.failed, ['b', 'flag'])
+        self.assertEqual(_transaction.status['b'], transaction.NOT_CONNECTED)
+        self.assertIn('flag: ' + transaction.NOT_WRITTEN,
+                      _transaction.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""Tests of the test log summary database."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from undulator.data import trendstore
+
+
+def write_log(filename, nrows=10, poserr=0.001, comments='test'):
+    """Writes a text test log with constant channels."""
+    _columns = ['t [s]']
+    for _axis in trendstore.AXIS_NAMES:
+        _columns += ['PosError{0:s} [mm]'.format(_axis),
+                     'Current{0:s} [A]'.format(_axis),
+                     'Torque{0:s} [%]'.format(_axis)]
+    _data = np.full((nrows, len(_columns)), poserr)
+    _data[:, 0] = np.arange(nrows)*0.1
+    with open(filename, 'w') as _f:
+        _f.write('Comments: ' + comments + '\n')
+        _f.write('Test positions [mm]: 1, 0\n')
+        _f.write('Sampling: \n')
+        _f.write('\t'.join(_columns) + '\n')
+        for _row in _data:
+            _f.write('\t'.join('{0:g}'.format(_v) for _v in _row) + '\n')
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_ingest(self):
+        write_log(self.path('log_2024_01_02_03_04_05.dat'), nrows=20)
+        write_log(self.path('log_2024_01_03_03_04_05.dat'), poserr=0.002)
+        _result = trendstore.ingest(self.directory, processes=1)
+        self.assertEqual(_result['ingested'], 2)
+        self.assertEqual(_result['failed'], 0)
+        _store = trendstore.TrendStore(
+            self.path(trendstore.DB_NAME))
+        try:
+            _test = _store.get_test('log_2024_01_02_03_04_05')
+            self.assertEqual(_test['nrows'], 20)
+            self.assertEqual(_test['comments'], 'test')
+            self.assertEqual(_test['test_positions'], '1, 0')
+            _times, _values, _names = _store.query('max_poserr', 'A')
+            np.testing.assert_allclose(_values, [0.001, 0.002])
+        finally:
+            _store.close()
+        # only new or modified logs are read again
+        _result = trendstore.ingest(self.directory, processes=1)
+        self.assertEqual(_result['ingested'], 0)
+        os.remove(self.path('log_2024_01_03_03_04_05.dat'))
+        _result = trendstore.ingest(self.directory, processes=1)
+        self.assertEqual(_result['removed'], 1)
+
+    def test_binary_logs(self):
+        from undulator.data import binarylog
+        for _i in range(3):
+            _name = self.path('log_2024_01_0{0:d}_03_04_05.dat'.format(_i + 1))
+            write_log(_name, comments='binary')
+            binarylog.convert_dat_log(_name)
+        _result = trendstore.ingest(self.directory, processes=2)
+        self.assertEqual(_result['ingested'], 3)
+        _store = trendstore.TrendStore(self.path(trendstore.DB_NAME))
+        try:
+            _test = _store.get_test('log_2024_01_01_03_04_05')
+            self.assertTrue(_test['path'].endswith(binarylog.EXTENSION))
+            self.assertEqual(_test['comments'], 'binary')
+            self.assertEqual(_test['nrows'], 10)
+        finally:
+            _store.close()
+
+    def test_fault_captures(self):
+        write_log(self.path('log_2024_01_02_03_04_05.dat'))
+        write_log(self.path('log_2024_01_02_03_05_00_fault.dat'),
+                  poserr=0.1)
+        _result = trendstore.ingest(self.directory, processes=1)
+        self.assertEqual(_result['ingested'], 1)
+        _store = trendstore.TrendStore(self.path(trendstore.DB_NAME))
+        try:
+            self.assertIsNone(
+                _store.get_test('log_2024_01_02_03_05_00_fault'))
+        finally:
+            _store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
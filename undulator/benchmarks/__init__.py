@@ -0,0 +1,4 @@
+"""Benchmarks of the acquisition, log I/O and analysis hot paths.
+
+Run with python -m undulator.benchmarks; see --help for the options.
+"""
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""Runs the benchmarks and saves the results as JSON.
+
+The acquisition and idle GUI benchmarks start the simulated IOC (and
+display) on localhost, unless --external-ioc is given. The GUI benchmarks
+run with the offscreen Qt platform.
+
+Usage:
+    python -m undulator.benchmarks
+        [--suites logio,rendering,acquisition,idle]
+        [--output results.json] [--compare previous.json]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import argparse as _argparse
+import subprocess as _subprocess
+
+from undulator.benchmarks import common as _common
+
+
+SUITES = ('logio', 'rendering', 'acquisition', 'idle')
+
+# the QApplication is destroyed with its last Python reference
+_application = None
+
+
+def _int_list(text):
+    return [int(float(_value)) for _value in text.split(',') if _value]
+
+
+def parse_args(args=None):
+    """Parses the command line arguments."""
+    _parser = _argparse.ArgumentParser(
+        prog='python -m undulator.benchmarks',
+        description='Undulator control GUI benchmarks.')
+    _parser.add_argument('--suites', default=','.join(SUITES),
+                         help='comma separated suites to run')
+    _parser.add_argument('--output', default=None,
+                         help='results file, defaults to '
+                              'benchmark_<version>_<time>.json')
+    _parser.add_argument('--compare', default=None,
+                         help='previous results file to compare with')
+    _parser.add_argument('--workdir', default=None,
+                         help='working directory for the logs, defaults '
+                              'to a temporary directory')
+    _parser.add_argument('--sizes', type=_int_list,
+                         default=[10000, 100000, 1000000],
+                         help='log I/O numbers of rows')
+    _parser.add_argument('--points', type=_int_list,
+                         default=[10000, 100000, 1000000],
+                         help='analysis numbers of points')
+    _parser.add_argument('--repeat', type=int, default=3,
+                         help='repetitions of the log I/O and plots')
+    _parser.add_argument('--modes', type=_int_list, default=[0, 1, 2],
+                         help='test modes (0 discrete, 1 continuous, '
+                              '2 manual)')
+    _parser.add_argument('--duration', type=float, default=10,
+                         help='duration of each test in seconds')
+    _parser.add_argument('--interval', type=float, default=0.02,
+                         help='sampling interval in seconds')
+    _parser.add_argument('--policy', default='skip',
+                         choices=['skip', 'catchup'],
+                         help='late sample policy')
+    _parser.add_argument('--ioc-rate', type=float, default=50,
+                         help='simulated IOC update rate in Hz')
+    _parser.add_argument('--ioc-latency', type=float, default=0,
+                         help='simulated IOC CA latency in seconds')
+    _parser.add_argument('--idle-duration', type=float, default=10,
+                         help='idle GUI CPU measurement duration in seconds')
+    _parser.add_argument('--display', action='store_true',
+                         help='connects a simulated display in the tests')
+    _parser.add_argument('--external-ioc', action='store_true',
+                         help='uses the IOC found with the current EPICS '
+                              'environment instead of the simulated one')
+    return _parser.parse_args(args)
+
+
+def start_simulator(rate, latency):
+    """Sets the CA environment to localhost and starts the simulated IOC
+    in a child process."""
+    _os.environ['EPICS_CA_ADDR_LIST'] = '127.0.0.1'
+    _os.environ['EPICS_CA_AUTO_ADDR_LIST'] = 'NO'
+    return _subprocess.Popen(
+        [_sys.executable, '-m', 'undulator.simulation',
+         '--rate', str(rate), '--latency', str(latency)])
+
+
+def run_acquisition(args, workdir):
+    """Runs the acquisition suite with the simulated (or an external)
+    IOC."""
+    _ioc = None
+    _display = None
+    if not args.external_ioc:
+        _ioc = start_simulator(args.ioc_rate, args.ioc_latency)
+    try:
+        # imported here: the CA environment must be set before
+        from undulator.benchmarks import acquisition as _acquisition
+        _port = None
+        if args.display:
+            from undulator.simulation.display import SimulatedDisplay
+            _display = SimulatedDisplay(
+                lambda: _acquisition.axis_positions()[:3])
+            _display.start()
+            _port = _display.port
+        with _common.working_directory(workdir):
+            return _acquisition.run(args.modes, args.duration,
+                                    args.interval, args.policy, _port)
+    finally:
+        if _display is not None:
+            _display.close()
+        if _ioc is not None:
+            _ioc.terminate()
+            _ioc.wait()
+
+
+def get_application():
+    """Returns the QApplication, created on the offscreen platform and
+    kept until the process exits."""
+    global _application
+    _os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qtpy.QtWidgets import QApplication
+    _application = QApplication.instance()
+    if _application is None:
+        _application = QApplication([])
+    return _application
+
+
+def run_rendering(args, workdir):
+    """Runs the analysis suite on an offscreen QApplication."""
+    get_application()
+    from undulator.benchmarks import rendering as _rendering
+    with _common.working_directory(workdir):
+        return _rendering.run(args.points, args.repeat)
+
+
+def run_idle(args, workdir):
+    """Runs the idle GUI suite on an offscreen QApplication, with the
+    simulated (or an external) IOC."""
+    _ioc = None
+    if not args.external_ioc:
+        _ioc = start_simulator(args.ioc_rate, args.ioc_latency)
+    try:
+        get_application()
+        # imported here: the CA environment must be set before
+        from undulator.benchmarks import idle as _idle
+        with _common.working_directory(workdir):
+            return _idle.run(args.idle_duration)
+    finally:
+        if _ioc is not None:
+            _ioc.terminate()
+            _ioc.wait()
+
+
+def run_logio(args, workdir):
+    """Runs the log I/O suite."""
+    from undulator.benchmarks import logio as _logio
+    with _common.working_directory(workdir):
+        return _logio.run(args.sizes, repeat=args.repeat)
+
+
+def main(args=None):
+    """Runs the selected suites, saves and compares the results."""
+    _args = parse_args(args)
+    _suites = [_s for _s in _args.suites.split(',') if _s]
+    for _suite in _suites:
+        if _suite not in SUITES:
+            raise ValueError('Unknown benchmark suite: ' + _suite)
+    _output = _args.output
+    if _output is None:
+        _output = _os.path.abspath('benchmark_{0:s}_{1:s}.json'.format(
+            _common.get_version(),
+            _time.strftime('%Y_%m_%d_%H_%M_%S', _time.localtime())))
+    _workdir = _args.workdir
+    if _workdir is not None:
+        _workdir = _os.path.abspath(_workdir)
+
+    _records = []
+    for _suite in SUITES:
+        if _suite not in _suites:
+            continue
+        print('Running ' + _suite + ' benchmarks...')
+        _run = {'logio': run_logio,
+                'rendering': run_rendering,
+                'acquisition': run_acquisition,
+                'idle': run_idle}[_suite]
+        _records += _run(_args, _workdir)
+
+    _results = {'metadata': _common.get_metadata(vars(_args)),
+                'results': _records}
+    _common.save_results(_output, _results['metadata'], _records)
+    print('Results saved in ' + _output)
+
+    if _args.compare is not None:
+        _previous = _common.load_results(_args.compare)
+        for _name, _metric, _old, _new, _change in _common.compare_results(
+                _previous, _results):
+            print('{0:s} {1:s}: {2:.6g} -> {3:.6g} ({4:+.1%})'.format(
+                _name, _metric, _old, _new, _change))
+
+
+if __name__ == '__main__':
+    main()
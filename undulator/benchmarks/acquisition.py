@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""Acquisition rate, sampling jitter and Channel Access latency benchmarks.
+
+The undulator PVs must be served by an IOC, normally the simulated one
+(undulator.simulation), and this module must be imported after the CA
+environment is set.
+"""
+
+import time as _time
+import numpy as _np
+
+from undulator.devices import (
+    pvs as _pvs,
+    undulator as _undulator,
+    )
+from undulator.devices.testengine import (
+    ThdTestAxis as _ThdTestAxis,
+    connect_display as _connect_display,
+    disconnect_display as _disconnect_display,
+    )
+from undulator.data import textlog as _textlog
+from undulator.benchmarks.common import (
+    distribution as _distribution,
+    make_record as _make_record,
+    )
+
+
+MODE_NAMES = {0: 'discrete', 1: 'continuous', 2: 'manual'}
+
+
+def wait_for_ioc(timeout=10):
+    """Waits until the undulator PVs connect.
+
+    Returns:
+        a list with the names of the PVs not connected."""
+    return _pvs.wait_for_connection(timeout)
+
+
+def axis_positions():
+    """Returns the actual positions of the axes, from the CA monitors."""
+    return [_undulator[_name]['ActualPos'].get()
+            for _name in ('A', 'B', 'C', 'D')]
+
+
+def bench_ca_latency(count=200):
+    """Measures CA get (without monitor) and put with completion round
+    trips.
+
+    Args:
+        count (int): number of requests of each kind.
+
+    Returns:
+        a list of result records."""
+    _get_pv = _undulator['A']['ActualPos']
+    _put_pv = _undulator['A']['MovePos']
+    _value = _put_pv.get()
+    _records = []
+    for _kind, _request in [
+            ('get', lambda: _get_pv.get(use_monitor=False)),
+            ('put', lambda: _put_pv.put(_value, wait=True))]:
+        _times = []
+        for _ in range(count):
+            _t = _time.perf_counter()
+            _request()
+            _times.append(_time.perf_counter() - _t)
+        _records.append(_make_record(
+            'acquisition/ca_{0:s}'.format(_kind), {'count': count},
+            _distribution(_times, 'latency_')))
+    return _records
+
+
+def bench_mode(mode, duration=10, upd_interval=0.02, policy='skip',
+               manual_interval=0.1):
+    """Runs a test in the given mode and measures the achieved sampling.
+
+    The test runs in the working directory, where its log is saved.
+
+    Args:
+        mode (int): 0 for discrete, 1 for continuous and 2 for manual mode.
+        duration (float): approximate test duration in seconds.
+        upd_interval (float): sampling interval in seconds.
+        policy (str): late sample policy of the test scheduler.
+        manual_interval (float): interval between acquisitions in manual
+            mode.
+
+    Returns:
+        a result record."""
+    _undulator['A'].MoveFlag.put(1, wait=True)
+    _pos = _undulator['A']['ActualPos'].get()
+    _step = 0.1 if _pos < 0 else -0.1
+    _thd = _ThdTestAxis(test_pos=[_pos + _step, _pos], mode=mode,
+                        wtime=duration/2, upd_interval=upd_interval,
+                        policy=policy)
+
+    _acquire_times = []
+    _acquire = _thd.acquire
+
+    def _timed_acquire(t):
+        _t = _time.perf_counter()
+        _acquire(t)
+        _acquire_times.append(_time.perf_counter() - _t)
+
+    _thd.acquire = _timed_acquire
+
+    _t_start = _time.perf_counter()
+    if mode == 1:
+        _thd.continuous_flag = True
+        _thd.start()
+        _time.sleep(duration)
+        _thd.continuous_flag = False
+    elif mode == 2:
+        _thd.manual_flag = True
+        _thd.start()
+        _t_end = _time.monotonic() + duration
+        while _time.monotonic() < _t_end:
+            _thd.acquire_flag = True
+            _time.sleep(manual_interval)
+        _thd.manual_flag = False
+    else:
+        _thd.start()
+    _thd.join()
+    _elapsed = _time.perf_counter() - _t_start
+
+    _metrics = {'elapsed': _elapsed}
+    _metrics.update({'scheduler_' + _key: _value
+                     for _key, _value in _thd.scheduler.stats().items()})
+    _metrics.update(_distribution(_acquire_times, 'acquire_'))
+
+    _df = _textlog.read_log(_thd.log_name)
+    _t = _np.asarray(_df['t [s]'])
+    _metrics['samples'] = len(_t)
+    if len(_t) > 1:
+        _metrics['rate'] = (len(_t) - 1)/(_t[-1] - _t[0])
+    _metrics.update(_distribution(_np.diff(_t), 'interval_'))
+    # age of the newest PLC value in each sample
+    _tioc = _df[[_col for _col in _df.columns if _col.startswith('tIOC')]]
+    _metrics.update(_distribution(
+        _t - _np.nanmax(_tioc.values, axis=1), 'age_'))
+
+    return _make_record(
+        'acquisition/{0:s}'.format(MODE_NAMES[mode]),
+        {'mode': mode, 'duration': duration, 'upd_interval': upd_interval,
+         'policy': policy, 'display': _thd.thd_display is not None},
+        _metrics)
+
+
+def run(modes=(0, 1, 2), duration=10, upd_interval=0.02, policy='skip',
+        display_port=None, display_period=0.2, ca_count=200):
+    """Runs the acquisition benchmarks in the working directory.
+
+    Args:
+        modes (list): test modes to benchmark.
+        duration (float): approximate duration of each test in seconds.
+        upd_interval (float): sampling interval in seconds.
+        policy (str): late sample policy of the test scheduler.
+        display_port (str): if given, the display is connected on this
+            port during the tests.
+        display_period (float): display reading period in seconds.
+        ca_count (int): number of CA requests of the latency benchmark.
+
+    Returns:
+        a list of result records."""
+    _not_connected = wait_for_ioc()
+    if len(_not_connected) > 0:
+        print('Channels not connected: ' + ', '.join(_not_connected))
+
+    _records = bench_ca_latency(ca_count)
+
+    _thd_display = None
+    if display_port is not None:
+        _thd_display = _connect_display(display_port, display_period)
+        if _thd_display is None:
+            print('Could not connect to the display on ' + display_port)
+    try:
+        for _mode in modes:
+            _records.append(bench_mode(_mode, duration, upd_interval, policy))
+    finally:
+        if _thd_display is not None:
+            _disconnect_display(_thd_display)
+
+    return _records
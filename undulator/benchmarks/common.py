@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""Common functions of the benchmarks."""
+
+import os as _os
+import sys as _sys
+import json as _json
+import time as _time
+import shutil as _shutil
+import platform as _platform
+import tempfile as _tempfile
+import contextlib as _contextlib
+import numpy as _np
+
+
+_basepath = _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__)))
+
+
+def get_version():
+    """Returns the package version."""
+    with open(_os.path.join(_basepath, 'VERSION'), 'r') as _f:
+        return _f.read().strip()
+
+
+def get_metadata(args=None):
+    """Returns the version, platform and arguments of a benchmark run.
+
+    Args:
+        args (dict): benchmark arguments."""
+    return {'version': get_version(),
+            'time': _time.strftime('%Y-%m-%d %H:%M:%S', _time.localtime()),
+            'python': _sys.version.split()[0],
+            'numpy': _np.__version__,
+            'platform': _platform.platform(),
+            'processor': _platform.processor(),
+            'cpu_count': _os.cpu_count(),
+            'args': args or {}}
+
+
+def distribution(values, prefix=''):
+    """Returns the mean, standard deviation, percentiles and maximum of
+    a set of values.
+
+    Args:
+        values (list): measured values.
+        prefix (str): prefix of the returned keys.
+
+    Returns:
+        a dict prefix + statistic -> value (NaN if values is empty)."""
+    _values = _np.asarray(values, dtype=float)
+    _values = _values[_np.isfinite(_values)]
+    _keys = ['mean', 'std', 'p50', 'p90', 'p99', 'max']
+    if len(_values) == 0:
+        return {prefix + _key: _np.nan for _key in _keys}
+    _p = _np.percentile(_values, [50, 90, 99])
+    return dict(zip([prefix + _key for _key in _keys],
+                    [_values.mean(), _values.std(),
+                     _p[0], _p[1], _p[2], _values.max()]))
+
+
+def make_record(name, params, metrics):
+    """Returns a benchmark result record.
+
+    Args:
+        name (str): unique benchmark name, e.g. 'logio/text_write/1000'.
+        params (dict): benchmark parameters.
+        metrics (dict): measured values; times in seconds, rates in Hz."""
+    return {'name': name,
+            'params': params,
+            'metrics': {_key: float(_value)
+                        for _key, _value in metrics.items()}}
+
+
+@_contextlib.contextmanager
+def working_directory(path=None):
+    """Changes to a (temporary, if path is None) working directory,
+    removing it afterwards if it was created."""
+    _cwd = _os.getcwd()
+    _tmp = path is None
+    if _tmp:
+        path = _tempfile.mkdtemp(prefix='undulator_benchmark_')
+    _os.chdir(path)
+    try:
+        yield path
+    finally:
+        _os.chdir(_cwd)
+        if _tmp:
+            _shutil.rmtree(path, ignore_errors=True)
+
+
+def save_results(filename, metadata, records):
+    """Saves the benchmark results as JSON.
+
+    Args:
+        filename (str): output file name.
+        metadata (dict): run metadata, from get_metadata.
+        records (list): result records, from make_record."""
+    with open(filename, 'w') as _f:
+        _json.dump({'metadata': metadata, 'results': records}, _f,
+                   indent=1, allow_nan=True)
+
+
+def load_results(filename):
+    """Loads benchmark results saved by save_results."""
+    with open(filename, 'r') as _f:
+        return _json.load(_f)
+
+
+def compare_results(previous, current):
+    """Compares two benchmark results.
+
+    Args:
+        previous (dict): reference results, from load_results.
+        current (dict): new results.
+
+    Returns:
+        a list of (name, metric, previous, current, relative change)
+        tuples for the records and metrics found in both."""
+    _previous = {_r['name']: _r['metrics'] for _r in previous['results']}
+    _changes = []
+    for _record in current['results']:
+        _old = _previous.get(_record['name'])
+        if _old is None:
+            continue
+        for _metric, _value in _record['metrics'].items():
+            _ref = _old.get(_metric)
+            if _ref is None:
+                continue
+            if _ref != 0 and _np.isfinite(_ref) and _np.isfinite(_value):
+                _change = (_value - _ref)/abs(_ref)
+            else:
+                _change = _np.nan
+            _changes.append((_record['name'], _metric, _ref, _value,
+                             _change))
+    return _changes
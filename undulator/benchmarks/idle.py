@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""Idle GUI CPU use benchmark.
+
+The main window is created with all its tabs and left idle with the event
+loop running, and the CPU use of the process is measured with and without
+the pausing of the PyDM widgets of the hidden tabs. A QApplication must
+exist and the undulator PVs must be served by an IOC, normally the
+simulated one (undulator.simulation), before this module is imported.
+"""
+
+from qtpy.QtCore import (
+    QTimer as _QTimer,
+    QEventLoop as _QEventLoop,
+    )
+
+from undulator.gui.throttle import CPUUsage as _CPUUsage
+from undulator.gui.undulatorwindow import UndulatorWindow as _UndulatorWindow
+from undulator.benchmarks.common import (
+    distribution as _distribution,
+    make_record as _make_record,
+    )
+
+
+def run_event_loop(duration):
+    """Processes the GUI events for duration seconds."""
+    _loop = _QEventLoop()
+    _QTimer.singleShot(int(1000*duration), _loop.quit)
+    _loop.exec_()
+
+
+def create_window():
+    """Creates and shows the main window with all its tabs built."""
+    _window = _UndulatorWindow()
+    for _index in range(len(_window.tab_widgets)):
+        _window.build_tab(_index)
+    _window.show()
+    return _window
+
+
+def bench_idle(window, throttled, duration=10, tab=0, settle=2):
+    """Measures the CPU use of the idle GUI.
+
+    Args:
+        window (UndulatorWindow): main window with all its tabs built.
+        throttled (bool): True to pause the hidden tabs.
+        duration (float): measurement duration in seconds.
+        tab (int): index of the visible tab.
+        settle (float): time in seconds to wait before measuring.
+
+    Returns:
+        a result record."""
+    window.ui.main_tab.setCurrentIndex(tab)
+    window.set_throttling(throttled)
+    run_event_loop(settle)
+
+    _cpu = _CPUUsage()
+    _total = _CPUUsage()
+    _samples = []
+    for _ in range(max(int(duration), 1)):
+        run_event_loop(1)
+        _samples.append(_cpu.sample())
+
+    _metrics = {'cpu': _total.percent(),
+                'paused': len(window.throttle.paused)}
+    _metrics.update(_distribution(_samples, 'cpu_'))
+    return _make_record(
+        'idle/{0:s}'.format('throttled' if throttled else 'unthrottled'),
+        {'duration': duration, 'tab': window.tab_names[tab]}, _metrics)
+
+
+def run(duration=10, tab=0):
+    """Runs the idle GUI benchmarks, without and with throttling.
+
+    Args:
+        duration (float): measurement duration of each case in seconds.
+        tab (int): index of the visible tab.
+
+    Returns:
+        a list of result records."""
+    _window = create_window()
+    try:
+        return [bench_idle(_window, _throttled, duration, tab)
+                for _throttled in (False, True)]
+    finally:
+        _window.set_throttling(False)
+        _window.close()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""Log write and read throughput benchmarks."""
+
+import os as _os
+import time as _time
+import numpy as _np
+
+from undulator.data.logwriter import LogWriter as _LogWriter
+from undulator.data import binarylog as _binarylog
+from undulator.data import textlog as _textlog
+from undulator.benchmarks.common import make_record as _make_record
+
+
+AXIS_NAMES = ('A', 'B', 'C', 'D')
+CHANNELS = (('ActualPos', 'mm'), ('PosError', 'mm'),
+            ('Current', 'A'), ('Torque', '%'))
+
+
+def get_columns(display=False):
+    """Returns the column names of a test log."""
+    _names = ['{0:s}{1:s} [{2:s}]'.format(_key, _axis, _unit)
+              for _axis in AXIS_NAMES for _key, _unit in CHANNELS]
+    _columns = ['t [s]'] + _names
+    if display:
+        _columns += ['DisplayX [mm]', 'DisplayY [mm]', 'DisplayZ [mm]']
+    _columns += ['tIOC ' + _name.split(' ')[0] + ' [s]' for _name in _names]
+    return _columns
+
+
+def make_data(nrows, ncols, interval=0.02, seed=0):
+    """Returns synthetic test samples: the time in the first column and
+    random values, with the full float precision, in the others.
+
+    Args:
+        nrows (int): number of rows.
+        ncols (int): number of columns.
+        interval (float): sampling interval in seconds.
+        seed (int): random generator seed."""
+    _rng = _np.random.RandomState(seed)
+    _data = _rng.randn(nrows, ncols)
+    _data[:, 0] = interval*_np.arange(nrows)
+    return _data
+
+
+def get_header(columns):
+    """Returns a test log header with the given columns."""
+    return ('Comments: benchmark\n' +
+            'Test positions [mm]: 0\n' +
+            'Sampling: \n' +
+            '\t'.join(columns) + '\n')
+
+
+def bench_text_write(filename, columns, data, chunk_size=500):
+    """Writes a text log as the acquisition does, in chunks handed to the
+    log writer thread, and returns the elapsed time (until the file is
+    closed and synced)."""
+    _t = _time.perf_counter()
+    _writer = _LogWriter(filename, get_header(columns))
+    _writer.start()
+    for _i in range(0, len(data), chunk_size):
+        _writer.write(data[_i:_i + chunk_size])
+    _writer.close()
+    return _time.perf_counter() - _t
+
+
+def bench_binary_write(filename, columns, data):
+    """Writes a binary log and returns the elapsed time."""
+    _t = _time.perf_counter()
+    _binarylog.write_binary_log(filename, columns, data, 'benchmark', '0')
+    return _time.perf_counter() - _t
+
+
+def bench_text_read(filename):
+    """Reads a text log and returns the elapsed time."""
+    _t = _time.perf_counter()
+    _info = _textlog.read_header(filename)
+    _df = _textlog.read_log(filename, _info['skiprows'])
+    _df.values.sum()
+    return _time.perf_counter() - _t
+
+
+def bench_binary_read(filename):
+    """Opens a binary log, reads all its columns and returns the elapsed
+    time."""
+    _t = _time.perf_counter()
+    _log = _binarylog.BinaryLog(filename)
+    for _col in _log.columns:
+        _np.sum(_log[_col])
+    del _log
+    return _time.perf_counter() - _t
+
+
+def run(sizes=(10000, 100000, 1000000), display=False, repeat=3):
+    """Runs the log I/O benchmarks in the working directory.
+
+    Args:
+        sizes (list): numbers of rows of the benchmarked logs. One hour
+            at the default 50 Hz sampling is 180000 rows.
+        display (bool): includes the display columns.
+        repeat (int): number of repetitions; the best time is kept.
+
+    Returns:
+        a list of result records."""
+    _columns = get_columns(display)
+    _records = []
+    for _nrows in sizes:
+        _data = make_data(_nrows, len(_columns))
+        _params = {'rows': _nrows, 'columns': len(_columns)}
+        _text = 'benchmark_{0:d}.dat'.format(_nrows)
+        _binary = _binarylog.get_binary_name(_text)
+        for _kind, _filename, _bench, _args in [
+                ('text_write', _text, bench_text_write,
+                 (_text, _columns, _data)),
+                ('binary_write', _binary, bench_binary_write,
+                 (_binary, _columns, _data)),
+                ('text_read', _text, bench_text_read, (_text,)),
+                ('binary_read', _binary, bench_binary_read, (_binary,))]:
+            _elapsed = min(_bench(*_args) for _ in range(repeat))
+            _size = _os.path.getsize(_filename)
+            _records.append(_make_record(
+                'logio/{0:s}/{1:d}'.format(_kind, _nrows), _params,
+                {'time': _elapsed,
+                 'file_size': _size,
+                 'throughput_mb': _size/_elapsed/2**20,
+                 'rows_per_s': _nrows/_elapsed}))
+        for _filename in (_text, _binary):
+            _os.remove(_filename)
+    return _records
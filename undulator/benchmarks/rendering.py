@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""Analysis load and plot redraw benchmarks.
+
+A QApplication must exist before the benchmarks run; use the 'offscreen'
+Qt platform (QT_QPA_PLATFORM=offscreen) to run them headless.
+"""
+
+import time as _time
+import numpy as _np
+
+from undulator.data import binarylog as _binarylog
+from undulator.gui.analysiswidget import AnalysisWidget as _AnalysisWidget
+from undulator.benchmarks import logio as _logio
+from undulator.benchmarks.common import (
+    distribution as _distribution,
+    make_record as _make_record,
+    )
+
+
+def write_logs(nrows):
+    """Writes text and binary logs with nrows samples in the working
+    directory and returns their test names."""
+    _columns = _logio.get_columns()
+    _data = _logio.make_data(nrows, len(_columns))
+    _text = 'bench_{0:d}_text'.format(nrows)
+    _binary = 'bench_{0:d}_binary'.format(nrows)
+    _logio.bench_text_write(_text + '.dat', _columns, _data)
+    _binarylog.write_binary_log(_binary + _binarylog.EXTENSION, _columns,
+                                _data, 'benchmark', '0')
+    return {'text': _text, 'binary': _binary}
+
+
+def select_test(widget, name):
+    """Selects a test in the file combobox without loading it."""
+    _cmb = widget.ui.cmb_file
+    _cmb.blockSignals(True)
+    _cmb.setCurrentIndex(_cmb.findText(name))
+    _cmb.blockSignals(False)
+
+
+def timed(function, repeat=1):
+    """Calls a function repeat times and returns the elapsed times."""
+    _times = []
+    for _ in range(repeat):
+        _t = _time.perf_counter()
+        function()
+        _times.append(_time.perf_counter() - _t)
+    return _times
+
+
+def bench_load(widget, name):
+    """Measures the load time of a test, from disk and from the cache."""
+    select_test(widget, name)
+    widget.log_cache.clear()
+    _metrics = {'load': timed(widget.load)[0],
+                'load_cached': timed(widget.load)[0]}
+    return _metrics
+
+
+def bench_plot(widget, repeat=5):
+    """Measures the plot and redraw times of the loaded test.
+
+    The canvas is drawn synchronously, so the times include the
+    rendering."""
+    _canvas = widget.ui.plot.canvas
+
+    def _plot():
+        widget.plot()
+        _canvas.draw()
+
+    _metrics = {}
+    _metrics.update(_distribution(timed(_plot, repeat), 'plot_'))
+
+    _t = _np.asarray(widget.df['t [s]'])
+    _center = 0.5*(_t[0] + _t[-1])
+    _width = 0.05*(_t[-1] - _t[0])
+
+    def _zoom():
+        _canvas.ax.set_xlim(_center - _width, _center + _width)
+        _canvas.draw()
+
+    _metrics.update(_distribution(timed(_zoom, repeat), 'zoom_'))
+
+    _plot_2 = widget.ui.cmb_plot_2
+    _plot_2.blockSignals(True)
+    _plot_2.setCurrentIndex(1)
+    _plot_2.blockSignals(False)
+    _metrics.update(_distribution(timed(_plot, repeat), 'plot_twin_'))
+    _plot_2.blockSignals(True)
+    _plot_2.setCurrentIndex(0)
+    _plot_2.blockSignals(False)
+    return _metrics
+
+
+def run(points=(10000, 100000, 1000000), repeat=5):
+    """Runs the analysis benchmarks in the working directory.
+
+    Args:
+        points (list): numbers of samples of the benchmarked logs.
+        repeat (int): number of plot repetitions.
+
+    Returns:
+        a list of result records."""
+    _names = {_nrows: write_logs(_nrows) for _nrows in points}
+    _widget = _AnalysisWidget()
+    _widget.resize(800, 600)
+    _widget.list_test_files()
+
+    _records = []
+    for _nrows in points:
+        for _kind, _name in _names[_nrows].items():
+            _metrics = bench_load(_widget, _name)
+            _metrics.update(bench_plot(_widget, repeat))
+            _records.append(_make_record(
+                'rendering/{0:s}/{1:d}'.format(_kind, _nrows),
+                {'points': _nrows, 'format': _kind, 'repeat': repeat},
+                _metrics))
+    _widget.close()
+    return _records
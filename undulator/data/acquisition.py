@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""Columnar storage for test acquisitions."""
+
+import numpy as _np
+
+
+class AcquisitionBuffer(object):
+    """Growable columnar float64 buffer with a fixed column schema.
+
+    The samples are stored in fixed size chunks, each one a column major
+    (chunk_size x n_columns) float64 array, so appending a sample only
+    writes into preallocated memory and the buffer never copies the data
+    already stored.
+    """
+
+    def __init__(self, columns, chunk_size=10000):
+        """Initializes the buffer.
+
+        Args:
+            columns (list): column names, including units.
+            chunk_size (int): number of rows allocated at once."""
+        self.columns = list(columns)
+        self.chunk_size = int(chunk_size)
+        self.index = {_col: _i for _i, _col in enumerate(self.columns)}
+        self.nrows = 0
+        self.first_row = 0
+        self._chunks = []
+        self._row = self.chunk_size
+
+    def __len__(self):
+        return self.nrows
+
+    @property
+    def nstored(self):
+        """Number of rows still held by the buffer."""
+        return self.nrows - self.first_row
+
+    @property
+    def ncols(self):
+        """Number of columns."""
+        return len(self.columns)
+
+    def _new_chunk(self):
+        """Allocates a new chunk."""
+        _chunk = _np.full((self.chunk_size, self.ncols), _np.nan, order='F')
+        self._chunks.append(_chunk)
+        self._row = 0
+
+    def next_row(self):
+        """Reserves the next sample row.
+
+        Returns:
+            a writable view of the row (one element per column)."""
+        if self._row >= self.chunk_size:
+            self._new_chunk()
+        _row = self._chunks[-1][self._row]
+        self._row += 1
+        self.nrows += 1
+        return _row
+
+    def append(self, values):
+        """Appends a sample.
+
+        Args:
+            values (sequence): one value per column, in schema order."""
+        self.next_row()[:] = values
+
+    def _filled_chunks(self):
+        """Yields the used part of each chunk."""
+        for _chunk in self._chunks[:-1]:
+            yield _chunk
+        if len(self._chunks) > 0:
+            yield self._chunks[-1][:self._row]
+
+    def complete_chunks(self):
+        """Returns the stored chunks that are already full."""
+        return self._chunks[:-1]
+
+    def take(self, partial=False):
+        """Removes the stored samples from the buffer and returns them.
+
+        Args:
+            partial (bool): if True, also takes the current (partially
+                filled) chunk; otherwise only the complete chunks.
+
+        Returns:
+            a list of (nrows x ncols) arrays, in acquisition order."""
+        if partial:
+            _parts = list(self._filled_chunks())
+            self._chunks = []
+            self._row = self.chunk_size
+        else:
+            _parts = self._chunks[:-1]
+            self._chunks = self._chunks[-1:]
+        self.first_row += sum(len(_part) for _part in _parts)
+        return _parts
+
+    def column(self, name):
+        """Returns a contiguous copy of the stored samples of a column.
+
+        Args:
+            name (str): column name.
+
+        Returns:
+            a numpy.ndarray with the samples of the column."""
+        _i = self.index[name]
+        _parts = [_chunk[:, _i] for _chunk in self._filled_chunks()]
+        if len(_parts) == 0:
+            return _np.empty(0)
+        return _np.concatenate(_parts)
+
+    def to_array(self):
+        """Returns the stored samples as a (nstored x ncols) array."""
+        _parts = list(self._filled_chunks())
+        if len(_parts) == 0:
+            return _np.empty((0, self.ncols))
+        return _np.concatenate(_parts, axis=0)
+
+    def to_dataframe(self):
+        """Returns the stored samples as a pandas.DataFrame."""
+        import pandas as _pd
+        _array = self.to_array()
+        return _pd.DataFrame(
+            {_col: _array[:, _i] for _i, _col in enumerate(self.columns)},
+            columns=self.columns)
+
+    def clear(self):
+        """Removes all the samples."""
+        self.nrows = 0
+        self.first_row = 0
+        self._chunks = []
+        self._row = self.chunk_size
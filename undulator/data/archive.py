@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+"""Local archive of channel values with multi-resolution rollups.
+
+The values are stored as rollups of 1 s, 1 min and 1 h: for each period
+and channel, the minimum, mean and maximum of the samples. Each day has a
+directory (YYYY_MM_DD, local time) with the channel names (channels.json)
+and one file per level (1s.dat, 1min.dat, 1h.dat) of fixed size rows: the
+period start time as float64, then the minimums, means and maximums of the
+channels as float32. Rows are only appended, in time order, so a file is
+read as a memory map and a time range is found by binary search.
+
+Reads choose the finest level with a bounded number of rows in the range,
+so plotting months costs about as much as plotting minutes. The 1 s files
+are removed after some days; the coarser levels are kept.
+"""
+
+import os as _os
+import json as _json
+import time as _time
+import numpy as _np
+
+try:
+    import fcntl as _fcntl
+except ImportError:
+    _fcntl = None
+
+
+# level name, period in seconds; from the finest to the coarsest
+LEVELS = (
+    ('1s', 1),
+    ('1min', 60),
+    ('1h', 3600),
+    )
+CHANNELS_NAME = 'channels.json'
+LOCK_NAME = '.lock'
+_day_format = '%Y_%m_%d'
+
+
+def get_default_dir():
+    """Returns the archive directory: UNDULATOR_ARCHIVE_DIR, or archive in
+    the working directory."""
+    return _os.environ.get(
+        'UNDULATOR_ARCHIVE_DIR', _os.path.join(_os.getcwd(), 'archive'))
+
+
+def get_dtype(nchannels):
+    """Returns the row dtype of a level file."""
+    return _np.dtype([('t', '<f8'),
+                      ('min', '<f4', (nchannels,)),
+                      ('mean', '<f4', (nchannels,)),
+                      ('max', '<f4', (nchannels,))])
+
+
+def get_day(t):
+    """Returns the day directory name of a time (epoch)."""
+    return _time.strftime(_day_format, _time.localtime(t))
+
+
+def get_day_start(day):
+    """Returns the start time (epoch) of a day directory name, or None."""
+    try:
+        return _time.mktime(_time.strptime(day, _day_format))
+    except ValueError:
+        return None
+
+
+def reduce_rows(times, vmin, vmean, vmax, nbins):
+    """Merges consecutive rows so that at most about nbins remain.
+
+    Args:
+        times (numpy.ndarray): row times.
+        vmin (numpy.ndarray): (nrows x nchannels) minimums.
+        vmean (numpy.ndarray): (nrows x nchannels) means.
+        vmax (numpy.ndarray): (nrows x nchannels) maximums.
+        nbins (int): maximum number of rows.
+
+    Returns:
+        a tuple (times, vmin, vmean, vmax)."""
+    _size = int(_np.ceil(len(times)/max(int(nbins), 1)))
+    if _size <= 1:
+        return times, vmin, vmean, vmax
+    _starts = _np.arange(0, len(times), _size)
+    with _np.errstate(invalid='ignore'):
+        return (times[_starts],
+                _np.fmin.reduceat(vmin, _starts, axis=0),
+                _np.add.reduceat(_np.nan_to_num(vmean), _starts, axis=0) /
+                _np.add.reduceat(_np.isfinite(vmean), _starts, axis=0),
+                _np.fmax.reduceat(vmax, _starts, axis=0))
+
+
+class Rollup(object):
+    """Accumulates the minimum, mean and maximum of the channels over
+    fixed periods."""
+
+    def __init__(self, period, nchannels):
+        """Initializes the accumulators.
+
+        Args:
+            period (float): period in seconds.
+            nchannels (int): number of channels."""
+        self.period = period
+        self.start = None
+        self.count = _np.zeros(nchannels)
+        self.total = _np.zeros(nchannels)
+        self.vmin = _np.full(nchannels, _np.inf)
+        self.vmax = _np.full(nchannels, -_np.inf)
+
+    def add(self, t, vmin, vmean, vmax, count=1):
+        """Adds samples, or rows of a finer level.
+
+        Args:
+            t (float): time of the samples.
+            vmin (numpy.ndarray): minimums (the values for samples).
+            vmean (numpy.ndarray): means (the values for samples).
+            vmax (numpy.ndarray): maximums (the values for samples).
+            count (numpy.ndarray): number of samples of each mean.
+
+        Returns:
+            the finished period, as a tuple (start, vmin, vmean, vmax,
+            count), if t is in a new period, or None."""
+        _start = _np.floor(t/self.period)*self.period
+        _row = None
+        if self.start is not None and _start != self.start:
+            _row = self.pop()
+        self.start = _start
+        _valid = _np.isfinite(vmean)
+        _count = _np.where(_valid, count, 0)
+        self.count += _count
+        self.total += _np.where(_valid, vmean, 0)*_count
+        _np.fmin(self.vmin, vmin, out=self.vmin)
+        _np.fmax(self.vmax, vmax, out=self.vmax)
+        return _row
+
+    def pop(self):
+        """Returns the current period as a tuple (start, vmin, vmean, vmax,
+        count) and clears the accumulators, or None if empty."""
+        if self.start is None:
+            return None
+        _empty = self.count == 0
+        with _np.errstate(invalid='ignore', divide='ignore'):
+            _row = (self.start,
+                    _np.where(_empty, _np.nan, self.vmin),
+                    _np.where(_empty, _np.nan, self.total/self.count),
+                    _np.where(_empty, _np.nan, self.vmax),
+                    self.count.copy())
+        self.start = None
+        self.count[:] = 0
+        self.total[:] = 0
+        self.vmin[:] = _np.inf
+        self.vmax[:] = -_np.inf
+        return _row
+
+
+class Archive(object):
+    """Directory of archived channel rollups."""
+
+    def __init__(self, directory=None):
+        """Initializes the archive.
+
+        Args:
+            directory (str): archive directory, get_default_dir() if
+                None."""
+        if directory is None:
+            directory = get_default_dir()
+        self.directory = directory
+        self._channels = {}
+
+    def days(self):
+        """Returns the day directory names, sorted."""
+        if not _os.path.isdir(self.directory):
+            return []
+        return sorted(_name for _name in _os.listdir(self.directory)
+                      if get_day_start(_name) is not None)
+
+    def get_channels(self, day):
+        """Returns the channel names stored in a day, or None."""
+        _channels = self._channels.get(day)
+        if _channels is None:
+            _filename = _os.path.join(self.directory, day, CHANNELS_NAME)
+            if not _os.path.isfile(_filename):
+                return None
+            with open(_filename, 'r') as _f:
+                _channels = _json.load(_f)
+            self._channels[day] = _channels
+        return _channels
+
+    def channels(self):
+        """Returns the channel names of the most recent day."""
+        for _day in reversed(self.days()):
+            _channels = self.get_channels(_day)
+            if _channels is not None:
+                return _channels
+        return []
+
+    def get_filename(self, day, level):
+        """Returns the file name of a level of a day."""
+        return _os.path.join(self.directory, day, level + '.dat')
+
+    def read_rows(self, day, level):
+        """Returns the rows of a level of a day as a read-only memory map,
+        or None if there are none."""
+        _channels = self.get_channels(day)
+        _filename = self.get_filename(day, level)
+        if _channels is None or not _os.path.isfile(_filename):
+            return None
+        _dtype = get_dtype(len(_channels))
+        # a partially written last row is ignored
+        _nrows = _os.path.getsize(_filename) // _dtype.itemsize
+        if _nrows == 0:
+            return None
+        return _np.memmap(_filename, dtype=_dtype, mode='r', shape=(_nrows,))
+
+    def get_level(self, t_min, t_max, npoints):
+        """Returns the finest level with at most 10*npoints periods in the
+        time range."""
+        for _level, _period in LEVELS:
+            if (t_max - t_min)/_period <= 10*npoints:
+                return _level
+        return LEVELS[-1][0]
+
+    def read(self, channels, t_min, t_max, npoints=1000, level=None):
+        """Reads the rollups of channels over a time range.
+
+        Args:
+            channels (list): channel names; the missing ones are NaN.
+            t_min (float): range start (epoch).
+            t_max (float): range end (epoch).
+            npoints (int): maximum number of points, usually the plot
+                width in pixels.
+            level (str): level name, chosen from the range if None.
+
+        Returns:
+            a tuple (times, vmin, vmean, vmax, level), where the values are
+            (npoints x nchannels) float arrays."""
+        if level is None:
+            level = self.get_level(t_min, t_max, npoints)
+        _period = dict(LEVELS)[level]
+        _times = []
+        _values = ([], [], [])
+        for _day in self.days():
+            _day_start = get_day_start(_day)
+            # days may have 25 hours
+            if _day_start > t_max or _day_start + 90000 < t_min:
+                continue
+            _rows = self.read_rows(_day, level)
+            if _rows is None:
+                continue
+            _t = _rows['t']
+            # the rows are the period starts; the first one may start
+            # before t_min
+            _i0 = int(_np.searchsorted(_t, t_min - _period, side='right'))
+            _i1 = int(_np.searchsorted(_t, t_max, side='right'))
+            if _i1 <= _i0:
+                continue
+            _rows = _rows[_i0:_i1]
+            _stored = self.get_channels(_day)
+            _times.append(_np.array(_rows['t']))
+            for _key, _list in zip(('min', 'mean', 'max'), _values):
+                _data = _np.full((_i1 - _i0, len(channels)), _np.nan)
+                for _j, _name in enumerate(channels):
+                    if _name in _stored:
+                        _data[:, _j] = _rows[_key][:, _stored.index(_name)]
+                _list.append(_data)
+        if len(_times) == 0:
+            _empty = _np.zeros((0, len(channels)))
+            return _np.zeros(0), _empty, _empty, _empty, level
+        _result = reduce_rows(_np.concatenate(_times),
+                              *[_np.concatenate(_list) for _list in _values],
+                              nbins=npoints)
+        return _result + (level,)
+
+    def prune(self, keep_days=31, level='1s'):
+        """Removes the files of a level older than some days.
+
+        Returns:
+            the number of files removed."""
+        _t_min = _time.time() - keep_days*86400
+        _removed = 0
+        for _day in self.days():
+            _filename = self.get_filename(_day, level)
+            if get_day_start(_day) < _t_min and _os.path.isfile(_filename):
+                _os.remove(_filename)
+                _removed += 1
+        return _removed
+
+
+class ArchiveWriter(object):
+    """Rolls samples up into the levels and appends them to an archive.
+
+    Only one writer may use an archive directory at a time; on POSIX
+    systems it is locked while the writer is open."""
+
+    def __init__(self, archive, channels, flush_interval=10):
+        """Opens the archive for writing.
+
+        Args:
+            archive (Archive): archive.
+            channels (list): channel names.
+            flush_interval (float): time (in seconds) between writes.
+
+        Raises:
+            RuntimeError: if the archive is locked by another writer."""
+        self.archive = archive
+        self.channels = list(channels)
+        self.flush_interval = flush_interval
+        self.rollups = [Rollup(_period, len(self.channels))
+                        for _, _period in LEVELS]
+        self.pending = {_level: [] for _level, _ in LEVELS}
+        self.last_flush = _time.time()
+        self.rows_written = 0
+
+        _os.makedirs(archive.directory, exist_ok=True)
+        self._lock = open(_os.path.join(archive.directory, LOCK_NAME), 'w')
+        if _fcntl is not None:
+            try:
+                _fcntl.flock(self._lock, _fcntl.LOCK_EX | _fcntl.LOCK_NB)
+            except OSError:
+                self._lock.close()
+                self._lock = None
+                raise RuntimeError('The archive is used by another process: '
+                                   + archive.directory)
+
+    def add(self, t, values):
+        """Adds a sample of the channels.
+
+        Args:
+            t (float): sample time (epoch).
+            values (numpy.ndarray): channel values."""
+        _row = (t, values, values, values, 1)
+        for (_level, _), _rollup in zip(LEVELS, self.rollups):
+            _row = _rollup.add(*_row)
+            if _row is None:
+                break
+            self.pending[_level].append(_row)
+        if t - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes the finished periods."""
+        self.last_flush = _time.time()
+        for _level, _ in LEVELS:
+            _rows = self.pending[_level]
+            self.pending[_level] = []
+            # rows are grouped by day
+            _days = {}
+            for _row in _rows:
+                _days.setdefault(get_day(_row[0]), []).append(_row)
+            for _day, _day_rows in _days.items():
+                self.write(_day, _level, _day_rows)
+
+    def get_columns(self, day):
+        """Returns the indexes of the stored channels of a day in the
+        writer channels (-1 for channels not given), creating the day."""
+        _stored = self.archive.get_channels(day)
+        if _stored is None:
+            _dirname = _os.path.join(self.archive.directory, day)
+            _os.makedirs(_dirname, exist_ok=True)
+            with open(_os.path.join(_dirname, CHANNELS_NAME), 'w') as _f:
+                _json.dump(self.channels, _f, indent=1)
+            _stored = self.channels
+        # a day started with other channels keeps its columns
+        return _np.array([self.channels.index(_name)
+                          if _name in self.channels else -1
+                          for _name in _stored])
+
+    def write(self, day, level, rows):
+        """Appends rows (start, vmin, vmean, vmax, count) to a level of a
+        day."""
+        _columns = self.get_columns(day)
+        _valid = _columns >= 0
+        _data = _np.zeros(len(rows), dtype=get_dtype(len(_columns)))
+        for _i, _row in enumerate(rows):
+            _data['t'][_i] = _row[0]
+            for _key, _values in zip(('min', 'mean', 'max'), _row[1:4]):
+                _data[_key][_i] = _np.nan
+                _data[_key][_i, _valid] = _values[_columns[_valid]]
+        with open(self.archive.get_filename(day, level), 'ab') as _f:
+            _data.tofile(_f)
+        self.rows_written += len(rows)
+
+    def close(self):
+        """Writes the unfinished periods and unlocks the archive."""
+        if self._lock is None:
+            return
+        # the unfinished periods of every level are written, so the next
+        # run starts new ones
+        _row = None
+        for (_level, _), _rollup in zip(LEVELS, self.rollups):
+            if _row is not None:
+                _finished = _rollup.add(*_row)
+                if _finished is not None:
+                    self.pending[_level].append(_finished)
+            _row = _rollup.pop()
+            if _row is not None:
+                self.pending[_level].append(_row)
+        self.flush()
+        self._lock.close()
+        self._lock = None
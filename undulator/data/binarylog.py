@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""Binary columnar test log format.
+
+File layout:
+    8 bytes magic (b'UNDLOG01'),
+    8 bytes little-endian header length,
+    JSON header (comments, test positions, sampling statistics, columns,
+        units, number of rows and data offset), padded to a multiple of 64
+        bytes,
+    one contiguous little-endian float64 array per column.
+"""
+
+import os as _os
+import json as _json
+import struct as _struct
+import numpy as _np
+
+from undulator.data import textlog as _textlog
+
+
+MAGIC = b'UNDLOG01'
+EXTENSION = '.bin'
+_dtype = _np.dtype('<f8')
+_align = 64
+
+
+def get_unit(column):
+    """Returns the unit of a column name like 'ActualPosA [mm]'."""
+    if '[' in column and column.endswith(']'):
+        return column[column.rfind('[') + 1:-1]
+    return ''
+
+
+def get_binary_name(filename):
+    """Returns the binary log name corresponding to a text log name."""
+    return _os.path.splitext(filename)[0] + EXTENSION
+
+
+def _make_header(columns, nrows, comments, test_pos, sampling):
+    """Returns the encoded header, including magic and padding."""
+    _meta = {'comments': comments,
+             'test_positions': test_pos,
+             'sampling': sampling,
+             'columns': list(columns),
+             'units': [get_unit(_col) for _col in columns],
+             'nrows': int(nrows),
+             'dtype': _dtype.str}
+    # the data offset is stored in the header, so its length is iterated
+    _offset = _align
+    while True:
+        _meta['offset'] = _offset
+        _text = _json.dumps(_meta).encode('utf-8')
+        _size = len(MAGIC) + 8 + len(_text)
+        if _size <= _offset:
+            break
+        _offset = _size + (-_size % _align)
+    _head = MAGIC + _struct.pack('<Q', len(_text)) + _text
+    return _head + b'\0'*(_offset - len(_head))
+
+
+def write_binary_log(filename, columns, data, comments='', test_pos='',
+                     sampling=''):
+    """Writes a binary test log.
+
+    Args:
+        filename (str): output file name.
+        columns (list): column names, including units.
+        data (numpy.ndarray): (nrows x ncols) array, may be a memmap.
+        comments (str): test comments.
+        test_pos (str): test positions, as written in text logs.
+        sampling (str): sampling statistics, as written in text logs."""
+    _nrows = data.shape[0]
+    with open(filename, 'wb') as _f:
+        _f.write(_make_header(columns, _nrows, comments, test_pos, sampling))
+        for _i in range(len(columns)):
+            _np.ascontiguousarray(data[:, _i], dtype=_dtype).tofile(_f)
+
+
+def write_binary_log_from_raw(filename, raw_filename, columns, comments='',
+                              test_pos='', sampling='', remove_raw=True):
+    """Transposes a row major raw float64 file into a binary test log.
+
+    Args:
+        filename (str): output file name.
+        raw_filename (str): raw file with the rows written in sequence.
+        columns (list): column names, including units.
+        comments (str): test comments.
+        test_pos (str): test positions, as written in text logs.
+        sampling (str): sampling statistics, as written in text logs.
+        remove_raw (bool): removes the raw file after the conversion."""
+    _ncols = len(columns)
+    _nrows = _os.path.getsize(raw_filename) // (_dtype.itemsize*_ncols)
+    if _nrows > 0:
+        _raw = _np.memmap(raw_filename, dtype=_dtype, mode='r',
+                          shape=(_nrows, _ncols))
+    else:
+        _raw = _np.empty((0, _ncols), dtype=_dtype)
+    write_binary_log(filename, columns, _raw, comments, test_pos, sampling)
+    del _raw
+    if remove_raw:
+        _os.remove(raw_filename)
+
+
+def convert_dat_log(filename, binary_filename=None):
+    """Converts a text (.dat) test log to the binary format.
+
+    Args:
+        filename (str): text log file name.
+        binary_filename (str): output file name, defaults to the log name
+            with the binary extension.
+
+    Returns:
+        the binary log file name."""
+    if binary_filename is None:
+        binary_filename = get_binary_name(filename)
+    _info = _textlog.read_header(filename)
+    _df = _textlog.read_log(filename, _info['skiprows'])
+    write_binary_log(binary_filename, _df.columns.tolist(),
+                     _df.to_numpy(dtype=_dtype), _info['comments'],
+                     _info['test_positions'], _info['sampling'])
+    return binary_filename
+
+
+class BinaryLog(object):
+    """Memory mapped binary test log.
+
+    Columns are returned as read-only memmap arrays, so only the pages of
+    the columns actually used are read from disk.
+    """
+
+    def __init__(self, filename):
+        """Opens a binary test log.
+
+        Args:
+            filename (str): binary log file name."""
+        self.filename = filename
+        with open(filename, 'rb') as _f:
+            if _f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('Invalid binary log file: ' + filename)
+            _len = _struct.unpack('<Q', _f.read(8))[0]
+            _meta = _json.loads(_f.read(_len).decode('utf-8'))
+        self.comments = _meta['comments']
+        self.test_positions = _meta['test_positions']
+        self.sampling = _meta.get('sampling', '')
+        self.columns = _meta['columns']
+        self.units = _meta['units']
+        self.nrows = _meta['nrows']
+        self.index = {_col: _i for _i, _col in enumerate(self.columns)}
+        if self.nrows > 0:
+            self.data = _np.memmap(filename, dtype=_np.dtype(_meta['dtype']),
+                                   mode='r', offset=_meta['offset'],
+                                   shape=(len(self.columns), self.nrows))
+        else:
+            self.data = _np.empty((len(self.columns), 0))
+
+    def __len__(self):
+        return self.nrows
+
+    def __getitem__(self, name):
+        """Returns a column as a read-only array."""
+        return self.data[self.index[name]]
+
+    def to_dataframe(self):
+        """Returns a pandas.DataFrame with a copy of all the columns."""
+        import pandas as _pd
+        return _pd.DataFrame(
+            {_col: _np.array(self[_col]) for _col in self.columns},
+            columns=self.columns)
+
+
+if __name__ == '__main__':
+    import sys as _sys
+    for _filename in _sys.argv[1:]:
+        print(convert_dat_log(_filename))
@@ -1 +1,239 @@
-"""Undulator configuration module."""
+# -*- coding: utf-8 -*-
+
+"""Undulator configuration module.
+
+A configuration snapshot holds the values of the writable setpoints of
+undulator.db (movement, homing and overtravel parameters, home positions,
+cam scaling and coupling). All the setpoints are read in one bulk request,
+so a snapshot costs one CA round trip. A snapshot is compared with the
+live values, and restoring writes only the different values in one put
+transaction (undulator.devices.transaction): parallel puts verified with a
+second bulk read.
+
+The bo records (EnMove, EnHome, Stop...) are commands, and the ao records
+written by the PLC (ActualPosition, PositionError...) or for each move
+(MovePos) are not configuration, so they are not captured.
+
+Snapshots are saved as JSON files in a local directory.
+"""
+
+import os as _os
+import re as _re
+import json as _json
+import time as _time
+
+from undulator import devices as _devices
+from undulator.data import dbparser as _dbparser
+from undulator.devices.transaction import (
+    is_equal as _is_equal,
+    get_many as _get_many,
+    PutTransaction as _PutTransaction,
+    )
+
+
+# IOC macro of the database, as in the PV names of undulator.devices
+IOC = 'und'
+EXCLUDED_RECORDS = (
+    'ActualPosition',
+    'ActualVelocity',
+    'OutputCurrent',
+    'PositionError',
+    'TorqueReference',
+    'AxisStatus',
+    'MotionStatus',
+    'MovePos',
+    )
+EXTENSION = '.json'
+_name_re = _re.compile(r'^[\w][\w .-]*$')
+
+
+def get_default_dir():
+    """Returns the snapshots directory: UNDULATOR_CONFIG_DIR, or
+    configurations in the working directory."""
+    return _os.environ.get('UNDULATOR_CONFIG_DIR', _os.path.join(
+        _os.getcwd(), 'configurations'))
+
+
+def is_setpoint(record):
+    """Returns True if a database record is a configuration setpoint."""
+    if record.rtype != 'ao':
+        return False
+    return record.name.split(':')[-1] not in EXCLUDED_RECORDS
+
+
+def get_setpoint_names(db=_dbparser.DEFAULT_DB):
+    """Returns the PV names of the configuration setpoints of a database.
+
+    Raises:
+        FileNotFoundError: if the database is not found."""
+    _records = _dbparser.read_db(db, {'IOC': IOC})
+    return [_name for _name, _record in _records.items()
+            if is_setpoint(_record)]
+
+
+def diff(values, live):
+    """Compares saved values with live values.
+
+    Args:
+        values (dict): PV name -> saved value.
+        live (dict): PV name -> live value (None if not read).
+
+    Returns:
+        a list of (name, saved value, live value) of the different
+        values, in the saved order; the values not read always differ."""
+    return [(_name, _value, live.get(_name))
+            for _name, _value in values.items()
+            if not _is_equal(_value, live.get(_name))]
+
+
+def read_values(names, timeout=1.0):
+    """Reads PVs from the IOC in one bulk request (one round trip).
+
+    Args:
+        names (list): PV names.
+        timeout (float): maximum waiting time (in seconds).
+
+    Returns:
+        a dict PV name -> value, None for the PVs not connected or not
+        answered."""
+    _values = _get_many([_devices.pvs.get(_name) for _name in names],
+                        timeout)
+    return {_name: None if _value is None else float(_value)
+            for _name, _value in zip(names, _values)}
+
+
+class Snapshot(object):
+    """Named set of setpoint values."""
+
+    def __init__(self, name, values, comments='', time=None):
+        """Initializes the snapshot.
+
+        Args:
+            name (str): snapshot name (letters, digits, spaces, '_', '.'
+                and '-').
+            values (dict): PV name -> value.
+            comments (str): snapshot comments.
+            time (float): snapshot time (epoch), now if None.
+
+        Raises:
+            ValueError: if the name is invalid."""
+        if _name_re.match(name) is None:
+            raise ValueError('Invalid snapshot name: ' + repr(name))
+        self.name = name
+        self.values = dict(values)
+        self.comments = comments
+        self.time = _time.time() if time is None else time
+
+    def to_dict(self):
+        """Returns the snapshot as a dict."""
+        return {'name': self.name,
+                'time': self.time,
+                'date': _time.strftime('%Y-%m-%d %H:%M:%S',
+                                       _time.localtime(self.time)),
+                'comments': self.comments,
+                'values': self.values}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a snapshot from a dict made by to_dict."""
+        return cls(data['name'], data['values'], data.get('comments', ''),
+                   data.get('time'))
+
+    @classmethod
+    def take(cls, name, comments='', names=None, timeout=1.0):
+        """Reads the live setpoints in one bulk request.
+
+        Args:
+            name (str): snapshot name.
+            comments (str): snapshot comments.
+            names (list): PV names, get_setpoint_names() if None.
+            timeout (float): maximum reading time (in seconds).
+
+        Raises:
+            RuntimeError: if some setpoints could not be read."""
+        if names is None:
+            names = get_setpoint_names()
+        _values = read_values(names, timeout)
+        _missing = [_name for _name, _value in _values.items()
+                    if _value is None]
+        if len(_missing) > 0:
+            raise RuntimeError('Could not read: ' + ', '.join(_missing))
+        return cls(name, _values, comments)
+
+    def compare(self, timeout=1.0):
+        """Compares the snapshot with the live values.
+
+        Returns:
+            a list of (name, saved value, live value) of the different
+            values."""
+        return diff(self.values, read_values(list(self.values), timeout))
+
+    def restore(self, timeout=2.0, verify=True):
+        """Writes the values that differ from the live ones.
+
+        Args:
+            timeout (float): maximum time (in seconds) of each step: the
+                reading, the writing and the verification.
+            verify (bool): reads the written values back.
+
+        Returns:
+            a dict with the written names ('changed'), the names not
+            written or whose readback differs ('failed') and the elapsed
+            time."""
+        _t = _time.perf_counter()
+        _changed = [_name for _name, _, _ in self.compare(timeout)]
+        _transaction = _PutTransaction(timeout, 'restore ' + self.name)
+        for _name in _changed:
+            _transaction.add(_devices.pvs.get(_name), self.values[_name],
+                             verify=verify)
+        _transaction.run()
+        return {'changed': _changed, 'failed': _transaction.failed,
+                'elapsed': _time.perf_counter() - _t}
+
+
+class ConfigurationStore(object):
+    """Directory of configuration snapshots."""
+
+    def __init__(self, directory=None):
+        """Initializes the store.
+
+        Args:
+            directory (str): snapshots directory, get_default_dir() if
+                None."""
+        if directory is None:
+            directory = get_default_dir()
+        self.directory = directory
+
+    def get_filename(self, name):
+        """Returns the file name of a snapshot."""
+        return _os.path.join(self.directory, name + EXTENSION)
+
+    def names(self):
+        """Returns the snapshot names, the most recent first."""
+        if not _os.path.isdir(self.directory):
+            return []
+        _names = [_name[:-len(EXTENSION)]
+                  for _name in _os.listdir(self.directory)
+                  if _name.endswith(EXTENSION)]
+        return sorted(_names, key=lambda _name: -_os.path.getmtime(
+            self.get_filename(_name)))
+
+    def save(self, snapshot):
+        """Saves a snapshot, replacing the one with the same name."""
+        _os.makedirs(self.directory, exist_ok=True)
+        _filename = self.get_filename(snapshot.name)
+        with open(_filename + '.tmp', 'w') as _f:
+            _json.dump(snapshot.to_dict(), _f, indent=1)
+        _os.replace(_filename + '.tmp', _filename)
+
+    def load(self, name):
+        """Loads a snapshot.
+
+        Raises:
+            FileNotFoundError: if the snapshot does not exist."""
+        with open(self.get_filename(name), 'r') as _f:
+            return Snapshot.from_dict(_json.load(_f))
+
+    def remove(self, name):
+        """Removes a snapshot."""
+        _os.remove(self.get_filename(name))
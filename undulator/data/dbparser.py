@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""Parser of EPICS database (.db) files."""
+
+import os as _os
+import re as _re
+import collections as _collections
+
+
+# installed with the package
+DEFAULT_DB = _os.path.join(_os.path.dirname(_os.path.dirname(
+    _os.path.abspath(__file__))), 'undulator.db')
+
+_record_re = _re.compile(
+    r'record\(\s*(\w+)\s*,\s*"([^"]+)"\s*\)\s*\{(.*?)\}', _re.DOTALL)
+_field_re = _re.compile(r'field\(\s*(\w+)\s*,\s*"([^"]*)"\s*\)')
+
+Record = _collections.namedtuple('Record', ['rtype', 'name', 'fields'])
+
+
+def parse_db(text, macros=None):
+    """Parses the records of an EPICS database.
+
+    Args:
+        text (str): database file content.
+        macros (dict): macro substitutions, e.g. {'IOC': 'und'}.
+
+    Returns:
+        an OrderedDict record name -> Record. Repeated records keep the
+        first definition."""
+    if macros is not None:
+        for _key, _value in macros.items():
+            text = text.replace('$({0:s})'.format(_key), _value)
+    _lines = [_line for _line in text.splitlines()
+              if not _line.lstrip().startswith('#')]
+    _records = _collections.OrderedDict()
+    for _match in _record_re.finditer('\n'.join(_lines)):
+        _rtype, _name, _body = _match.groups()
+        if _name in _records:
+            continue
+        _fields = dict(_field_re.findall(_body))
+        _records[_name] = Record(_rtype, _name, _fields)
+    return _records
+
+
+def read_db(filename, macros=None):
+    """Reads and parses an EPICS database file.
+
+    Args:
+        filename (str): database file name.
+        macros (dict): macro substitutions, e.g. {'IOC': 'und'}.
+
+    Returns:
+        an OrderedDict record name -> Record."""
+    with open(filename, 'r') as _f:
+        return parse_db(_f.read(), macros)
+
+
+def scan_period(record):
+    """Returns the scan period (in seconds) of a periodic record, or None
+    for passive records."""
+    _scan = record.fields.get('SCAN', 'Passive')
+    if _scan.endswith('second'):
+        return float(_scan.split()[0])
+    return None
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""Decimation of long time series for plotting."""
+
+import numpy as _np
+
+
+def visible_slice(x, x_min, x_max):
+    """Returns the index slice of a sorted array inside [x_min, x_max],
+    extended by one point on each side so lines reach the plot borders."""
+    _i0 = max(int(_np.searchsorted(x, x_min, side='left')) - 1, 0)
+    _i1 = min(int(_np.searchsorted(x, x_max, side='right')) + 1, len(x))
+    return slice(_i0, _i1)
+
+
+def minmax_indices(y, nbins):
+    """Returns the indices of the minimum and maximum of each bin.
+
+    The array is split in nbins bins of equal length; the min and max of
+    each bin are kept in their original order, so the decimated line has
+    the same envelope as the full one. NaN values are skipped.
+
+    Args:
+        y (numpy.ndarray): values.
+        nbins (int): number of bins.
+
+    Returns:
+        a sorted numpy.ndarray of indices."""
+    _n = len(y)
+    if _n <= 2*nbins:
+        return _np.arange(_n)
+    _size = _n // nbins
+    _used = _size*nbins
+    # non-finite values are never a bin min or max; a bin without finite
+    # values keeps its first index
+    _finite = _np.isfinite(y)
+    _low = _np.where(_finite, y, _np.inf)
+    _high = _np.where(_finite, y, -_np.inf)
+    _offsets = _np.arange(nbins)*_size
+    _imin = _np.argmin(_low[:_used].reshape(nbins, _size), axis=1) + _offsets
+    _imax = _np.argmax(_high[:_used].reshape(nbins, _size), axis=1) + _offsets
+    _idx = _np.column_stack([_np.minimum(_imin, _imax),
+                             _np.maximum(_imin, _imax)]).ravel()
+    _extra = [_n - 1]
+    if _used < _n - 1:
+        _extra = sorted(set([_used + int(_np.argmin(_low[_used:])),
+                             _used + int(_np.argmax(_high[_used:])), _n - 1]))
+    return _np.concatenate([[0], _idx, _extra])
+
+
+def minmax_decimate(x, y, x_min=None, x_max=None, nbins=1000):
+    """Decimates a time series keeping the min and max of each bin of the
+    visible range, so the result size depends only on nbins.
+
+    Args:
+        x (numpy.ndarray): sorted x values.
+        y (numpy.ndarray): y values.
+        x_min (float): visible range start, defaults to the first x value.
+        x_max (float): visible range end, defaults to the last x value.
+        nbins (int): number of bins, usually the plot width in pixels.
+
+    Returns:
+        a tuple (x, y) with the decimated arrays."""
+    x = _np.asarray(x)
+    y = _np.asarray(y)
+    if len(x) == 0:
+        return x, y
+    if x_min is None:
+        x_min = x[0]
+    if x_max is None:
+        x_max = x[-1]
+    _s = visible_slice(x, x_min, x_max)
+    _x = x[_s]
+    _y = y[_s]
+    _idx = minmax_indices(_y, max(int(nbins), 1))
+    return _x[_idx], _y[_idx]
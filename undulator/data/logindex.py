@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""Persistent index and in-memory cache of test logs."""
+
+import os as _os
+import json as _json
+import collections as _collections
+
+from undulator.data import binarylog as _binarylog
+from undulator.data import textlog as _textlog
+
+
+INDEX_NAME = '.log_index.json'
+LOG_EXTENSIONS = ('.dat', _binarylog.EXTENSION)
+
+
+def count_lines(filename, block_size=1 << 20):
+    """Counts the lines of a file reading it in binary blocks."""
+    _count = 0
+    with open(filename, 'rb') as _f:
+        _block = _f.read(block_size)
+        while _block:
+            _count += _block.count(b'\n')
+            _block = _f.read(block_size)
+    return _count
+
+
+def scan_logs(directory):
+    """Lists the test logs of a directory without reading them.
+
+    Returns:
+        a dict file name -> dict with path, mtime and size."""
+    _logs = {}
+    with _os.scandir(directory) as _it:
+        for _entry in _it:
+            if not _entry.name.endswith(LOG_EXTENSIONS):
+                continue
+            if not _entry.is_file():
+                continue
+            _stat = _entry.stat()
+            _logs[_entry.name] = {'path': _entry.path,
+                                  'mtime': _stat.st_mtime,
+                                  'size': _stat.st_size}
+    return _logs
+
+
+def read_log_info(filename):
+    """Reads the metadata of a text or binary test log.
+
+    Returns:
+        a dict with comments, test positions, sampling statistics, number
+        of rows and columns."""
+    if filename.endswith(_binarylog.EXTENSION):
+        _log = _binarylog.BinaryLog(filename)
+        return {'comments': _log.comments,
+                'test_positions': _log.test_positions,
+                'sampling': _log.sampling,
+                'nrows': _log.nrows,
+                'columns': _log.columns}
+    _info = _textlog.read_header(filename)
+    _info['nrows'] = max(count_lines(filename) - _info['skiprows'] - 1, 0)
+    return _info
+
+
+class LogIndex(object):
+    """Index of the test logs of a directory, saved in the directory.
+
+    Each entry stores path, mtime, size, comments, test positions, number
+    of rows and column list. Only new or modified files are read when the
+    index is updated.
+    """
+
+    def __init__(self, directory='.'):
+        """Loads the index of a directory.
+
+        Args:
+            directory (str): test logs directory."""
+        self.directory = directory
+        self.filename = _os.path.join(directory, INDEX_NAME)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """Loads the index file, if it exists."""
+        try:
+            with open(self.filename, 'r') as _f:
+                self.entries = _json.load(_f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Saves the index file."""
+        _tmp = self.filename + '.tmp'
+        with open(_tmp, 'w') as _f:
+            _json.dump(self.entries, _f)
+        _os.replace(_tmp, self.filename)
+
+    def update(self):
+        """Adds new or modified logs and removes missing ones.
+
+        Returns:
+            True if the index changed."""
+        _changed = False
+        _found = scan_logs(self.directory)
+        for _name, _file in _found.items():
+            _old = self.entries.get(_name)
+            if (_old is not None and _old['mtime'] == _file['mtime']
+                    and _old['size'] == _file['size']):
+                continue
+            try:
+                _info = read_log_info(_file['path'])
+            except Exception:
+                continue
+            _info.update(_file)
+            self.entries[_name] = _info
+            _changed = True
+        for _name in list(self.entries.keys()):
+            if _name not in _found:
+                del self.entries[_name]
+                _changed = True
+        if _changed:
+            try:
+                self.save()
+            except OSError:
+                pass
+        return _changed
+
+    def test_names(self):
+        """Returns the sorted test names (file names without extension)."""
+        return sorted(set(_name.split('.')[0] for _name in self.entries))
+
+    def get(self, test_name):
+        """Returns the entry of a test, preferring the binary log.
+
+        Args:
+            test_name (str): file name without extension.
+
+        Returns:
+            the entry dict, or None if the test is not indexed."""
+        for _ext in reversed(LOG_EXTENSIONS):
+            _entry = self.entries.get(test_name + _ext)
+            if _entry is not None:
+                return _entry
+        return None
+
+
+class LogCache(object):
+    """Least recently used cache of loaded logs bounded by memory size and
+    by number of logs."""
+
+    def __init__(self, max_bytes=512*2**20, max_entries=16):
+        """Initializes the cache.
+
+        Args:
+            max_bytes (int): maximum memory (in bytes) used by the cached
+                data.
+            max_entries (int): maximum number of cached logs, which bounds
+                the open memory maps."""
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.nbytes = 0
+        self._items = _collections.OrderedDict()
+
+    @staticmethod
+    def key(entry):
+        """Returns the cache key of an index entry."""
+        return (entry['path'], entry['mtime'], entry['size'])
+
+    @staticmethod
+    def sizeof(data):
+        """Returns the memory (in bytes) used by a loaded log."""
+        if hasattr(data, 'memory_usage'):
+            return int(data.memory_usage(index=True).sum())
+        # memory mapped logs only hold the page cache
+        return 0
+
+    def get(self, key):
+        """Returns the cached data and marks it as recently used, or None."""
+        _item = self._items.get(key)
+        if _item is None:
+            return None
+        self._items.move_to_end(key)
+        return _item[0]
+
+    def put(self, key, data):
+        """Adds data to the cache, evicting the least recently used."""
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        _size = self.sizeof(data)
+        if _size > self.max_bytes:
+            return
+        self._items[key] = (data, _size)
+        self.nbytes += _size
+        while (self.nbytes > self.max_bytes or
+               len(self._items) > self.max_entries):
+            _key, (_data, _size) = self._items.popitem(last=False)
+            self.nbytes -= _size
+
+    def clear(self):
+        """Removes all the cached data."""
+        self._items.clear()
+        self.nbytes = 0
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""Background writer for test logs."""
+
+import os as _os
+import sys as _sys
+import time as _time
+import queue as _queue
+import threading as _threading
+import traceback as _traceback
+import numpy as _np
+
+
+def format_chunk(chunk, fmt='%.12g', delimiter='\t'):
+    """Formats a block of samples as text with a single format operation.
+
+    Args:
+        chunk (numpy.ndarray): (nrows x ncols) array.
+        fmt (str): format of each value.
+        delimiter (str): column separator.
+
+    Returns:
+        a str with one line per row."""
+    _nrows, _ncols = chunk.shape
+    if _nrows == 0:
+        return ''
+    _row_fmt = delimiter.join([fmt]*_ncols) + '\n'
+    return (_row_fmt*_nrows) % tuple(chunk.ravel())
+
+
+class LogWriter(_threading.Thread):
+    """Thread writes test log chunks to disk during the acquisition.
+
+    The acquisition loop hands sample blocks to a bounded queue, so the
+    memory used by a test does not grow with its length. The header is
+    written and synced as soon as the thread starts.
+    """
+
+    def __init__(self, filename, header, maxsize=64, fsync_interval=5,
+                 fmt='%.12g', raw_filename=None):
+        """Initializes the thread.
+
+        Args:
+            filename (str): log file name.
+            header (str): log header, including the column names line.
+            maxsize (int): maximum number of chunks waiting in the queue.
+            fsync_interval (float): minimum interval (in seconds) between
+                two file syncs.
+            fmt (str): format of each value.
+            raw_filename (str): if given, the chunks are also written to
+                this file as row major float64 values."""
+        super().__init__()
+        self.daemon = True
+        self.name = 'LogWriter'
+
+        self.filename = filename
+        self.header = header
+        self.fsync_interval = fsync_interval
+        self.fmt = fmt
+        self.raw_filename = raw_filename
+
+        self.queue = _queue.Queue(maxsize=maxsize)
+        self.rows_written = 0
+        self.error = None
+
+    def write(self, chunk):
+        """Queues a block of samples to be written.
+
+        Blocks if the queue is full, so no sample is lost.
+
+        Args:
+            chunk (numpy.ndarray): (nrows x ncols) array."""
+        if len(chunk) > 0:
+            self.queue.put(chunk)
+
+    def close(self, timeout=None):
+        """Writes the queued chunks, closes the file and waits the thread.
+
+        Args:
+            timeout (float): maximum time (in seconds) to wait."""
+        self.queue.put(None)
+        self.join(timeout)
+
+    def rewrite_header_line(self, prefix, text):
+        """Overwrites a header line reserved with trailing spaces, after
+        the log is closed. The new text is truncated to the reserved width.
+
+        Args:
+            prefix (str): start of the header line, e.g. 'Sampling: '.
+            text (str): new line content after the prefix."""
+        _header = self.header.encode('utf-8')
+        _start = _header.find(prefix.encode('utf-8'))
+        if _start < 0:
+            return
+        _start += len(prefix.encode('utf-8'))
+        _width = _header.find(b'\n', _start) - _start
+        _text = text.encode('utf-8')[:_width].ljust(_width)
+        with open(self.filename, 'r+b') as _f:
+            _f.seek(_start)
+            _f.write(_text)
+
+    def run(self):
+        _raw = None
+        try:
+            if self.raw_filename is not None:
+                _raw = open(self.raw_filename, 'wb')
+            with open(self.filename, 'w', encoding='utf-8',
+                      newline='\n') as _f:
+                _f.write(self.header)
+                if not self.header.endswith('\n'):
+                    _f.write('\n')
+                _f.flush()
+                _os.fsync(_f.fileno())
+                _last_sync = _time.monotonic()
+                while True:
+                    _chunk = self.queue.get()
+                    if _chunk is None:
+                        break
+                    _f.write(format_chunk(_chunk, self.fmt))
+                    if _raw is not None:
+                        _np.ascontiguousarray(
+                            _chunk, dtype='<f8').tofile(_raw)
+                    self.rows_written += len(_chunk)
+                    if _time.monotonic() - _last_sync > self.fsync_interval:
+                        _f.flush()
+                        _os.fsync(_f.fileno())
+                        _last_sync = _time.monotonic()
+                _f.flush()
+                _os.fsync(_f.fileno())
+        except Exception as _e:
+            self.error = _e
+            _traceback.print_exc(file=_sys.stdout)
+            # keeps draining the queue so the acquisition is never blocked
+            while self.queue.get() is not None:
+                pass
+        finally:
+            if _raw is not None:
+                _raw.close()
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+
+"""Step response analysis of discrete tests.
+
+A discrete test log is split in one segment per commanded position, from
+the MovePos setpoint of the step to the setpoint of the next one. The
+boundaries come from the MovePos readback and MoveStatus transitions saved
+by the test engine in log_<timestamp>_events.txt, or, for logs without an
+events file, from the motion of the axis with the largest travel.
+
+For each segment and axis the rise time (10 to 90 % of the step), the
+settling time into the tolerance band (from the move command), the
+overshoot, the steady-state error (mean over the end of the dwell) and the
+RMS following error while moving are computed for all the segments at
+once, with segment reductions of the sample arrays.
+"""
+
+import os as _os
+import numpy as _np
+
+
+AXIS_NAMES = ('A', 'B', 'C', 'D')
+METRICS = (
+    ('rise_time', 'Rise [s]'),
+    ('settling_time', 'Settling [s]'),
+    ('overshoot', 'Overshoot [mm]'),
+    ('overshoot_pct', 'Overshoot [%]'),
+    ('steady_state_error', 'SS error [mm]'),
+    ('rms_following_error', 'RMS PosError [mm]'),
+    )
+
+
+def get_events_name(log_name):
+    """Returns the events file name of a text or binary test log."""
+    return _os.path.splitext(log_name)[0] + '_events.txt'
+
+
+def read_events(filename):
+    """Reads a test events file.
+
+    Returns:
+        a list of (time, name) tuples, with times relative to the test
+        start."""
+    _events = []
+    with open(filename, 'r') as _f:
+        _f.readline()
+        for _line in _f:
+            _fields = _line.rstrip('\n').split('\t')
+            if len(_fields) < 3:
+                continue
+            _events.append((float(_fields[0]), _fields[2]))
+    return _events
+
+
+def parse_target(name):
+    """Returns the commanded position of a step event ('pos 1.5: ...'), or
+    None."""
+    if not name.startswith('pos ') or ':' not in name:
+        return None
+    try:
+        return float(name[4:name.index(':')])
+    except ValueError:
+        return None
+
+
+def segments_from_events(events):
+    """Returns the discrete test segments of the sequencer events.
+
+    Args:
+        events (list): (time, name) tuples of read_events.
+
+    Returns:
+        a dict with the target, t_start (setpoint), t_move (move command)
+        and t_stop (MoveStatus off, or in position for a step without a
+        move) arrays; missing times are NaN."""
+    _steps = []
+    _current = None
+    for _time, _name in events:
+        _target = parse_target(_name)
+        if _target is None:
+            continue
+        _prefix = _name[:_name.index(':')]
+        # consecutive steps to the same position have the same prefix, a
+        # setpoint or move command after a stop starts the next one
+        _step_start = _name[len(_prefix) + 2:].startswith(
+            ('MovePos', 'EnMove put complete'))
+        if _current is None or _current['prefix'] != _prefix or (
+                _step_start and not _np.isnan(_current['t_stop'])):
+            _current = {'prefix': _prefix, 'target': _target,
+                        't_start': _time, 't_move': _np.nan,
+                        't_stop': _np.nan}
+            _steps.append(_current)
+        if _name.endswith(('aborted', 'timeout')):
+            continue
+        if _name.endswith('EnMove put complete'):
+            _current['t_move'] = _time
+        elif _name.endswith('MoveStatus on') and _np.isnan(
+                _current['t_move']):
+            _current['t_move'] = _time
+        elif _name.endswith(('MoveStatus off', 'in position')):
+            # a step already at its target has no move
+            _current['t_stop'] = _time
+    return {_key: _np.array([_step[_key] for _step in _steps], dtype=float)
+            for _key in ('target', 't_start', 't_move', 't_stop')}
+
+
+def segments_from_motion(t, x, targets, velocity_tol=0.01, min_rest=0.5,
+                         position_tol=0.01):
+    """Returns the discrete test segments detected from the motion of an
+    axis, for logs without events.
+
+    The moves are matched to the targets in order; a target within
+    position_tol of the position before the next move needs no move and
+    has no segment.
+
+    Args:
+        t (array): sample times.
+        x (array): axis position.
+        targets (list): commanded positions, in order.
+        velocity_tol (float): speed (in mm/s) above which the axis moves.
+        min_rest (float): stops shorter than this (in seconds) are part of
+            the move.
+        position_tol (float): distance (in mm) below which a target is
+            already reached.
+
+    Returns:
+        a dict like segments_from_events."""
+    _t = _np.asarray(t, dtype=float)
+    _x = _np.asarray(x, dtype=float)
+    _keys = ('target', 't_start', 't_move', 't_stop')
+    if len(_t) < 2 or len(targets) == 0:
+        return {_key: _np.zeros(0) for _key in _keys}
+    _moving = _np.abs(_np.gradient(_x, _t)) > velocity_tol
+    _edges = _np.diff(_moving.astype(_np.int8))
+    # index of the last sample at rest before each move
+    _rest = _np.flatnonzero(_edges == 1)
+    _stops = _t[_np.flatnonzero(_edges == -1) + 1]
+    if _moving[0]:
+        _rest = _np.insert(_rest, 0, 0)
+    if _moving[-1]:
+        _stops = _np.append(_stops, _t[-1])
+    _starts = _t[_np.minimum(_rest + 1, len(_t) - 1)]
+    if _moving[0]:
+        _starts[0] = _t[0]
+    # merges the moves separated by short stops
+    _keep = _np.ones(len(_starts), dtype=bool)
+    _keep[1:] = _starts[1:] - _stops[:-1] >= min_rest
+    _stops = _stops[_np.append(_keep[1:], True)]
+    _starts = _starts[_keep]
+    _before = _x[_rest[_keep]]
+
+    _targets = []
+    for _target in targets:
+        if len(_targets) == len(_starts):
+            break
+        if abs(_target - _before[len(_targets)]) > position_tol:
+            _targets.append(_target)
+    _n = len(_targets)
+    return {'target': _np.asarray(_targets, dtype=float),
+            't_start': _starts[:_n], 't_move': _starts[:_n],
+            't_stop': _stops[:_n]}
+
+
+def analyze(t, positions, errors, segments, tolerance=1e-3,
+            steady_fraction=0.2):
+    """Computes the step response metrics of all the segments and axes.
+
+    Args:
+        t (array): n sample times.
+        positions (array): (n x naxes) actual positions.
+        errors (array): (n x naxes) position (following) errors.
+        segments (dict): segments_from_events or segments_from_motion.
+        tolerance (float): settling band half width in mm.
+        steady_fraction (float): final fraction of the dwell (after
+            MoveStatus off) averaged for the steady-state error.
+
+    Returns:
+        a dict with the segment arrays, the step (nseg x naxes) and each
+        metric of METRICS as a (nseg x naxes) array (NaN if undefined)."""
+    _t = _np.asarray(t, dtype=float)
+    _x = _np.asarray(positions, dtype=float)
+    _e = _np.asarray(errors, dtype=float)
+    if _x.ndim == 1:
+        _x, _e = _x[:, None], _e[:, None]
+    _order = _np.argsort(segments['t_start'], kind='stable')
+    _seg = {_key: _np.asarray(_value, dtype=float)[_order]
+            for _key, _value in segments.items()}
+    _nseg, _naxes = len(_seg['target']), _x.shape[1]
+
+    # a missing move command or stop is taken at the segment boundaries
+    _t_start = _seg['t_start']
+    _t_end = _np.append(_t_start[1:], _np.inf)
+    _t_move = _np.where(_np.isnan(_seg['t_move']), _t_start, _seg['t_move'])
+    _t_stop = _np.where(_np.isnan(_seg['t_stop']), _t_end, _seg['t_stop'])
+
+    _result = dict(_seg)
+    _result['step'] = _np.full((_nseg, _naxes), _np.nan)
+    for _key, _ in METRICS:
+        _result[_key] = _np.full((_nseg, _naxes), _np.nan)
+    if _nseg == 0 or len(_t) == 0:
+        return _result
+
+    _i_start = _np.searchsorted(_t, _t_start)
+    _i_end = _np.append(_i_start[1:], len(_t))
+    _valid = _i_end > _i_start
+    if not _valid.any():
+        return _result
+    # reductions over the valid segments, which partition the samples
+    # from the first segment start to the end of the log
+    _first = _i_start[_valid][0]
+    _offsets = _i_start[_valid] - _first
+    _sid = _np.repeat(_np.flatnonzero(_valid), (_i_end - _i_start)[_valid])
+    _ts, _xs, _es = _t[_first:], _x[_first:], _e[_first:]
+    _idx = _np.arange(len(_ts))
+    _big = len(_ts)
+
+    _i_before = _np.clip(_np.searchsorted(_t, _t_move) - 1, 0, len(_t) - 1)
+    _x0 = _x[_i_before]
+    _target = _seg['target'][:, None]
+    _step = _target - _x0
+    _sign = _np.sign(_step)
+    _moves = _np.abs(_step) > tolerance
+    _result['step'] = _step
+
+    _after = (_ts >= _t_move[_sid])[:, None]
+    _moving = ((_ts >= _t_move[_sid]) & (_ts < _t_stop[_sid]))[:, None]
+    _dev = _xs - _target[_sid]
+    with _np.errstate(invalid='ignore', divide='ignore'):
+        _progress = (_xs - _x0[_sid])/_step[_sid]
+
+    def _reduce(ufunc, values):
+        _out = _np.full((_nseg, _naxes), _np.nan)
+        _out[_valid] = ufunc.reduceat(values, _offsets, axis=0)
+        return _out
+
+    def _index(mask):
+        return _np.where(mask, _idx[:, None], _big)
+
+    # rise time: first crossings of 10 % and 90 % of the step
+    _i10 = _reduce(_np.minimum, _index(_after & (_progress >= 0.1)))
+    _i90 = _reduce(_np.minimum, _index(_after & (_progress >= 0.9)))
+    _ok = _moves & (_i90 < _big)
+    _t_ext = _np.append(_ts, _np.nan)
+    _rise = _t_ext[_np.where(_ok, _i90, _big).astype(int)] - _t_ext[
+        _np.where(_ok, _i10, _big).astype(int)]
+    _result['rise_time'] = _np.where(_ok, _rise, _np.nan)
+
+    # settling time: after the last sample out of the band
+    _i_last_out = _reduce(_np.maximum, _np.where(
+        _after & (_np.abs(_dev) > tolerance), _idx[:, None], -1))
+    _i_settled = _np.where(_i_last_out < 0,
+                           _reduce(_np.minimum, _index(_after)),
+                           _i_last_out + 1)
+    _settled = _moves & (_i_settled < (_i_end - _first)[:, None])
+    _i_settled = _np.where(_settled, _i_settled, _big).astype(int)
+    _result['settling_time'] = _np.where(
+        _settled, _t_ext[_i_settled] - _t_move[:, None], _np.nan)
+
+    # overshoot beyond the target, in the step direction
+    _over = _reduce(_np.fmax, _np.where(
+        _after, _dev*_sign[_sid], -_np.inf))
+    _over = _np.where(_moves & _np.isfinite(_over),
+                      _np.maximum(_over, 0), _np.nan)
+    _result['overshoot'] = _over
+    with _np.errstate(invalid='ignore', divide='ignore'):
+        _result['overshoot_pct'] = 100*_over/_np.abs(_step)
+
+    def _mean(values, mask):
+        _mask = mask & _np.isfinite(values)
+        _sum = _reduce(_np.add, _np.where(_mask, values, 0))
+        _count = _reduce(_np.add, _mask.astype(float))
+        with _np.errstate(invalid='ignore', divide='ignore'):
+            return _np.where(_count > 0, _sum/_count, _np.nan)
+
+    # steady-state error: end of the dwell after the move
+    _t_last = _ts[_np.clip(_i_end - _first - 1, 0, _big - 1)]
+    _t_steady = _np.maximum(
+        _t_stop, _t_last - steady_fraction*(_t_last - _t_stop))
+    _steady = (_ts >= _t_steady[_sid])[:, None]
+    _result['steady_state_error'] = _mean(_dev, _steady)
+
+    _result['rms_following_error'] = _np.sqrt(_mean(_es**2, _moving))
+    return _result
+
+
+def analyze_log(data, events=None, targets=None, tolerance=1e-3,
+                steady_fraction=0.2, axes=AXIS_NAMES):
+    """Computes the step response metrics of a test log.
+
+    Args:
+        data (DataFrame or BinaryLog): test samples.
+        events (list): (time, name) tuples of the events file, if any.
+        targets (list): test positions, used if there are no events.
+        tolerance (float): settling band half width in mm.
+        steady_fraction (float): final fraction of the dwell averaged for
+            the steady-state error.
+        axes (list): axis names.
+
+    Returns:
+        the analyze dict, with the axes names."""
+    _t = _np.asarray(data['t [s]'], dtype=float)
+    _x = _np.column_stack([_np.asarray(
+        data['ActualPos{0:s} [mm]'.format(_axis)], dtype=float)
+        for _axis in axes])
+    _e = _np.column_stack([_np.asarray(
+        data['PosError{0:s} [mm]'.format(_axis)], dtype=float)
+        for _axis in axes])
+    if events:
+        _segments = segments_from_events(events)
+    else:
+        # the axis with the largest travel
+        _travel = [_np.ptp(_col[_np.isfinite(_col)])
+                   if _np.isfinite(_col).any() else -1 for _col in _x.T]
+        _main = int(_np.argmax(_travel))
+        _segments = segments_from_motion(_t, _x[:, _main], targets or [])
+    _result = analyze(_t, _x, _e, _segments, tolerance, steady_fraction)
+    _result['axes'] = list(axes)
+    return _result
+
+
+def get_rows(result, axis):
+    """Returns the table rows of an axis: the segment number, target, step
+    and the METRICS values.
+
+    Args:
+        result (dict): analyze_log result.
+        axis (str): axis name."""
+    _j = result['axes'].index(axis)
+    _rows = []
+    for _k in range(len(result['target'])):
+        _rows.append([_k + 1, result['target'][_k], result['step'][_k, _j]]
+                     + [result[_key][_k, _j] for _key, _ in METRICS])
+    return _rows
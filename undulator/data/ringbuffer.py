@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""Timestamped ring buffer with time aligned lookups."""
+
+import numpy as _np
+import threading as _threading
+
+
+class TimeRingBuffer(object):
+    """Fixed size ring buffer of timestamped readings.
+
+    Each reading is a time and one value per column. Old readings are
+    overwritten when the buffer is full, so the memory use is constant.
+    """
+
+    def __init__(self, ncols, size=4096):
+        """Initializes the buffer.
+
+        Args:
+            ncols (int): number of values per reading.
+            size (int): maximum number of readings kept."""
+        self.ncols = ncols
+        self.size = int(size)
+        self.times = _np.full(self.size, _np.nan)
+        self.values = _np.full((self.size, ncols), _np.nan)
+        self.count = 0
+        self._lock = _threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def append(self, time, values):
+        """Stores a reading.
+
+        Args:
+            time (float): acquisition time of the reading.
+            values (sequence): one value per column."""
+        with self._lock:
+            _i = self.count % self.size
+            self.times[_i] = time
+            self.values[_i] = values
+            self.count += 1
+
+    def first_time(self):
+        """Returns the time of the oldest stored reading, or NaN if
+        empty."""
+        if self.count == 0:
+            return _np.nan
+        if self.count <= self.size:
+            return self.times[0]
+        return self.times[self.count % self.size]
+
+    def last_time(self):
+        """Returns the time of the last reading, or NaN if empty."""
+        if self.count == 0:
+            return _np.nan
+        return self.times[(self.count - 1) % self.size]
+
+    def get(self):
+        """Returns copies of the stored readings in time order.
+
+        Returns:
+            a tuple (times, values)."""
+        with self._lock:
+            if self.count <= self.size:
+                return (self.times[:self.count].copy(),
+                        self.values[:self.count].copy())
+            _i = self.count % self.size
+            return (_np.concatenate([self.times[_i:], self.times[:_i]]),
+                    _np.concatenate([self.values[_i:], self.values[:_i]]))
+
+    def asof(self, t):
+        """Returns the last reading at or before each time.
+
+        Args:
+            t (numpy.ndarray): sorted times.
+
+        Returns:
+            a (len(t) x ncols) array, NaN where there is no earlier reading."""
+        t = _np.atleast_1d(_np.asarray(t, dtype=float))
+        _times, _values = self.get()
+        _out = _np.full((len(t), self.ncols), _np.nan)
+        _idx = _np.searchsorted(_times, t, side='right') - 1
+        _valid = _idx >= 0
+        _out[_valid] = _values[_idx[_valid]]
+        return _out
+
+    def interp(self, t):
+        """Linearly interpolates the readings at each time.
+
+        Times before the first reading give NaN; times after the last
+        reading hold its value.
+
+        Args:
+            t (numpy.ndarray): times.
+
+        Returns:
+            a (len(t) x ncols) array."""
+        t = _np.atleast_1d(_np.asarray(t, dtype=float))
+        _times, _values = self.get()
+        _out = _np.full((len(t), self.ncols), _np.nan)
+        if len(_times) == 0:
+            return _out
+        for _j in range(self.ncols):
+            _out[:, _j] = _np.interp(t, _times, _values[:, _j],
+                                     left=_np.nan, right=_values[-1, _j])
+        return _out
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""Ring buffer of samples in shared memory.
+
+The acquisition (writer) appends rows and other processes attach to the
+buffer by its name and read the latest rows without any copy through the
+pipe. The memory layout is an int64 header (write count, number of
+columns, size, metadata length), the JSON metadata (column names, test
+start time) and the (size x ncols) float64 rows.
+"""
+
+import json as _json
+import numpy as _np
+from multiprocessing import shared_memory as _shared_memory
+
+
+_header_len = 4
+_header_bytes = 8*_header_len
+
+
+def _attach(name):
+    """Attaches to an existing shared memory block without registering it
+    in the resource tracker, which would remove it when this process
+    exits."""
+    try:
+        return _shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the tracker may be shared with the creator, so
+        # the block is not registered instead of unregistered afterwards
+        from multiprocessing import resource_tracker as _resource_tracker
+        _register = _resource_tracker.register
+        _resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return _shared_memory.SharedMemory(name=name)
+        finally:
+            _resource_tracker.register = _register
+
+
+class SharedRingBuffer(object):
+    """Fixed size ring buffer of float64 rows in shared memory.
+
+    There must be a single writer. Readers get the latest rows and drop
+    the ones overwritten while they were copied.
+    """
+
+    def __init__(self, columns=None, size=4096, name=None, t0=0):
+        """Creates a new buffer, or attaches to an existing one if name is
+        given.
+
+        Args:
+            columns (list): column names of a new buffer.
+            size (int): number of rows of a new buffer.
+            name (str): name of an existing buffer.
+            t0 (float): test start time of a new buffer."""
+        if name is None:
+            _meta = _json.dumps({'columns': list(columns), 't0': t0})
+            _meta = _meta.encode('utf-8')
+            _meta_len = 8*((len(_meta) + 7)//8)
+            _ncols = len(columns)
+            self._shm = _shared_memory.SharedMemory(
+                create=True,
+                size=_header_bytes + _meta_len + 8*size*_ncols)
+            self._header = _np.ndarray(
+                (_header_len,), dtype=_np.int64, buffer=self._shm.buf)
+            self._header[:] = (0, _ncols, size, _meta_len)
+            self._shm.buf[_header_bytes:_header_bytes + len(_meta)] = _meta
+            self.owner = True
+        else:
+            self._shm = _attach(name)
+            self._header = _np.ndarray(
+                (_header_len,), dtype=_np.int64, buffer=self._shm.buf)
+            self.owner = False
+
+        _ncols, _size, _meta_len = (int(_v) for _v in self._header[1:])
+        _meta = bytes(self._shm.buf[_header_bytes:_header_bytes + _meta_len])
+        _meta = _json.loads(_meta.rstrip(b'\0').decode('utf-8'))
+        self.columns = _meta['columns']
+        self.t0 = _meta['t0']
+        self.size = _size
+        self.ncols = _ncols
+        self._data = _np.ndarray(
+            (_size, _ncols), dtype=_np.float64, buffer=self._shm.buf,
+            offset=_header_bytes + _meta_len)
+
+    @property
+    def name(self):
+        """Shared memory name, used to attach to the buffer."""
+        return self._shm.name
+
+    @property
+    def count(self):
+        """Total number of rows written."""
+        return int(self._header[0])
+
+    def append(self, row):
+        """Writes a row. The count is updated after the row, so readers
+        never see a partially written row as valid."""
+        _count = int(self._header[0])
+        self._data[_count % self.size] = row
+        self._header[0] = _count + 1
+
+    def views(self, n=None, start=None):
+        """Returns up to two zero-copy views with the latest rows, oldest
+        first. The rows may be overwritten by the writer while used.
+
+        Args:
+            n (int): maximum number of rows, defaults to the buffer size.
+            start (int): if given, only rows with a write count index
+                greater or equal to start are returned.
+
+        Returns:
+            a list of (nrows x ncols) arrays and the write count."""
+        _count = self.count
+        _n = min(_count, self.size if n is None else min(n, self.size))
+        if start is not None:
+            _n = min(_n, max(_count - start, 0))
+        _first = (_count - _n) % self.size
+        _last = _first + _n
+        if _last <= self.size:
+            return [self._data[_first:_last]], _count
+        return [self._data[_first:], self._data[:_last - self.size]], _count
+
+    def get(self, n=None, start=None):
+        """Returns a copy of the latest rows, oldest first, without the
+        rows overwritten during the copy.
+
+        Args:
+            n (int): maximum number of rows, defaults to the buffer size.
+            start (int): if given, only rows with a write count index
+                greater or equal to start are returned.
+
+        Returns:
+            a (nrows x ncols) array and the write count after its last
+            row."""
+        _views, _count = self.views(n, start)
+        if len(_views) == 1:
+            _rows = _views[0].copy()
+        else:
+            _rows = _np.concatenate(_views)
+        # rows overwritten by the writer during the copy
+        _lost = self.count - self.size - (_count - len(_rows))
+        if _lost > 0:
+            _rows = _rows[_lost:]
+        return _rows, _count
+
+    def close(self):
+        """Releases the buffer memory of this process."""
+        self._header = None
+        self._data = None
+        self._shm.close()
+
+    def unlink(self):
+        """Removes the shared memory block; attached processes keep their
+        mapping until they close it."""
+        if self.owner:
+            self._shm.unlink()
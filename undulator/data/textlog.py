@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""Tab separated text (.dat) test logs."""
+
+
+# header lines written before the column names, in order
+HEADER_KEYS = (
+    ('comments', 'Comments: '),
+    ('test_positions', 'Test positions [mm]: '),
+    ('sampling', 'Sampling: '),
+    )
+
+
+def read_header(filename):
+    """Reads the header of a text test log. Logs written before the
+    sampling line was added are also accepted.
+
+    Returns:
+        a dict with comments, test positions, sampling, columns and the
+        number of lines before the column names (skiprows)."""
+    _info = {_key: '' for _key, _ in HEADER_KEYS}
+    with open(filename, 'r') as _f:
+        _line = _f.readline()
+        _skiprows = 0
+        for _key, _prefix in HEADER_KEYS:
+            if not _line.startswith(_prefix):
+                continue
+            _info[_key] = _line[len(_prefix):].rstrip()
+            _skiprows += 1
+            _line = _f.readline()
+    _info['columns'] = _line.rstrip('\n').split('\t')
+    _info['skiprows'] = _skiprows
+    return _info
+
+
+def read_log(filename, skiprows=None, usecols=None):
+    """Reads a text test log.
+
+    Args:
+        filename (str): log file name.
+        skiprows (int): number of lines before the column names, read from
+            the header if not given.
+        usecols (list): names of the columns to read, all if not given.
+
+    Returns:
+        a pandas.DataFrame."""
+    # pandas is imported on first use, it is slow to import
+    import pandas as _pd
+    if skiprows is None:
+        skiprows = read_header(filename)['skiprows']
+    return _pd.read_csv(filename, sep='\t', skiprows=skiprows, header=0,
+                        usecols=usecols)
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+"""Summary database of the test logs, for trends over many tests.
+
+Each test log is reduced to one row with its time, duration, comments and
+test positions, and one row per axis with the maximum and minimum position
+error, peak current and peak absolute torque. Fault captures are not
+tests and are left out. The rows are kept in an SQLite file in the log
+directory. Only new or modified logs are read when the database is
+updated, in a pool of processes.
+
+Usage:
+    python -m undulator.data.trendstore [directory] [--processes N]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import sqlite3 as _sqlite3
+import argparse as _argparse
+import traceback as _traceback
+import multiprocessing as _multiprocessing
+import concurrent.futures as _futures
+import numpy as _np
+
+from undulator.data import binarylog as _binarylog
+from undulator.data import textlog as _textlog
+from undulator.data import logindex as _logindex
+
+
+DB_NAME = '.log_trends.sqlite'
+# fault captures (undulator.devices.faultcapture) are saved as logs in the
+# same directory, but they are not tests
+EXCLUDED_SUFFIXES = ('_fault',)
+AXIS_NAMES = ('A', 'B', 'C', 'D')
+AXIS_METRICS = (
+    ('max_poserr', 'Max PosError [mm]'),
+    ('min_poserr', 'Min PosError [mm]'),
+    ('max_current', 'Max Current [A]'),
+    ('max_torque', 'Max |Torque| [%]'),
+    )
+TEST_METRICS = (
+    ('duration', 'Duration [s]'),
+    ('nrows', 'Samples'),
+    )
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    name TEXT PRIMARY KEY,
+    path TEXT,
+    mtime REAL,
+    size INTEGER,
+    time REAL,
+    comments TEXT,
+    test_positions TEXT,
+    duration REAL,
+    nrows INTEGER
+);
+CREATE INDEX IF NOT EXISTS tests_time ON tests (time);
+CREATE TABLE IF NOT EXISTS axes (
+    name TEXT,
+    axis TEXT,
+    max_poserr REAL,
+    min_poserr REAL,
+    max_current REAL,
+    max_torque REAL,
+    PRIMARY KEY (name, axis)
+);
+"""
+
+
+def get_test_time(name, default=None):
+    """Returns the start time (epoch) of a test from its log name
+    (log_YYYY_MM_DD_HH_MM_SS), or default."""
+    try:
+        return _time.mktime(_time.strptime(name[4:23], '%Y_%m_%d_%H_%M_%S'))
+    except ValueError:
+        return default
+
+
+def _reduce(function, values):
+    _values = _np.asarray(values, dtype=float)
+    _values = _values[_np.isfinite(_values)]
+    if len(_values) == 0:
+        return None
+    return float(function(_values))
+
+
+def list_tests(directory):
+    """Lists the test logs of a directory without reading them, preferring
+    the binary log of a test. Fault captures are left out.
+
+    Returns:
+        a dict test name -> dict with path, mtime and size."""
+    _logs = _logindex.scan_logs(directory)
+    _tests = {}
+    for _ext in _logindex.LOG_EXTENSIONS:
+        for _name, _file in _logs.items():
+            _test = _name.split('.')[0]
+            if _name.endswith(_ext) and not _test.endswith(
+                    EXCLUDED_SUFFIXES):
+                _tests[_test] = _file
+    return _tests
+
+
+def summarize_log(filename):
+    """Reduces a text or binary test log to its summary values.
+
+    Only the header and the time, position error, current and torque
+    columns are read.
+
+    Returns:
+        a dict with comments, test_positions, duration, nrows and, by axis
+        name, a dict of the AXIS_METRICS values (None if not
+        available)."""
+    _names = ['t [s]']
+    for _axis in AXIS_NAMES:
+        _names += ['PosError{0:s} [mm]'.format(_axis),
+                   'Current{0:s} [A]'.format(_axis),
+                   'Torque{0:s} [%]'.format(_axis)]
+    if filename.endswith(_binarylog.EXTENSION):
+        _data = _binarylog.BinaryLog(filename)
+        _columns = _data.columns
+        _info = {'comments': _data.comments,
+                 'test_positions': _data.test_positions}
+    else:
+        _info = _textlog.read_header(filename)
+        _columns = [_name for _name in _names if _name in _info['columns']]
+        _data = _textlog.read_log(filename, _info['skiprows'], _columns)
+
+    def _column(name):
+        if name not in _columns:
+            return _np.zeros(0)
+        return _np.asarray(_data[name], dtype=float)
+
+    _t = _column('t [s]')
+    _summary = {'comments': _info['comments'],
+                'test_positions': _info['test_positions'],
+                'nrows': len(_t),
+                'duration': _reduce(_np.ptp, _t)}
+    for _axis in AXIS_NAMES:
+        _poserr = _column('PosError{0:s} [mm]'.format(_axis))
+        _summary[_axis] = {
+            'max_poserr': _reduce(_np.max, _poserr),
+            'min_poserr': _reduce(_np.min, _poserr),
+            'max_current': _reduce(
+                _np.max, _column('Current{0:s} [A]'.format(_axis))),
+            'max_torque': _reduce(_np.max, _np.abs(
+                _column('Torque{0:s} [%]'.format(_axis)))),
+            }
+    return _summary
+
+
+def _summarize(filename):
+    """summarize_log for the process pool, returning (summary, error)."""
+    try:
+        return summarize_log(filename), None
+    except Exception:
+        return None, _traceback.format_exc()
+
+
+class TrendStore(object):
+    """SQLite database of the test log summaries."""
+
+    def __init__(self, filename):
+        """Opens (or creates) a database.
+
+        Args:
+            filename (str): database file name."""
+        self.filename = filename
+        self.db = _sqlite3.connect(filename)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        """Closes the database."""
+        self.db.close()
+
+    def ingested(self):
+        """Returns a dict test name -> (path, mtime, size) of the stored
+        logs."""
+        return {_row[0]: tuple(_row[1:]) for _row in self.db.execute(
+            'SELECT name, path, mtime, size FROM tests')}
+
+    def put(self, name, entry, summary):
+        """Stores the summary of a log, replacing the previous one. The
+        changes are saved by commit.
+
+        Args:
+            name (str): test name.
+            entry (dict): path, mtime and size of the log.
+            summary (dict): summarize_log result."""
+        self.db.execute(
+            'INSERT OR REPLACE INTO tests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, entry['path'], entry['mtime'], entry['size'],
+             get_test_time(name, entry['mtime']), summary['comments'],
+             summary['test_positions'], summary['duration'],
+             summary['nrows']))
+        self.db.executemany(
+            'INSERT OR REPLACE INTO axes VALUES (?, ?, ?, ?, ?, ?)',
+            [(name, _axis) + tuple(summary[_axis][_key]
+                                   for _key, _ in AXIS_METRICS)
+             for _axis in AXIS_NAMES])
+
+    def remove(self, names):
+        """Removes the summaries of the given tests."""
+        _names = [(_name,) for _name in names]
+        self.db.executemany('DELETE FROM tests WHERE name = ?', _names)
+        self.db.executemany('DELETE FROM axes WHERE name = ?', _names)
+
+    def commit(self):
+        """Saves the changes."""
+        self.db.commit()
+
+    def query(self, metric, axis=None, t_min=None, t_max=None):
+        """Returns the values of a metric over a time range.
+
+        Args:
+            metric (str): AXIS_METRICS or TEST_METRICS key.
+            axis (str): axis name, required for the axis metrics.
+            t_min (float): start of the range (epoch), if any.
+            t_max (float): end of the range (epoch), if any.
+
+        Returns:
+            the times, values and test names, sorted by time."""
+        if metric in dict(AXIS_METRICS):
+            _sql = ('SELECT tests.time, axes.{0:s}, tests.name FROM tests '
+                    'JOIN axes ON axes.name = tests.name '
+                    'WHERE axes.axis = ?').format(metric)
+            _args = [axis]
+        elif metric in dict(TEST_METRICS):
+            _sql = ('SELECT time, {0:s}, name FROM tests '
+                    'WHERE 1').format(metric)
+            _args = []
+        else:
+            raise ValueError('Unknown metric: ' + metric)
+        if t_min is not None:
+            _sql += ' AND tests.time >= ?'
+            _args.append(t_min)
+        if t_max is not None:
+            _sql += ' AND tests.time <= ?'
+            _args.append(t_max)
+        _rows = self.db.execute(_sql + ' ORDER BY tests.time',
+                                _args).fetchall()
+        _times = _np.array([_row[0] for _row in _rows], dtype=float)
+        _values = _np.array([_np.nan if _row[1] is None else _row[1]
+                             for _row in _rows], dtype=float)
+        return _times, _values, [_row[2] for _row in _rows]
+
+    def get_test(self, name):
+        """Returns the stored columns of a test as a dict, or None."""
+        _cursor = self.db.execute('SELECT * FROM tests WHERE name = ?',
+                                  (name,))
+        _row = _cursor.fetchone()
+        if _row is None:
+            return None
+        return dict(zip([_d[0] for _d in _cursor.description], _row))
+
+
+def ingest(directory='.', filename=None, processes=None, batch=50,
+           progress=None):
+    """Adds the new or modified logs of a directory to its database and
+    removes the missing ones.
+
+    Args:
+        directory (str): test logs directory.
+        filename (str): database file, DB_NAME in the directory by default.
+        processes (int): number of worker processes, defaults to the
+            number of CPUs; 1 reads the logs in this process.
+        batch (int): number of logs stored in each transaction.
+        progress (callable): called with (done, total) after each log.
+
+    Returns:
+        a dict with the number of ingested, removed and failed logs and the
+        elapsed time."""
+    _t0 = _time.perf_counter()
+    if filename is None:
+        filename = _os.path.join(directory, DB_NAME)
+    # the logs are only read by the workers
+    _tests = list_tests(directory)
+    _store = TrendStore(filename)
+    try:
+        _stored = _store.ingested()
+        _names = sorted(_tests)
+        _todo = []
+        for _name in _names:
+            _entry = _tests[_name]
+            _key = (_entry['path'], _entry['mtime'], _entry['size'])
+            if _stored.get(_name) != _key:
+                _todo.append((_name, _entry))
+        _removed = set(_stored) - set(_names)
+        _store.remove(_removed)
+        _store.commit()
+
+        _paths = [_entry['path'] for _, _entry in _todo]
+        _failed = 0
+        _pool = None
+        if processes != 1 and len(_todo) > 1:
+            _pool = _futures.ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=_multiprocessing.get_context('spawn'))
+            _results = _pool.map(_summarize, _paths, chunksize=4)
+        else:
+            _results = map(_summarize, _paths)
+        try:
+            for _i, ((_name, _entry), (_summary, _error)) in enumerate(
+                    zip(_todo, _results)):
+                if _summary is None:
+                    _failed += 1
+                    print('Could not read ' + _entry['path'] + '\n' + _error)
+                else:
+                    _store.put(_name, _entry, _summary)
+                if (_i + 1) % batch == 0:
+                    _store.commit()
+                if progress is not None:
+                    progress(_i + 1, len(_todo))
+        finally:
+            _store.commit()
+            if _pool is not None:
+                _pool.shutdown(cancel_futures=True)
+    finally:
+        _store.close()
+    return {'ingested': len(_todo) - _failed, 'removed': len(_removed),
+            'failed': _failed, 'elapsed': _time.perf_counter() - _t0}
+
+
+def main(args=None):
+    """Updates the database of a log directory."""
+    _parser = _argparse.ArgumentParser(
+        prog='python -m undulator.data.trendstore',
+        description='Updates the test log summary database.')
+    _parser.add_argument('directory', nargs='?', default='.',
+                         help='test logs directory')
+    _parser.add_argument('--db', default=None,
+                         help='database file, defaults to ' + DB_NAME +
+                              ' in the directory')
+    _parser.add_argument('--processes', type=int, default=None,
+                         help='number of worker processes')
+    _args = _parser.parse_args(args)
+    _stats = ingest(_args.directory, _args.db, _args.processes)
+    print('{0:d} logs ingested, {1:d} removed, {2:d} failed in '
+          '{3:.1f} s'.format(_stats['ingested'], _stats['removed'],
+                             _stats['failed'], _stats['elapsed']))
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
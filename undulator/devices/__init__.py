@@ -1,5 +1,27 @@
 """This package contains all undulator GUI devices."""
 
-from imautils.devices.HeidenhainLib import HeidenhainSerial
+from undulator.devices.registry import PVRegistry as _PVRegistry
+from undulator.devices.instrumentation import (
+    InstrumentedPV as _InstrumentedPV,
+    )
+from undulator.devices.axis import Undulator as _Undulator
 
-display = HeidenhainSerial()
+# PVs are created (and their connections started) once per process, and
+# their CA traffic is recorded in undulator.devices.instrumentation.stats
+pvs = _PVRegistry(_InstrumentedPV)
+undulator = _Undulator(pvs)
+
+_display = None
+
+
+def __getattr__(name):
+    """Creates the Heidenhain display on first use, so pyserial is only
+    imported when the display is needed."""
+    global _display
+    if name == 'display':
+        if _display is None:
+            from imautils.devices.HeidenhainLib import HeidenhainSerial
+            _display = HeidenhainSerial()
+        return _display
+    raise AttributeError(
+        "module 'undulator.devices' has no attribute '{0:s}'".format(name))
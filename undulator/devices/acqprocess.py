@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""Test acquisition engine in a child process.
+
+The tests run in a spawned process with its own Channel Access context,
+so they do not share the GIL with the GUI. The control messages (start,
+stop, acquire, attached, quit) and the status messages (started,
+finished, failed, error) are (command, dict) tuples sent over a pipe; only
+'failed' (the test could not start) ends a test, an 'error' is a warning.
+The samples are published in a shared memory ring buffer read by the GUI. The engine
+removes the shared memory block once the GUI has attached to it (or when
+the engine quits), so a short test never removes it before the GUI reads
+it.
+"""
+
+import sys as _sys
+import time as _time
+import traceback as _traceback
+import multiprocessing as _multiprocessing
+
+from undulator.data.sharedbuffer import SharedRingBuffer as _SharedRingBuffer
+
+
+def send_error(conn, status='error'):
+    """Prints the exception being handled and reports it to the parent
+    process.
+
+    Args:
+        conn (multiprocessing.connection.Connection): control pipe end.
+        status (str): status message, 'error' or 'failed'.
+
+    Returns:
+        False if the pipe is closed."""
+    _traceback.print_exc(file=_sys.stdout)
+    try:
+        conn.send((status, {'message': _traceback.format_exc()}))
+        return True
+    except (EOFError, OSError):
+        return False
+
+
+def run_engine(conn, poll_interval=0.05):
+    """Runs the engine loop of the child process until 'quit' is received
+    or the pipe is closed.
+
+    Args:
+        conn (multiprocessing.connection.Connection): control pipe end.
+        poll_interval (float): control pipe polling interval in seconds."""
+    # imported here, the CA context is created in the child process
+    from undulator.devices import testengine as _testengine
+
+    _thd = None
+    _thd_display = None
+    _port = None
+    # live buffers not attached by the parent yet, by name
+    _buffers = {}
+    while True:
+        if _thd is not None and not _thd.is_alive():
+            _finished = _thd
+            _thd = None
+            try:
+                conn.send(('finished', {
+                    'log_name': _finished.log_name,
+                    'sampling': _finished.get_sampling_summary()}))
+            except Exception:
+                if not send_error(conn):
+                    break
+
+        try:
+            if not conn.poll(poll_interval):
+                continue
+            _command, _args = conn.recv()
+        except (EOFError, OSError):
+            _command, _args = 'quit', {}
+
+        try:
+            if _command == 'start':
+                if _thd is not None:
+                    conn.send(('error', {'message': 'Test running.'}))
+                    continue
+                if _args.get('display_port') != _port:
+                    if _thd_display is not None:
+                        _testengine.disconnect_display(_thd_display)
+                        _thd_display = None
+                    _port = _args.get('display_port')
+                    if _port is not None:
+                        _thd_display = _testengine.connect_display(
+                            _port, _args.get('display_period', 0.2))
+                        if _thd_display is None:
+                            _port = None
+                            conn.send(('error', {
+                                'message': 'Could not connect to the '
+                                           'Heidenhain display.'}))
+                _thd = start_test(_testengine, _args)
+                if _thd.live_buffer is None:
+                    # stops a test still connecting its channels
+                    _thd.continuous_flag = False
+                    _thd.manual_flag = False
+                    _thd.abort_flag = True
+                    _thd = None
+                    conn.send(('failed', {'message': 'Test not started.'}))
+                else:
+                    _buffers[_thd.live_buffer.name] = _thd.live_buffer
+                    conn.send(('started', {
+                        'buffer': _thd.live_buffer.name,
+                        'log_name': _thd.log_name}))
+            elif _command == 'stop':
+                if _thd is not None:
+                    _thd.continuous_flag = False
+                    _thd.manual_flag = False
+                    _thd.abort_flag = True
+            elif _command == 'acquire':
+                if _thd is not None:
+                    _thd.acquire_flag = True
+            elif _command == 'attached':
+                _buffer = _buffers.pop(_args.get('buffer'), None)
+                if _buffer is not None:
+                    _buffer.unlink()
+            elif _command == 'quit':
+                if _thd is not None:
+                    _thd.continuous_flag = False
+                    _thd.manual_flag = False
+                    _thd.abort_flag = True
+                    _thd.join()
+                if _thd_display is not None:
+                    _testengine.disconnect_display(_thd_display)
+                for _buffer in _buffers.values():
+                    _buffer.unlink()
+                break
+        except Exception:
+            # a start that did not create its test ends it in the parent
+            if _command == 'start' and _thd is None:
+                _status = 'failed'
+            else:
+                _status = 'error'
+            if not send_error(conn, _status):
+                break
+
+
+def start_test(testengine, args, timeout=10):
+    """Starts a test thread and waits until its live buffer exists.
+
+    Args:
+        testengine (module): undulator.devices.testengine.
+        args (dict): ThdTestAxis arguments and the live_size.
+        timeout (float): maximum waiting time in seconds.
+
+    Returns:
+        the test thread."""
+    _thd = testengine.ThdTestAxis(
+        test_pos=args.get('test_pos'), comments=args.get('comments', ''),
+        mode=args.get('mode', 0), wtime=args.get('wtime', 10),
+        upd_interval=args.get('upd_interval', 0.02),
+        policy=args.get('policy', 'skip'))
+    _thd.live_size = args.get('live_size', 65536)
+    # removed by the engine when the parent process has attached to it
+    _thd.unlink_live_buffer = False
+    _thd.binary_log = args.get('binary_log', False)
+    _thd.continuous_flag = _thd.mode == 1
+    _thd.manual_flag = _thd.mode == 2
+    _thd.acquire_flag = _thd.mode == 2
+    _thd.start()
+    _deadline = _time.monotonic() + timeout
+    while all([_thd.live_buffer is None, _thd.is_alive(),
+               _time.monotonic() < _deadline]):
+        _time.sleep(0.01)
+    return _thd
+
+
+class AcquisitionProcess(object):
+    """Parent side of the acquisition engine process."""
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self.buffer = None
+        self.running = False
+        self.log_name = None
+        self.sampling = ''
+
+    def start(self):
+        """Spawns the engine process, if it is not running."""
+        if self.process is not None and self.process.is_alive():
+            return
+        _context = _multiprocessing.get_context('spawn')
+        self.conn, _child_conn = _context.Pipe()
+        self.process = _context.Process(
+            target=run_engine, args=(_child_conn,),
+            name='AcquisitionEngine', daemon=True)
+        self.process.start()
+        _child_conn.close()
+
+    def is_alive(self):
+        """Returns True if the engine process is running."""
+        return self.process is not None and self.process.is_alive()
+
+    def send(self, command, **kwargs):
+        """Sends a control message to the engine process."""
+        self.conn.send((command, kwargs))
+
+    def start_test(self, test_pos=None, comments='', mode=0, wtime=10,
+                   upd_interval=0.02, policy='skip', display_port=None,
+                   display_period=0.2, live_size=65536, binary_log=False):
+        """Starts a test in the engine process. The arguments are the
+        ThdTestAxis ones, the display port and period, if the display is
+        read by the engine, and the number of rows of the live buffer."""
+        self.start()
+        self.close_buffer()
+        self.running = True
+        self.send('start', test_pos=test_pos, comments=comments, mode=mode,
+                  wtime=wtime, upd_interval=upd_interval, policy=policy,
+                  display_port=display_port, display_period=display_period,
+                  live_size=live_size, binary_log=binary_log)
+
+    def stop_test(self):
+        """Stops the running test; its log is closed by the engine."""
+        if self.is_alive():
+            self.send('stop')
+
+    def acquire(self):
+        """Acquires a sample of a manual test."""
+        if self.is_alive():
+            self.send('acquire')
+
+    def poll(self):
+        """Handles the status messages received from the engine.
+
+        Returns:
+            a list of (command, dict) messages."""
+        _messages = []
+        if self.conn is None:
+            return _messages
+        try:
+            while self.conn.poll():
+                _messages.append(self.conn.recv())
+        except (EOFError, OSError):
+            _messages.append(('error', {'message': 'Engine process ended.'}))
+            self.running = False
+        for _command, _args in _messages:
+            if _command == 'started':
+                self.close_buffer()
+                self.buffer = _SharedRingBuffer(name=_args['buffer'])
+                self.log_name = _args['log_name']
+                self.running = True
+                try:
+                    self.send('attached', buffer=_args['buffer'])
+                except (EOFError, OSError):
+                    pass
+            elif _command == 'finished':
+                self.running = False
+                self.log_name = _args['log_name']
+                self.sampling = _args['sampling']
+            elif _command == 'failed':
+                self.running = False
+        if self.running and not self.is_alive():
+            self.running = False
+        return _messages
+
+    def close_buffer(self):
+        """Releases the live buffer of the previous test."""
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+    def close(self, timeout=5):
+        """Stops the running test and the engine process."""
+        if self.is_alive():
+            try:
+                self.send('quit')
+            except (EOFError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.close_buffer()
+        self.running = False
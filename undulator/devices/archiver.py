@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""Local archiver of the periodically scanned records.
+
+A background thread samples the scanned records of undulator.db and the
+axis ActualPosition and PositionError channels from their CA monitors (no
+CA requests) and stores their 1 s, 1 min and 1 h rollups in a local
+archive (undulator.data.archive), read by the history plot of the main
+window.
+
+Usage:
+    python -m undulator.devices.archiver [--dir DIR] [--rate 10]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import argparse as _argparse
+import threading as _threading
+import traceback as _traceback
+
+from undulator import devices as _devices
+from undulator.devices.axis import (
+    AXIS_NAMES as _AXIS_NAMES,
+    PREFIX as _PREFIX,
+    )
+from undulator.devices.sampler import MonitorSampler as _MonitorSampler
+from undulator.devices.scheduler import PeriodicScheduler as _Scheduler
+from undulator.data import archive as _archive
+from undulator.data import dbparser as _dbparser
+
+
+AXIS_RECORDS = ('ActualPosition', 'PositionError')
+
+
+def get_channel_names(db=_dbparser.DEFAULT_DB):
+    """Returns the archived PV names: the scanned records of the database
+    and the axis positions and position errors.
+
+    If the database is not found, only the axis channels are returned."""
+    _names = []
+    if _os.path.isfile(db):
+        _records = _dbparser.read_db(db, {'IOC': _PREFIX[:-1]})
+        _names = [_name for _name, _record in _records.items()
+                  if _dbparser.scan_period(_record) is not None]
+    else:
+        print('Database not found, only the axis channels are archived: '
+              + db)
+    for _axis in _AXIS_NAMES:
+        for _record in AXIS_RECORDS:
+            _name = '{0:s}Axis{1:s}:{2:s}'.format(_PREFIX, _axis, _record)
+            if _name not in _names:
+                _names.append(_name)
+    return _names
+
+
+class Archiver(_threading.Thread):
+    """Samples the archived channels and writes their rollups."""
+
+    def __init__(self, directory=None, rate=10, keep_days=31, names=None):
+        """Initializes the archiver thread.
+
+        Args:
+            directory (str): archive directory, the default one if None.
+            rate (float): sampling rate in Hz.
+            keep_days (int): days the 1 s rollups are kept.
+            names (list): PV names, get_channel_names() if None.
+
+        Raises:
+            RuntimeError: if the archive is used by another process."""
+        super().__init__(name='Archiver', daemon=True)
+        if names is None:
+            names = get_channel_names()
+        self.archive = _archive.Archive(directory)
+        self.keep_days = keep_days
+        self.sampler = _MonitorSampler(
+            {_name: _devices.pvs.get(_name) for _name in names})
+        self.scheduler = _Scheduler(1/rate)
+        self.writer = _archive.ArchiveWriter(self.archive, names)
+        self._stop_event = _threading.Event()
+
+    def stop(self, timeout=5):
+        """Stops the archiver thread and writes the pending rollups."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        if not self.is_alive():
+            self.writer.close()
+
+    def prune(self):
+        """Removes the old 1 s rollups."""
+        try:
+            self.archive.prune(self.keep_days)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def run(self):
+        """Samples the channels until stopped."""
+        _not_connected = self.sampler.start()
+        if len(_not_connected) > 0:
+            print('Archiver channels not connected: ' +
+                  ', '.join(_not_connected))
+        self.prune()
+        _day = _archive.get_day(_time.time())
+        self.scheduler.start()
+        try:
+            while self.scheduler.wait(self._stop_event) is not None:
+                _now, _values, _ = self.sampler.snapshot()
+                try:
+                    self.writer.add(_now, _values)
+                except Exception:
+                    _traceback.print_exc(file=_sys.stdout)
+                    break
+                if _archive.get_day(_now) != _day:
+                    _day = _archive.get_day(_now)
+                    self.prune()
+        finally:
+            self.sampler.stop()
+            self.writer.close()
+
+
+def main(args=None):
+    """Runs the archiver until Ctrl-C is pressed."""
+    _parser = _argparse.ArgumentParser(
+        prog='python -m undulator.devices.archiver',
+        description='Archives the scanned records of the undulator.')
+    _parser.add_argument('--dir', default=None,
+                         help='archive directory, defaults to '
+                              'UNDULATOR_ARCHIVE_DIR or ./archive')
+    _parser.add_argument('--rate', type=float, default=10,
+                         help='sampling rate in Hz')
+    _parser.add_argument('--keep-days', type=int, default=31,
+                         help='days the 1 s rollups are kept')
+    _args = _parser.parse_args(args)
+    _archiver = Archiver(_args.dir, _args.rate, _args.keep_days)
+    print('Archiving {0:d} channels in {1:s}'.format(
+        len(_archiver.writer.channels), _archiver.archive.directory))
+    _archiver.start()
+    try:
+        while _archiver.is_alive():
+            _archiver.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _archiver.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""Undulator axis and undulator models built on shared PVs."""
+
+
+PREFIX = 'und:'
+AXIS_NAMES = ('A', 'B', 'C', 'D')
+
+# axis key -> record name suffix
+AXIS_CHANNELS = (
+    ('ActualPos', 'ActualPosition'),
+    ('ActualSpd', 'ActualVelocity'),
+    ('Current', 'OutputCurrent'),
+    ('PosError', 'PositionError'),
+    ('Torque', 'TorqueReference'),
+    ('Status', 'AxisStatus'),
+    ('MotionStatus', 'MotionStatus'),
+    ('HomePos', 'HomePos'),
+    ('MovePos', 'MovePos'),
+    ('MoveFlag', 'Move'),
+    ('Moving', 'MoveStatus'),
+    ('ServoOn', 'DriveEnableStatus'),
+    ('BrakeOff', 'BrakeStatus'),
+    )
+
+# flag key -> record name
+FLAG_CHANNELS = (
+    ('EnContactor', 'EnContactor'),
+    ('EnClear', 'EnClear'),
+    ('EnServo', 'EnServo'),
+    ('DisServo', 'DisServo'),
+    ('EnHome', 'EnHome'),
+    ('EnCmsMode', 'EnCmsMode'),
+    ('EnVIMode', 'EnVIMode'),
+    ('EnHIMode', 'EnHIMode'),
+    ('EnEPMode', 'EnEPMode'),
+    ('EnLPMode', 'EnLPMode'),
+    ('EnMove', 'EnMove'),
+    ('EnCam', 'EnCam'),
+    ('EnCoupling', 'EnGeneralCoupling'),
+    )
+
+
+class Axis(object):
+    """Undulator axis. Channels are attributes, also reachable by key
+    (axis['MovePos']) as the motor dicts used before."""
+
+    __slots__ = (('name', 'number') + tuple(_k for _k, _ in AXIS_CHANNELS)
+                 + ('OvertravelN', 'OvertravelP'))
+
+    def __init__(self, registry, name):
+        """Gets the axis PVs from the registry.
+
+        Args:
+            registry (PVRegistry): shared PV registry.
+            name (str): axis name ('A', 'B', 'C' or 'D')."""
+        self.name = name
+        self.number = AXIS_NAMES.index(name) + 1
+        for _key, _record in AXIS_CHANNELS:
+            setattr(self, _key, registry.get(
+                '{0:s}Axis{1:s}:{2:s}'.format(PREFIX, name, _record)))
+        self.OvertravelN = registry.get(
+            '{0:s}OvertravelN{1:d}'.format(PREFIX, self.number))
+        self.OvertravelP = registry.get(
+            '{0:s}OvertravelP{1:d}'.format(PREFIX, self.number))
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def keys(self):
+        """Returns the channel keys."""
+        return self.__slots__[2:]
+
+    def pvs(self):
+        """Returns the axis PVs."""
+        return [getattr(self, _key) for _key in self.keys()]
+
+
+class Undulator(object):
+    """Undulator with its four axes, enable flags and coupling channels."""
+
+    __slots__ = ('axes', 'flags', 'coupling_master', 'coupling_slaves',
+                 'coupling_direction', 'en_coupling')
+
+    def __init__(self, registry):
+        """Gets the undulator PVs from the registry.
+
+        Args:
+            registry (PVRegistry): shared PV registry."""
+        self.axes = {_name: Axis(registry, _name) for _name in AXIS_NAMES}
+        self.flags = {_key: registry.get(PREFIX + _record)
+                      for _key, _record in FLAG_CHANNELS}
+        self.coupling_master = registry.get(PREFIX + 'CouplingMaster')
+        self.coupling_slaves = registry.get(PREFIX + 'CouplingSlaves')
+        self.en_coupling = self.flags['EnCoupling']
+        self.coupling_direction = {
+            'slv{0:d}'.format(_i + 1): registry.get(
+                '{0:s}CouplingDirection[{1:d}]'.format(PREFIX, _i))
+            for _i in range(3)}
+
+    def __getitem__(self, name):
+        return self.axes[name]
+
+    def moving_axis(self):
+        """Returns the first axis with the Move flag set, or None."""
+        for _name in AXIS_NAMES:
+            if self.axes[_name].MoveFlag.get():
+                return self.axes[_name]
+        return None
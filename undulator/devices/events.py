@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""Events driven by PV monitors and put completions."""
+
+import time as _time
+import threading as _threading
+
+
+class PVEvent(object):
+    """Event set from a PV monitor when the PV value satisfies a condition.
+
+    The detection time and the IOC timestamp of the value that set the
+    event are stored, so transitions are timed by the monitor and not by
+    a polling loop.
+    """
+
+    def __init__(self, pv, condition, name='', notify=None):
+        """Initializes the event.
+
+        Args:
+            pv (epics.PV): monitored PV.
+            condition (function): receives the PV value and returns True
+                when the event must be set.
+            name (str): event description.
+            notify (threading.Event): optional event shared by several
+                PVEvents, set together with this one."""
+        self.pv = pv
+        self.condition = condition
+        self.name = name
+        self.notify = notify
+        self.event = _threading.Event()
+        self.time = None
+        self.timestamp = None
+        self._index = None
+
+    def _callback(self, value=None, timestamp=None, **kwargs):
+        if self.event.is_set() or value is None:
+            return
+        if self.condition(value):
+            self.time = _time.time()
+            self.timestamp = timestamp
+            self.event.set()
+            if self.notify is not None:
+                self.notify.set()
+
+    def arm(self):
+        """Adds the monitor callback. The current value is checked at once.
+
+        Returns:
+            the event itself."""
+        self.disarm()
+        self.event.clear()
+        self._index = self.pv.add_callback(
+            self._callback, run_now=self.pv.connected, with_ctrlvars=False)
+        return self
+
+    def disarm(self):
+        """Removes the monitor callback."""
+        if self._index is not None:
+            self.pv.remove_callback(self._index)
+            self._index = None
+
+    def is_set(self):
+        """Returns True if the condition was satisfied."""
+        return self.event.is_set()
+
+
+class PutEvent(object):
+    """Event set when a CA put completes."""
+
+    def __init__(self, pv, name='', notify=None):
+        """Initializes the event.
+
+        Args:
+            pv (epics.PV): PV to be written.
+            name (str): event description.
+            notify (threading.Event): optional event shared by several
+                events, set together with this one."""
+        self.pv = pv
+        self.name = name
+        self.notify = notify
+        self.event = _threading.Event()
+        self.time = None
+        self.timestamp = None
+
+    def _callback(self, **kwargs):
+        self.time = _time.time()
+        self.event.set()
+        if self.notify is not None:
+            self.notify.set()
+
+    def put(self, value):
+        """Writes the value without blocking; the event is set on the put
+        completion.
+
+        Returns:
+            the event itself."""
+        self.event.clear()
+        self.pv.put(value, wait=False, use_complete=True,
+                    callback=self._callback)
+        return self
+
+    def disarm(self):
+        """Does nothing, the put callback runs only once."""
+        pass
+
+    def is_set(self):
+        """Returns True if the put completed."""
+        return self.event.is_set()
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+"""Fault capture: pre and post trigger windows of the axis channels.
+
+A background thread samples the axis channels from their CA monitors (no
+CA requests) into a fixed size ring buffer holding the last seconds of
+data. When the trigger expression becomes true, it keeps sampling for the
+post trigger time and saves the window around the trigger as a text log,
+log_<timestamp>_fault.dat, which the Analysis tab opens like a test log.
+
+The trigger is a Python expression of the channel values. Each channel key
+is an array with the values of the four axes (e.g. PosError), also given
+per axis (PosErrorA) and at the previous sample (PosError_prev); abs, any,
+all, max and min work on the arrays. Values are NaN until their channel
+connects, so compare them explicitly. For example:
+
+    any(OvertravelN == 1) or max(abs(PosError)) > 0.05
+
+Usage:
+    python -m undulator.devices.faultcapture [--trigger EXPR] [--pre 10]
+        [--post 5] [--rate 50]
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import argparse as _argparse
+import threading as _threading
+import traceback as _traceback
+import numpy as _np
+
+from undulator.devices import undulator as _undulator
+from undulator.devices.sampler import MonitorSampler as _MonitorSampler
+from undulator.devices.scheduler import PeriodicScheduler as _Scheduler
+from undulator.data.ringbuffer import TimeRingBuffer as _TimeRingBuffer
+from undulator.data.logwriter import format_chunk as _format_chunk
+
+
+AXIS_NAMES = ('A', 'B', 'C', 'D')
+# key, unit; the first four are the columns of the test logs
+CHANNELS = (
+    ('ActualPos', 'mm'),
+    ('PosError', 'mm'),
+    ('Current', 'A'),
+    ('Torque', '%'),
+    ('ActualSpd', 'mm/s'),
+    ('ServoOn', ''),
+    ('Moving', ''),
+    ('OvertravelN', ''),
+    ('OvertravelP', ''),
+    )
+DEFAULT_TRIGGER = ('any(OvertravelN == 1) or any(OvertravelP == 1) '
+                   'or any((ServoOn_prev == 1) & (ServoOn == 0)) '
+                   'or max(abs(PosError)) > 0.1')
+FUNCTIONS = {
+    'abs': _np.abs,
+    'any': _np.any,
+    'all': _np.all,
+    'max': _np.max,
+    'min': _np.min,
+    }
+
+
+def get_column_name(key, axis, unit):
+    """Returns the log column name of an axis channel."""
+    if unit == '':
+        return key + axis
+    return '{0:s}{1:s} [{2:s}]'.format(key, axis, unit)
+
+
+def get_channels(undulator=_undulator):
+    """Returns the captured channels: column name -> PV, in the test log
+    order (axis major) for the first four keys."""
+    _channels = {}
+    for _group in (CHANNELS[:4], CHANNELS[4:]):
+        for _axis in AXIS_NAMES:
+            for _key, _unit in _group:
+                _channels[get_column_name(_key, _axis, _unit)] = (
+                    undulator[_axis][_key])
+    return _channels
+
+
+class Trigger(object):
+    """Compiled trigger expression of the channel values."""
+
+    def __init__(self, expression, names):
+        """Compiles the expression.
+
+        Args:
+            expression (str): trigger expression.
+            names (list): column names, in the sample order.
+
+        Raises:
+            ValueError: if the expression is invalid or uses unknown
+                names."""
+        self.expression = expression
+        # column indexes of each key, in axis order
+        self.keys = {}
+        for _key, _unit in CHANNELS:
+            self.keys[_key] = _np.array([
+                names.index(get_column_name(_key, _axis, _unit))
+                for _axis in AXIS_NAMES])
+        _allowed = set(FUNCTIONS)
+        for _key in self.keys:
+            _allowed.add(_key)
+            _allowed.add(_key + '_prev')
+            _allowed.update(_key + _axis for _axis in AXIS_NAMES)
+        try:
+            self.code = compile(expression, '<trigger>', 'eval')
+        except SyntaxError as _e:
+            raise ValueError('Invalid trigger expression: ' + str(_e))
+        _unknown = set(self.code.co_names) - _allowed
+        if len(_unknown) > 0:
+            raise ValueError('Unknown names in the trigger expression: ' +
+                             ', '.join(sorted(_unknown)))
+        _nan = _np.full(len(names), _np.nan)
+        self.evaluate(_nan, _nan)
+
+    def evaluate(self, values, previous):
+        """Evaluates the expression.
+
+        Args:
+            values (numpy.ndarray): channel values.
+            previous (numpy.ndarray): channel values of the previous
+                sample.
+
+        Returns:
+            the expression value as a bool."""
+        _names = dict(FUNCTIONS)
+        for _key, _index in self.keys.items():
+            _values = values[_index]
+            _names[_key] = _values
+            _names[_key + '_prev'] = previous[_index]
+            for _axis, _value in zip(AXIS_NAMES, _values):
+                _names[_key + _axis] = _value
+        with _np.errstate(invalid='ignore'):
+            return bool(eval(self.code, {'__builtins__': {}}, _names))
+
+
+class FaultCapture(_threading.Thread):
+    """Always on capture of the axis channels around faults."""
+
+    def __init__(self, trigger=DEFAULT_TRIGGER, pre_time=10, post_time=5,
+                 rate=50, holdoff=10, directory='.', channels=None):
+        """Initializes the capture thread.
+
+        Args:
+            trigger (str): trigger expression.
+            pre_time (float): time (in seconds) saved before the trigger.
+            post_time (float): time (in seconds) saved after the trigger.
+            rate (float): sampling rate in Hz.
+            holdoff (float): minimum time (in seconds) between the end of a
+                capture and the next trigger.
+            directory (str): directory of the fault logs.
+            channels (dict): column name -> PV, get_channels() if None.
+
+        Raises:
+            ValueError: if the trigger expression is invalid."""
+        super().__init__(name='FaultCapture', daemon=True)
+        if channels is None:
+            channels = get_channels()
+        self.sampler = _MonitorSampler(channels)
+        self.names = self.sampler.names
+        self.trigger = Trigger(trigger, self.names)
+        self.pre_time = pre_time
+        self.post_time = post_time
+        self.holdoff = holdoff
+        self.directory = directory
+        self.scheduler = _Scheduler(1/rate)
+        # values and IOC timestamps of each sample
+        _size = int(_np.ceil((pre_time + post_time)*rate)) + 1
+        self.buffer = _TimeRingBuffer(2*len(self.names), _size)
+
+        self.captures = []
+        self.trigger_errors = 0
+        self.triggered_at = None
+        self._stop_event = _threading.Event()
+
+    @property
+    def state(self):
+        """Returns 'armed' or 'capturing'."""
+        return 'capturing' if self.triggered_at is not None else 'armed'
+
+    def stop(self, timeout=5):
+        """Stops the capture thread."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        """Samples the channels and saves the windows around the
+        triggers."""
+        _n = len(self.names)
+        _row = _np.full(2*_n, _np.nan)
+        _previous = _np.full(_n, _np.nan)
+        _was_true = True
+        _armed_at = 0
+        _not_connected = self.sampler.start()
+        if len(_not_connected) > 0:
+            print('Fault capture channels not connected: ' +
+                  ', '.join(_not_connected))
+        self.scheduler.start()
+        try:
+            while self.scheduler.wait(self._stop_event) is not None:
+                _now, _, _ = self.sampler.snapshot(
+                    values=_row[:_n], timestamps=_row[_n:])
+                self.buffer.append(_now, _row)
+
+                try:
+                    _true = self.trigger.evaluate(_row[:_n], _previous)
+                except Exception:
+                    _true = False
+                    self.trigger_errors += 1
+                    if self.trigger_errors == 1:
+                        _traceback.print_exc(file=_sys.stdout)
+                _np.copyto(_previous, _row[:_n])
+
+                if self.triggered_at is None:
+                    if _true and not _was_true and _now >= _armed_at:
+                        self.triggered_at = _now
+                elif _now >= self.triggered_at + self.post_time:
+                    self.save(self.triggered_at)
+                    self.triggered_at = None
+                    _armed_at = _now + self.holdoff
+                _was_true = _true
+        finally:
+            self.sampler.stop()
+
+    def get_window(self, t_trigger):
+        """Returns the samples around a trigger, with times relative to
+        it, as a (nrows x ncols) array in the log column order."""
+        _times, _values = self.buffer.get()
+        _mask = ((_times >= t_trigger - self.pre_time) &
+                 (_times <= t_trigger + self.post_time))
+        _n = len(self.names)
+        _data = _np.empty((int(_mask.sum()), 2*_n + 1))
+        _data[:, 0] = _times[_mask] - t_trigger
+        _data[:, 1:] = _values[_mask]
+        _data[:, _n + 1:] -= t_trigger
+        return _data
+
+    def save(self, t_trigger):
+        """Saves the window around a trigger as a text log.
+
+        Returns:
+            the log file name."""
+        _data = self.get_window(t_trigger)
+        _timestamp = _time.strftime('%Y_%m_%d_%H_%M_%S',
+                                    _time.localtime(t_trigger))
+        _filename = _os.path.join(
+            self.directory, 'log_' + _timestamp + '_fault.dat')
+        _columns = (['t [s]'] + self.names +
+                    ['tIOC ' + _name.split(' ')[0] + ' [s]'
+                     for _name in self.names])
+        _sampling = self.scheduler.summary()
+        with open(_filename, 'w') as _f:
+            _f.write('Comments: Fault capture, trigger: ' +
+                     self.trigger.expression + '\n')
+            _f.write('Test positions [mm]: \n')
+            _f.write('Sampling: ' + _sampling + '\n')
+            _f.write('\t'.join(_columns) + '\n')
+            _f.write(_format_chunk(_data))
+        self.captures.append(_filename)
+        print('Fault captured: ' + _filename)
+        return _filename
+
+
+def main(args=None):
+    """Runs the fault capture until Ctrl-C is pressed."""
+    _parser = _argparse.ArgumentParser(
+        prog='python -m undulator.devices.faultcapture',
+        description='Captures the axis channels around faults.')
+    _parser.add_argument('--trigger', default=DEFAULT_TRIGGER,
+                         help='trigger expression')
+    _parser.add_argument('--pre', type=float, default=10,
+                         help='time saved before the trigger in seconds')
+    _parser.add_argument('--post', type=float, default=5,
+                         help='time saved after the trigger in seconds')
+    _parser.add_argument('--rate', type=float, default=50,
+                         help='sampling rate in Hz')
+    _parser.add_argument('--holdoff', type=float, default=10,
+                         help='minimum time between captures in seconds')
+    _parser.add_argument('--log-dir', default='.',
+                         help='directory of the fault logs')
+    _args = _parser.parse_args(args)
+    _capture = FaultCapture(_args.trigger, _args.pre, _args.post,
+                            _args.rate, _args.holdoff, _args.log_dir)
+    _capture.start()
+    try:
+        while _capture.is_alive():
+            _capture.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _capture.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+"""Channel Access latency and traffic statistics.
+
+Every get, put, put completion and monitor of the PVs created by the
+registry is counted and its latency added to a fixed log-spaced
+histogram, so the cost per call is a bisection and a few increments and
+the statistics can stay enabled in production.
+"""
+
+import json as _json
+import time as _time
+import bisect as _bisect
+import threading as _threading
+import collections as _collections
+import numpy as _np
+
+from epics import PV as _PV
+
+
+# histogram bin edges, 4 bins per decade from 1 us to 10 s
+EDGES = list(10**_np.arange(-6, 1.01, 0.25))
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies (in seconds) with log-spaced bins."""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0]*(len(EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Adds a latency value."""
+        self.counts[_bisect.bisect_right(EDGES, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Adds the values of another histogram."""
+        for _i, _n in enumerate(other.counts):
+            self.counts[_i] += _n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        """Mean latency, NaN if empty."""
+        if self.count == 0:
+            return _np.nan
+        return self.total/self.count
+
+    def percentile(self, q):
+        """Returns the upper edge of the bin containing the q-th
+        percentile (0-100), NaN if empty."""
+        if self.count == 0:
+            return _np.nan
+        _limit = q/100*self.count
+        _sum = 0
+        for _i, _n in enumerate(self.counts):
+            _sum += _n
+            if _sum >= _limit and _n > 0:
+                return EDGES[_i] if _i < len(EDGES) else self.max
+        return self.max
+
+    def to_dict(self):
+        """Returns the histogram as a dict."""
+        return {'count': self.count,
+                'mean': self.mean,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': self.max,
+                'counts': list(self.counts)}
+
+
+class ChannelStats(object):
+    """Latency histograms and connection counters of one channel."""
+
+    __slots__ = ('histograms', 'connects', 'disconnects')
+
+    def __init__(self):
+        self.histograms = {}
+        self.connects = 0
+        self.disconnects = 0
+
+    def to_dict(self):
+        """Returns the statistics as a dict."""
+        return {'connects': self.connects,
+                'disconnects': self.disconnects,
+                'latency': {_kind: _hist.to_dict()
+                            for _kind, _hist in self.histograms.items()}}
+
+
+class CAStats(object):
+    """Process-wide statistics of the CA and serial traffic.
+
+    Latency kinds:
+        get: get requested from the IOC (use_monitor=False).
+        get_monitor: get that may return the monitored value.
+        put: put call, until the completion if wait=True.
+        put_complete: from the put call to its completion (wait=True or
+            completion callback).
+        monitor: age of each monitor when delivered (local time minus IOC
+            timestamp, so it includes the clock offset).
+        callback: time spent running the monitor callbacks.
+        serial_read: display reading request.
+    """
+
+    def __init__(self, max_events=1000):
+        """Initializes the statistics.
+
+        Args:
+            max_events (int): number of connection events kept."""
+        self.channels = {}
+        self.events = _collections.deque(maxlen=max_events)
+        self.t_start = _time.time()
+        self._lock = _threading.Lock()
+        self._last_summary = (_time.monotonic(), {})
+
+    def _get(self, name):
+        _stats = self.channels.get(name)
+        if _stats is None:
+            _stats = ChannelStats()
+            self.channels[name] = _stats
+        return _stats
+
+    def record(self, name, kind, latency):
+        """Adds a latency value.
+
+        Args:
+            name (str): channel name.
+            kind (str): latency kind, e.g. 'get'.
+            latency (float): latency in seconds."""
+        with self._lock:
+            _hists = self._get(name).histograms
+            _hist = _hists.get(kind)
+            if _hist is None:
+                _hist = LatencyHistogram()
+                _hists[kind] = _hist
+            _hist.add(latency)
+
+    def connection(self, name, connected):
+        """Records a connection or disconnection event."""
+        with self._lock:
+            _stats = self._get(name)
+            if connected:
+                _stats.connects += 1
+            else:
+                _stats.disconnects += 1
+            self.events.append((_time.time(), name, bool(connected)))
+
+    def totals(self):
+        """Returns a dict kind -> LatencyHistogram of all channels."""
+        _totals = {}
+        with self._lock:
+            for _stats in self.channels.values():
+                for _kind, _hist in _stats.histograms.items():
+                    _total = _totals.setdefault(_kind, LatencyHistogram())
+                    _total.merge(_hist)
+        return _totals
+
+    def disconnected(self):
+        """Returns the names of the channels whose last connection event
+        is a disconnection."""
+        with self._lock:
+            return [_name for _name, _stats in self.channels.items()
+                    if _stats.disconnects >= _stats.connects > 0]
+
+    def summary(self):
+        """Returns a one line summary: call rates since the previous
+        summary and p90 latencies since the start."""
+        _totals = self.totals()
+        _now = _time.monotonic()
+        _t_last, _last = self._last_summary
+        _dt = max(_now - _t_last, 1e-9)
+        self._last_summary = (_now, {_kind: _hist.count
+                                     for _kind, _hist in _totals.items()})
+
+        _parts = []
+        for _kind, _label in [('get', 'get'), ('put_complete', 'put'),
+                              ('monitor', 'mon'), ('callback', 'cb'),
+                              ('serial_read', 'display')]:
+            _hist = _totals.get(_kind)
+            if _hist is None or _hist.count == 0:
+                continue
+            _rate = (_hist.count - _last.get(_kind, 0))/_dt
+            _parts.append('{0:s} {1:.0f}/s p90 {2:.1f} ms'.format(
+                _label, _rate, 1e3*_hist.percentile(90)))
+        _disconnects = sum(_stats.disconnects
+                           for _stats in list(self.channels.values()))
+        _parts.append('{0:d} disconnects'.format(_disconnects))
+        _down = len(self.disconnected())
+        if _down > 0:
+            _parts.append('{0:d} PVs down'.format(_down))
+        return 'CA: ' + ', '.join(_parts)
+
+    def to_dict(self):
+        """Returns all the statistics as a dict."""
+        with self._lock:
+            _channels = {_name: _stats.to_dict()
+                         for _name, _stats in self.channels.items()}
+            _events = list(self.events)
+        return {'t_start': self.t_start,
+                't_export': _time.time(),
+                'bin_edges': EDGES,
+                'totals': {_kind: _hist.to_dict()
+                           for _kind, _hist in self.totals().items()},
+                'channels': _channels,
+                'connection_events': [
+                    {'time': _t, 'name': _name, 'connected': _conn}
+                    for _t, _name, _conn in _events]}
+
+    def export(self, filename):
+        """Saves all the statistics as JSON."""
+        with open(filename, 'w') as _f:
+            _json.dump(self.to_dict(), _f, indent=1)
+
+    def reset(self):
+        """Clears the statistics."""
+        with self._lock:
+            self.channels.clear()
+            self.events.clear()
+            self.t_start = _time.time()
+        self._last_summary = (_time.monotonic(), {})
+
+
+stats = CAStats()
+
+
+class InstrumentedPV(_PV):
+    """PV recording its latencies and connection events in stats."""
+
+    def __init__(self, pvname, *args, **kwargs):
+        _callback = kwargs.pop('connection_callback', None)
+        super().__init__(pvname, *args,
+                         connection_callback=self._on_connection, **kwargs)
+        if _callback is not None:
+            self.connection_callbacks.append(_callback)
+
+    def _on_connection(self, pvname=None, conn=None, **kwargs):
+        stats.connection(pvname, conn)
+
+    def get(self, *args, **kwargs):
+        _kind = 'get_monitor' if kwargs.get('use_monitor', True) else 'get'
+        _t = _time.perf_counter()
+        try:
+            return super().get(*args, **kwargs)
+        finally:
+            stats.record(self.pvname, _kind, _time.perf_counter() - _t)
+
+    def put(self, value, wait=False, timeout=30.0, use_complete=False,
+            callback=None, callback_data=None):
+        _t = _time.perf_counter()
+        if callback is not None:
+            _user_callback = callback
+
+            def callback(*args, **kwargs):
+                stats.record(self.pvname, 'put_complete',
+                             _time.perf_counter() - _t)
+                return _user_callback(*args, **kwargs)
+
+        try:
+            return super().put(value, wait=wait, timeout=timeout,
+                               use_complete=use_complete, callback=callback,
+                               callback_data=callback_data)
+        finally:
+            _elapsed = _time.perf_counter() - _t
+            if wait:
+                stats.record(self.pvname, 'put_complete', _elapsed)
+            stats.record(self.pvname, 'put', _elapsed)
+
+    def run_callbacks(self):
+        if self.timestamp:
+            stats.record(self.pvname, 'monitor',
+                         max(_time.time() - self.timestamp, 0))
+        _t = _time.perf_counter()
+        super().run_callbacks()
+        stats.record(self.pvname, 'callback', _time.perf_counter() - _t)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""Process-wide registry of shared EPICS PVs."""
+
+import threading as _threading
+
+from epics import PV as _PV
+
+
+class PVRegistry(object):
+    """Creates each PV once and hands out the same instance to every user,
+    so Channel Access searches and connections are done only once per
+    process."""
+
+    def __init__(self, pv_class=_PV):
+        """Initializes the registry.
+
+        Args:
+            pv_class (class): class used to create new PVs."""
+        self.pv_class = pv_class
+        self._pvs = {}
+        self._lock = _threading.Lock()
+
+    def __contains__(self, pvname):
+        return pvname in self._pvs
+
+    def __len__(self):
+        return len(self._pvs)
+
+    def get(self, pvname):
+        """Returns the shared PV, creating it on first use.
+
+        Args:
+            pvname (str): PV name."""
+        _pv = self._pvs.get(pvname)
+        if _pv is None:
+            with self._lock:
+                _pv = self._pvs.get(pvname)
+                if _pv is None:
+                    _pv = self.pv_class(pvname)
+                    self._pvs[pvname] = _pv
+        return _pv
+
+    def names(self):
+        """Returns the names of the registered PVs."""
+        return list(self._pvs.keys())
+
+    def pvs(self):
+        """Returns the registered PVs."""
+        return list(self._pvs.values())
+
+    def wait_for_connection(self, timeout=2):
+        """Waits until the registered PVs connect.
+
+        The connections are started when the PVs are created, so the total
+        waiting time is bounded by timeout, not by the number of PVs.
+
+        Args:
+            timeout (float): maximum waiting time (in seconds).
+
+        Returns:
+            a list with the names of the PVs not connected."""
+        _not_connected = []
+        for _name, _pv in list(self._pvs.items()):
+            if not _pv.connected:
+                if not _pv.wait_for_connection(timeout=timeout):
+                    _not_connected.append(_name)
+                    timeout = 0
+        return _not_connected
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""Drift free periodic scheduling with timing statistics."""
+
+import time as _time
+import numpy as _np
+
+
+class PeriodicScheduler(object):
+    """Waits for absolute monotonic deadlines, so the loop period does not
+    depend on the loop work time and errors do not accumulate.
+
+    Late ticks are handled by the policy: 'skip' drops the missed deadlines
+    and keeps the tick grid; 'catchup' runs the missed ticks at once.
+    The lateness of every tick is recorded.
+    """
+
+    def __init__(self, interval, policy='skip', history=100000):
+        """Initializes the scheduler.
+
+        Args:
+            interval (float): tick interval in seconds.
+            policy (str): 'skip' or 'catchup'.
+            history (int): number of latest tick latenesses kept for the
+                percentiles."""
+        if policy not in ('skip', 'catchup'):
+            raise ValueError('Invalid scheduler policy: ' + str(policy))
+        self.interval = float(interval)
+        self.policy = policy
+        self.lateness = _np.zeros(int(history))
+        self.ticks = 0
+        self.missed = 0
+        self.t_start = None
+        self.t_last = None
+        self.next = None
+
+    @property
+    def rate(self):
+        """Target rate in Hz."""
+        return 1/self.interval
+
+    def start(self):
+        """Sets the first deadline to now."""
+        self.t_start = _time.monotonic()
+        self.t_last = self.t_start
+        self.next = self.t_start
+        self.ticks = 0
+        self.missed = 0
+
+    def wait(self, event=None):
+        """Sleeps until the next deadline.
+
+        Args:
+            event (threading.Event): optional event that interrupts the
+                wait; the deadline is kept for the next call.
+
+        Returns:
+            the lateness (in seconds) of this tick, or None if the event
+            was set before the deadline."""
+        if self.next is None:
+            self.start()
+        _now = _time.monotonic()
+        if _now < self.next:
+            if event is None:
+                _time.sleep(self.next - _now)
+            elif event.wait(self.next - _now):
+                return None
+            _now = _time.monotonic()
+        _late = _now - self.next
+        self.lateness[self.ticks % len(self.lateness)] = _late
+        self.ticks += 1
+        self.t_last = _now
+
+        self.next += self.interval
+        if _now > self.next and self.policy == 'skip':
+            _n = int((_now - self.next)//self.interval) + 1
+            self.missed += _n
+            self.next += _n*self.interval
+        return _late
+
+    def stats(self):
+        """Returns the timing statistics.
+
+        Returns:
+            a dict with target and achieved rates (Hz), number of ticks,
+            missed deadlines and lateness percentiles (s)."""
+        _n = min(self.ticks, len(self.lateness))
+        _late = self.lateness[:_n]
+        _stats = {'target_rate': self.rate,
+                  'rate': _np.nan,
+                  'ticks': self.ticks,
+                  'missed': self.missed,
+                  'p50': _np.nan,
+                  'p90': _np.nan,
+                  'p99': _np.nan,
+                  'max': _np.nan}
+        if self.ticks > 1 and self.t_last > self.t_start:
+            _stats['rate'] = (self.ticks - 1)/(self.t_last - self.t_start)
+        if _n > 0:
+            _p = _np.percentile(_late, [50, 90, 99])
+            _stats['p50'], _stats['p90'], _stats['p99'] = _p
+            _stats['max'] = _late.max()
+        return _stats
+
+    def summary(self):
+        """Returns the statistics as a single line string."""
+        _s = self.stats()
+        return ('rate {0:.3f} Hz (target {1:.3f} Hz), {2:d} ticks, '
+                '{3:d} missed, lateness p50 {4:.3f} ms, p90 {5:.3f} ms, '
+                'p99 {6:.3f} ms, max {7:.3f} ms').format(
+                    _s['rate'], _s['target_rate'], _s['ticks'], _s['missed'],
+                    1e3*_s['p50'], 1e3*_s['p90'], 1e3*_s['p99'],
+                    1e3*_s['max'])
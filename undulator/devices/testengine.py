@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+
+"""Test threads: display reading and axis tests, independent of Qt."""
+
+import numpy as _np
+import time as _time
+import threading as _threading
+
+from undulator import devices as _devices
+from undulator.devices import undulator as _undulator
+from undulator.devices.sampler import MonitorSampler as _MonitorSampler
+from undulator.devices.scheduler import PeriodicScheduler as _Scheduler
+from undulator.devices.instrumentation import stats as _ca_stats
+from undulator.devices.events import (
+    PVEvent as _PVEvent,
+    PutEvent as _PutEvent,
+    )
+from undulator.data.acquisition import AcquisitionBuffer as _AcqBuffer
+from undulator.data.logwriter import LogWriter as _LogWriter
+from undulator.data import binarylog as _binarylog
+from undulator.data.ringbuffer import TimeRingBuffer as _TimeRingBuffer
+from undulator.data.sharedbuffer import SharedRingBuffer as _SharedRingBuffer
+
+
+# ND-780 serial settings (the pyserial SEVENBITS, STOPBITS_TWO and
+# PARITY_EVEN values, so pyserial is only imported with the display)
+DISPLAY_SETTINGS = {
+    'baudrate': 9600,
+    'bytesize': 7,
+    'stopbits': 2,
+    'parity': 'E',
+    }
+
+
+def connect_display(port, period=0.2):
+    """Connects the Heidenhain display and starts its reading thread.
+
+    Args:
+        port (str): serial port.
+        period (float): display reading period in seconds.
+
+    Returns:
+        the ThdReadDisplay thread, or None if the display did not
+        connect."""
+    if _devices.display.connect(port=port, **DISPLAY_SETTINGS) is None:
+        return None
+    _thd = ThdReadDisplay(period)
+    _thd.start()
+    return _thd
+
+
+def disconnect_display(thd):
+    """Stops the display reading thread and disconnects the display.
+
+    Args:
+        thd (ThdReadDisplay): display reading thread."""
+    if thd is not None:
+        thd.run_flag = False
+        thd.join(2*thd.period + 1)
+    _devices.display.disconnect()
+
+
+class ThdReadDisplay(_threading.Thread):
+    """Thread reads Heidenhain display and provides its data to the
+    interface."""
+    def __init__(self, period=0.2):
+        """Initializes the thread.
+
+        Args:
+            period (float): display reading period in seconds."""
+        super().__init__()
+        self.setDaemon = True
+        self.name = 'ThdReadDisplay'
+
+        self.period = period
+        self.run_flag = True
+        self.zero_flag = False
+
+        self.x = _np.nan
+        self.y = _np.nan
+        self.z = _np.nan
+        self.timestamp = _np.nan
+        self.buffer = _TimeRingBuffer(3)
+        self.scheduler = _Scheduler(period)
+
+    def run(self):
+        self.run_flag = True
+        self.scheduler.start()
+        while self.run_flag:
+            self.scheduler.wait()
+            if self.zero_flag:
+                self.zero_flag = False
+                _devices.display.reset_set_ref()
+            _t_read = _time.time()
+            _x, _y, _z = _devices.display.read_display()
+            _t_end = _time.time()
+            _ca_stats.record('display', 'serial_read', _t_end - _t_read)
+            # the reading is timestamped at the middle of the serial request
+            self.timestamp = 0.5*(_t_read + _t_end)
+            self.buffer.append(self.timestamp, (_x, _y, _z))
+            self.x, self.y, self.z = _x, _y, _z
+
+
+class ThdTestAxis(_threading.Thread):
+    """Thread runs the tests without blocking the graphical interface."""
+    def __init__(self, test_pos=None, comments='', mode=0, wtime=10,
+                 upd_interval=0.02, policy='skip'):
+        """Initizalizes the thread.
+
+        Args:
+            test_pos (list): list with the points to be scanned.
+            comments (str): test description.
+            mode (int): 0 for discrete mode;
+                        1 for continuous mode;
+                        2 for manual mode.
+            wtime (float): wainting time (in seconds) between two points.
+            upd_interval (float): sampling interval (in seconds).
+            policy (str): late sample policy, 'skip' drops the missed
+                samples and 'catchup' acquires them at once.
+        """
+        super().__init__()
+        self.setDaemon = True
+        self.name = "ThdTestAxis"
+
+        if test_pos is None:
+            self.test_pos = [-1, 1, 0]
+        else:
+            self.test_pos = test_pos
+        self.wtime = wtime
+        self.comments = comments
+        if mode in [0, 1, 2]:
+            self.mode = mode
+        else:
+            self.mode = 0
+
+        self.upd_interval = upd_interval
+        self.scheduler = _Scheduler(upd_interval, policy)
+        self.data = None
+        self.chunk_size = 500
+        self.log_writer = None
+        self.log_name = None
+        self.log_info = ('', '')
+        self.binary_log = False
+        self.events_file = None
+        self.setpoint_timeout = 5
+        self.start_timeout = 5
+        self.move_timeout = 300
+        self.position_tol = 1e-6
+        self.display_merge = 'interp'
+        self.sampling_width = 400
+        self.continuous_flag = False
+        self.manual_flag = False
+        self.acquire_flag = False
+        self.abort_flag = False
+        self.live_size = 0
+        self.live_buffer = None
+        self.unlink_live_buffer = True
+
+        self.undulator = _undulator
+        self.motorA = _undulator['A']
+        self.motorB = _undulator['B']
+        self.motorC = _undulator['C']
+        self.motorD = _undulator['D']
+        self.en_flags = _undulator.flags
+
+        self.channels = {}
+        for _name, _motor in zip(['A', 'B', 'C', 'D'],
+                                 [self.motorA, self.motorB,
+                                  self.motorC, self.motorD]):
+            for _key, _unit in [('ActualPos', 'mm'), ('PosError', 'mm'),
+                                ('Current', 'A'), ('Torque', '%')]:
+                _col = '{0:s}{1:s} [{2:s}]'.format(_key, _name, _unit)
+                self.channels[_col] = _motor[_key]
+        self.sampler = _MonitorSampler(self.channels)
+        self.t0 = 0
+
+    def run(self):
+        """Collect information about the undulator axes and saves a log. There
+        are 3 different modes.
+
+            Discrete mode: moves the selected axis to a position in test_pos
+                and waits wtime before moving to the next position in test_pos,
+                until all positions are swept.
+
+            Continuous mode: acquires data continously until a button is
+                pressed to stop the acquisition.
+
+            Manual mode: acquires data only when a button os pressed."""
+        _test_pos = self.test_pos
+        _wtime = self.wtime
+        _comments = self.comments
+        _mode = self.mode
+
+        self.thd_display = None
+        _thd_list = _threading.enumerate()
+        for _t in _thd_list:
+            if _t.name == 'ThdReadDisplay':
+                self.thd_display = _t
+        self.data = _AcqBuffer(self.get_columns(), self.chunk_size)
+
+        _motor = self.undulator.moving_axis()
+
+        if _motor is not None:
+            _not_connected = self.sampler.start()
+            if len(_not_connected) > 0:
+                print('Channels not connected: ' + ', '.join(_not_connected))
+            _t0 = _time.time()
+            self.t0 = _t0
+            self.start_log(_test_pos, _comments)
+            if self.live_size > 0:
+                self.live_buffer = _SharedRingBuffer(
+                    self.data.columns, self.live_size, t0=_t0)
+            self.scheduler.start()
+
+            try:
+                # discrete test mode
+                if _mode == 0:
+                    self.run_discrete(_motor, _test_pos, _wtime)
+
+                # continuous test mode
+                elif _mode == 1:
+                    while self.continuous_flag:
+                        self.scheduler.wait()
+                        _t = _time.time() - _t0
+                        self.acquire(_t)
+
+                # manual test mode
+                elif _mode == 2:
+                    while self.manual_flag:
+                        self.scheduler.wait()
+                        if self.acquire_flag:
+                            _t = _time.time() - _t0
+                            self.acquire(_t)
+                            self.acquire_flag = False
+
+            finally:
+                self.sampler.stop()
+                self.flush_log(final=True)
+                if self.live_buffer is not None and self.unlink_live_buffer:
+                    self.live_buffer.unlink()
+
+        print('Test successfuly completed.')
+
+    def run_discrete(self, motor, test_pos, wtime):
+        """Runs the discrete test sequence. Each step is driven by the put
+        completions and by the MovePos and MoveStatus monitors, sampling
+        while waiting for them.
+
+        Args:
+            motor (Axis): axis with the move flag set.
+            test_pos (list): list with the points to be scanned.
+            wtime (float): waiting time (in seconds) at each point."""
+        _axes = [self.motorA, self.motorB, self.motorC, self.motorD]
+        _notify = _threading.Event()
+        for _pos in test_pos:
+            if self.abort_flag:
+                break
+            _step = 'pos {0:g}: '.format(_pos)
+            _setpoints = [
+                _PVEvent(_axis['MovePos'],
+                         lambda _v, _p=_pos: abs(_v - _p) < self.position_tol,
+                         _step + 'MovePos{0:s} readback'.format(_axis.name),
+                         _notify).arm()
+                for _axis in _axes]
+            for _axis in _axes:
+                _axis['MovePos'].put(_pos, wait=False)
+            if not self.wait_events(_setpoints, self.setpoint_timeout,
+                                    _notify):
+                break
+
+            # MoveStatus never rises if the axis is already at the target
+            if abs(self.get_position(motor) - _pos) < self.position_tol:
+                self.log_event(_step + 'in position', _time.time())
+            else:
+                _start = _PVEvent(motor['Moving'], lambda _v: bool(_v),
+                                  _step + 'MoveStatus on', _notify).arm()
+                _en_move = _PutEvent(self.en_flags['EnMove'],
+                                     _step + 'EnMove put complete', _notify)
+                _en_move.put(True)
+                if not self.wait_events([_en_move, _start],
+                                        self.start_timeout, _notify):
+                    break
+
+                _stop = _PVEvent(motor['Moving'], lambda _v: not _v,
+                                 _step + 'MoveStatus off', _notify).arm()
+                if not self.wait_events([_stop], self.move_timeout,
+                                        _notify):
+                    break
+
+            _t1 = _time.time()
+            while (_time.time() - _t1) < wtime and not self.abort_flag:
+                self.scheduler.wait()
+                _t = _time.time() - self.t0
+                self.acquire(_t)
+
+    def get_position(self, motor):
+        """Returns the last monitored actual position of an axis, or NaN
+        if it is not sampled."""
+        _name = 'ActualPos{0:s} [mm]'.format(motor.name)
+        if _name not in self.sampler.names:
+            return _np.nan
+        _, _values, _ = self.sampler.snapshot()
+        return _values[self.sampler.names.index(_name)]
+
+    def wait_events(self, events, timeout, notify):
+        """Samples until all the events are set, logging the detection time
+        of each one. The sampling deadlines are kept while waiting.
+
+        Args:
+            events (list): PVEvent or PutEvent objects.
+            timeout (float): maximum waiting time (in seconds).
+            notify (threading.Event): event set by any of the events.
+
+        Returns:
+            True if all the events were set, False on timeout."""
+        _deadline = _time.monotonic() + timeout
+        _pending = list(events)
+        try:
+            while True:
+                notify.clear()
+                for _event in [_e for _e in _pending if _e.is_set()]:
+                    _pending.remove(_event)
+                    _event.disarm()
+                    self.log_event(_event.name, _event.time, _event.timestamp)
+                if len(_pending) == 0:
+                    return True
+                if self.abort_flag:
+                    for _event in _pending:
+                        self.log_event(_event.name + ' aborted', _time.time())
+                    print('Test aborted.')
+                    return False
+                if _time.monotonic() > _deadline:
+                    for _event in _pending:
+                        self.log_event(_event.name + ' timeout', _time.time())
+                    print('Test aborted: ' + _pending[0].name + ' timeout.')
+                    return False
+                if self.scheduler.wait(notify) is not None:
+                    _t = _time.time() - self.t0
+                    self.acquire(_t)
+        finally:
+            for _event in _pending:
+                _event.disarm()
+
+    def log_event(self, name, time, timestamp=None):
+        """Writes a sequencer event to the events file.
+
+        Args:
+            name (str): event description.
+            time (float): local time the event was detected.
+            timestamp (float): IOC timestamp of the event, if any."""
+        if self.events_file is None:
+            return
+        if timestamp is None:
+            timestamp = _np.nan
+        self.events_file.write('{0:.6f}\t{1:.6f}\t{2:s}\n'.format(
+            time - self.t0, timestamp - self.t0, name))
+        self.events_file.flush()
+
+    def get_columns(self):
+        """Returns the log column names: time, sampled channels, display
+        readings (if the display is connected) and IOC timestamps."""
+        _columns = ['t [s]'] + self.sampler.names
+        if self.thd_display is not None:
+            _columns += ['DisplayX [mm]', 'DisplayY [mm]', 'DisplayZ [mm]']
+        _columns += ['tIOC ' + _name.split(' ')[0] + ' [s]'
+                     for _name in self.sampler.names]
+        return _columns
+
+    def get_log_header(self, columns, test_pos, comments=''):
+        """Returns the test log header.
+
+        Args:
+            columns (list): log column names.
+            test_pos (list): a list of the test positions.
+            comments (str): test comments."""
+        _comments = 'Comments: ' + comments + '\n'
+        _test_pos_str = 'Test positions [mm]: '
+        for _val in test_pos:
+            _test_pos_str = _test_pos_str + str(_val) + ', '
+        _test_pos_str = _test_pos_str[:-2] + '\n'
+        # reserved, filled with the sampling statistics when the test ends
+        _sampling = 'Sampling: ' + ' '*self.sampling_width + '\n'
+        return (_comments + _test_pos_str + _sampling +
+                '\t'.join(columns) + '\n')
+
+    def get_sampling_summary(self):
+        """Returns the achieved sampling rate, lateness percentiles and
+        missed deadlines of the test (and of the display readings)."""
+        _summary = self.scheduler.summary()
+        if self.thd_display is not None:
+            _summary += ('; display ' +
+                         self.thd_display.scheduler.summary())
+        return _summary
+
+    def start_log(self, test_pos, comments=''):
+        """Creates the test log, writes its header and starts the writer
+        thread. The log name is log_year_month_day_hour_min_sec.dat. If
+        binary_log is set, a binary log with the same name is also saved.
+        Discrete tests also save the sequencer events in
+        log_year_month_day_hour_min_sec_events.txt.
+
+        Args:
+            test_pos (list): a list of the test positions.
+            comments (str): test comments."""
+        _timestamp = _time.strftime('%Y_%m_%d_%H_%M_%S', _time.localtime())
+        _log_name = 'log_' + _timestamp + '.dat'
+        _header = self.get_log_header(self.data.columns, test_pos, comments)
+        _raw_name = None
+        if self.binary_log:
+            _raw_name = 'log_' + _timestamp + '.raw'
+        self.log_name = _log_name
+        self.log_info = (comments, ', '.join(str(_val) for _val in test_pos))
+        self.log_writer = _LogWriter(_log_name, _header,
+                                     raw_filename=_raw_name)
+        self.log_writer.start()
+        if self.mode == 0:
+            self.events_file = open('log_' + _timestamp + '_events.txt', 'w')
+            self.events_file.write('t [s]\ttIOC [s]\tEvent\n')
+
+    def flush_log(self, final=False):
+        """Hands the complete buffer chunks to the log writer.
+
+        Args:
+            final (bool): if True, also writes the last partial chunk and
+                closes the log."""
+        if self.log_writer is None:
+            return
+        for _chunk in self.data.take(partial=final):
+            self.merge_display(_chunk)
+            self.log_writer.write(_chunk)
+        if final:
+            self.log_writer.close()
+            _sampling = self.get_sampling_summary()
+            self.log_writer.rewrite_header_line('Sampling: ', _sampling)
+            if self.events_file is not None:
+                self.events_file.close()
+                self.events_file = None
+            if self.log_writer.raw_filename is not None:
+                _binarylog.write_binary_log_from_raw(
+                    _binarylog.get_binary_name(self.log_name),
+                    self.log_writer.raw_filename, self.data.columns,
+                    self.log_info[0], self.log_info[1], _sampling)
+
+    def acquire(self, t):
+        """Stores a sample and streams the complete chunks to the log.
+
+        Args:
+            t (float): the time (after the test began) of the sample."""
+        self.get_axis_info(t)
+        if self.data.nstored > self.chunk_size:
+            # waits a display reading after the chunk end to interpolate
+            _chunks = self.data.complete_chunks()
+            if any([self.thd_display is None,
+                    self.data.nstored > 4*self.chunk_size,
+                    self.thd_display.buffer.last_time() >=
+                    self.t0 + _chunks[-1][-1, 0]]):
+                self.flush_log()
+
+    def merge_display(self, chunk):
+        """Aligns the display readings with the PLC samples of a chunk.
+
+        The display readings stored in the ring buffer are joined on time:
+        linearly interpolated if display_merge is 'interp', or the last
+        reading before each sample if it is 'asof'. Samples older than the
+        buffered readings (e.g. a long manual test flushed at the end)
+        keep the reading stored when they were acquired.
+
+        Args:
+            chunk (numpy.ndarray): (nrows x ncols) samples, changed in
+                place."""
+        if self.thd_display is None:
+            return
+        _n = len(self.sampler.names)
+        _times = chunk[:, 0] + self.t0
+        _buffer = self.thd_display.buffer
+        if self.display_merge == 'asof':
+            _values = _buffer.asof(_times)
+        else:
+            _values = _buffer.interp(_times)
+        # checked after the lookup, so readings overwritten meanwhile only
+        # make the covered range smaller
+        _covered = _times >= _buffer.first_time()
+        chunk[_covered, _n + 1:_n + 4] = _values[_covered]
+
+    def get_axis_info(self, t):
+        """Gets the following axis information for each axis: Actual Position,
+        Position Error, Output Current and Torque Reference, and stores it in
+        the next row of the acquisition buffer.
+
+        The values come from the sampler monitors, so no CA request is done
+        here. The IOC timestamp of each value (relative to the test start) is
+        also stored. The row is also published to the live buffer, if the
+        test has one (live_size > 0).
+
+        Args:
+            t (float): the time (after the test began) the information was
+                retrieved.
+
+        Returns:
+            a numpy.ndarray view of the buffer row."""
+        _n = len(self.sampler.names)
+        _row = self.data.next_row()
+        _row[0] = t
+        self.sampler.snapshot(values=_row[1:_n + 1], timestamps=_row[-_n:])
+        _row[-_n:] -= self.t0
+
+        if self.thd_display is not None:
+            _row[_n + 1] = self.thd_display.x
+            _row[_n + 2] = self.thd_display.y
+            _row[_n + 3] = self.thd_display.z
+
+        if self.live_buffer is not None:
+            self.live_buffer.append(_row)
+
+        return _row
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""Batched CA writes with completion tracking and readback verification.
+
+A put transaction issues a group of writes at once, waits for all their
+completions with one deadline and reads the written fields back in one
+bulk request, so a group costs a few round trips instead of one per
+field. The fields can be split in stages: a stage is only written after
+the previous one completed and was verified, so a failure never leaves a
+later stage (e.g. an enable flag) applied over a half-applied group.
+"""
+
+import sys as _sys
+import time as _time
+import threading as _threading
+import traceback as _traceback
+import numpy as _np
+
+from epics import ca as _ca
+
+from undulator.devices.instrumentation import stats as _stats
+
+
+# the PLC stores REAL (float32) values
+RTOL = 1e-6
+ATOL = 1e-9
+
+OK = 'ok'
+NOT_CONNECTED = 'not connected'
+NOT_COMPLETED = 'not completed'
+READBACK = 'readback differs'
+NOT_WRITTEN = 'not written'
+
+
+def wait_for_connection(pvs, timeout):
+    """Waits until the PVs connect, with one deadline for all."""
+    _t_end = _time.perf_counter() + timeout
+    for _pv in pvs:
+        if not _pv.connected:
+            _pv.wait_for_connection(max(_t_end - _time.perf_counter(), 0))
+
+
+def get_many(pvs, timeout=1.0):
+    """Reads PVs from the IOC in one bulk request.
+
+    The gets of every connected PV are sent before waiting for any reply,
+    so the total time is about one round trip.
+
+    Args:
+        pvs (list): epics.PV objects.
+        timeout (float): maximum waiting time (in seconds).
+
+    Returns:
+        a list with the values, None for the PVs not connected or not
+        answered."""
+    wait_for_connection(pvs, timeout)
+    _t = _time.perf_counter()
+    _requested = [_pv for _pv in pvs if _pv.connected]
+    for _pv in _requested:
+        _ca.get(_pv.chid, wait=False)
+    _ca.poll()
+    _values = {}
+    _t_end = _time.perf_counter() + timeout
+    for _pv in _requested:
+        _values[_pv.pvname] = _ca.get_complete(
+            _pv.chid, timeout=max(_t_end - _time.perf_counter(), 1e-3))
+    _elapsed = _time.perf_counter() - _t
+    for _pv in _requested:
+        _stats.record(_pv.pvname, 'get', _elapsed)
+    return [_values.get(_pv.pvname) for _pv in pvs]
+
+
+def is_equal(value, other):
+    """Returns True if a readback is equal to the written value within the
+    PLC precision."""
+    if value is None or other is None:
+        return False
+    return bool(_np.isclose(value, other, rtol=RTOL, atol=ATOL))
+
+
+class PutTransaction(object):
+    """Group of CA writes issued together and verified together."""
+
+    def __init__(self, timeout=2.0, name='transaction'):
+        """Initializes an empty transaction.
+
+        Args:
+            timeout (float): maximum time (in seconds) of each stage for the
+                connections, the put completions and the readbacks.
+            name (str): transaction description."""
+        self.timeout = timeout
+        self.name = name
+        # (stage, pv, value, verify)
+        self.fields = []
+        self.status = {}
+        self.elapsed = None
+        self._thread = None
+
+    def add(self, pv, value, verify=True, stage=0):
+        """Adds a write.
+
+        Args:
+            pv (epics.PV): PV to be written.
+            value: value to write.
+            verify (bool): reads the value back after the completion; use
+                False for command flags reset by the PLC.
+            stage (int): stage of the write, lower stages first.
+
+        Returns:
+            the transaction itself."""
+        self.fields.append((stage, pv, value, verify))
+        return self
+
+    @property
+    def failed(self):
+        """Names of the fields not applied, in the order added."""
+        return [_pv.pvname for _, _pv, _, _ in self.fields
+                if self.status.get(_pv.pvname) != OK]
+
+    @property
+    def ok(self):
+        """True if every field was written and verified."""
+        return len(self.failed) == 0
+
+    def report(self):
+        """Returns a text with the status of the failed fields."""
+        return '\n'.join('{0:s}: {1:s}'.format(
+            _name, self.status.get(_name, NOT_WRITTEN))
+            for _name in self.failed)
+
+    def run_stage(self, fields):
+        """Writes the fields of one stage.
+
+        Returns:
+            True if every field was written and verified."""
+        _pvs = [_pv for _, _pv, _, _ in fields]
+        wait_for_connection(_pvs, self.timeout)
+
+        _lock = _threading.Lock()
+        _pending = set()
+        _done = _threading.Event()
+
+        def _callback(pvname=None, **kwargs):
+            with _lock:
+                _pending.discard(pvname)
+                if len(_pending) == 0:
+                    _done.set()
+
+        for _, _pv, _value, _ in fields:
+            if not _pv.connected:
+                self.status[_pv.pvname] = NOT_CONNECTED
+                continue
+            with _lock:
+                _pending.add(_pv.pvname)
+            self.status[_pv.pvname] = NOT_COMPLETED
+            _pv.put(_value, wait=False, use_complete=True,
+                    callback=_callback)
+        with _lock:
+            if len(_pending) == 0:
+                _done.set()
+        _done.wait(self.timeout)
+
+        _verify = []
+        with _lock:
+            for _, _pv, _value, _check in fields:
+                if self.status[_pv.pvname] != NOT_COMPLETED:
+                    continue
+                if _pv.pvname in _pending:
+                    continue
+                if _check:
+                    _verify.append((_pv, _value))
+                else:
+                    self.status[_pv.pvname] = OK
+        _readbacks = get_many([_pv for _pv, _ in _verify], self.timeout)
+        for (_pv, _value), _readback in zip(_verify, _readbacks):
+            self.status[_pv.pvname] = (
+                OK if is_equal(_value, _readback) else READBACK)
+        return all(self.status[_pv.pvname] == OK for _pv in _pvs)
+
+    def run(self):
+        """Writes the stages in order, stopping at the first failure.
+
+        Returns:
+            True if every field was written and verified."""
+        _t = _time.perf_counter()
+        self.status = {}
+        try:
+            for _stage in sorted(set(_field[0] for _field in self.fields)):
+                _fields = [_field for _field in self.fields
+                           if _field[0] == _stage]
+                if not self.run_stage(_fields):
+                    break
+        finally:
+            self.elapsed = _time.perf_counter() - _t
+        return self.ok
+
+    def _run_thread(self):
+        try:
+            self.run()
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def start(self):
+        """Runs the transaction in a background thread."""
+        self._thread = _threading.Thread(
+            target=self._run_thread, name='PutTransaction', daemon=True)
+        self._thread.start()
+
+    def is_done(self):
+        """Returns True if the transaction started by start finished."""
+        return self._thread is not None and not self._thread.is_alive()
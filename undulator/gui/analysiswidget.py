@@ -2,17 +2,29 @@
 
 import os as _os
 import sys as _sys
-import pandas as _pd
-import qtpy.uic as _uic
+import numpy as _np
 import traceback as _traceback
 
 from qtpy.QtWidgets import (
     QWidget as _QWidget,
+    QLabel as _QLabel,
+    QGroupBox as _QGroupBox,
+    QGridLayout as _QGridLayout,
     QMessageBox as _QMessageBox,
+    QTableWidget as _QTableWidget,
+    QDoubleSpinBox as _QDoubleSpinBox,
+    QTableWidgetItem as _QTableWidgetItem,
     )
 
-from undulator.gui.utils import getUiFile as _getUiFile
-import imautils.gui.mplwidget as _mplwidget 
+from undulator.gui.utils import loadUi as _loadUi
+from undulator.data import binarylog as _binarylog
+from undulator.data import textlog as _textlog
+from undulator.data import motionanalysis as _motionanalysis
+from undulator.data.decimation import minmax_decimate as _minmax_decimate
+from undulator.data.logindex import (
+    LogIndex as _LogIndex,
+    LogCache as _LogCache,
+    )
 
 
 class AnalysisWidget(_QWidget):
@@ -23,16 +35,33 @@ class AnalysisWidget(_QWidget):
         super().__init__(parent)
 
         #setup the ui
-        uifile = _getUiFile(self)
-        self.ui = _uic.loadUi(uifile, self)
+        self.ui = _loadUi(self)
 
         self.flag_updating_list = False
         self.flag_updating_data = False
+        self.flag_decimating = False
+
+        self.ax_y2 = None
+        self.lines_y1 = {}
+        self.lines_y2 = {}
+
+        self.log_dir = _os.getcwd()
+        self.log_index = _LogIndex(self.log_dir)
+        self.log_cache = _LogCache()
+
+        # step response results by log key and tolerance
+        self.motion_results = {}
+        self.motion_result = None
+        self.log_key = None
+        self.log_events = None
+        self.test_positions = []
 
-        self.list_test_files()
+        # the test files are listed when the widget is first shown
+        self.files_listed = False
         self.connect_signals_slots()
 
         self.add_plot_widgets()
+        self.add_motion_widgets()
 
     def connect_signals_slots(self):
         """Connects Qt signals and slots."""
@@ -41,21 +70,51 @@ class AnalysisWidget(_QWidget):
         self.ui.cmb_plot.currentIndexChanged.connect(self.plot)
         self.ui.cmb_plot_2.currentIndexChanged.connect(self.plot)
         self.ui.cmb_axis.currentIndexChanged.connect(self.print_parameters)
+        self.ui.cmb_axis.currentIndexChanged.connect(self.show_motion_table)
 
     def add_plot_widgets(self):
         """Adds plot widget to the analysis widget."""
+        import imautils.gui.mplwidget as _mplwidget
         self.ui.plot = _mplwidget.MplWidget()
         self.ui.vbl_plot.addWidget(self.ui.plot)
+        self.ui.plot.canvas.ax.callbacks.connect(
+            'xlim_changed', self.update_decimation)
+
+    def add_motion_widgets(self):
+        """Adds the step response table of discrete tests."""
+        self.ui.gb_motion = _QGroupBox('Step response')
+        _layout = _QGridLayout(self.ui.gb_motion)
+        _layout.addWidget(_QLabel('Settling tolerance [mm]:'), 0, 0)
+        self.ui.sbd_tolerance = _QDoubleSpinBox()
+        self.ui.sbd_tolerance.setDecimals(4)
+        self.ui.sbd_tolerance.setRange(0.0001, 1)
+        self.ui.sbd_tolerance.setSingleStep(0.0005)
+        self.ui.sbd_tolerance.setValue(0.001)
+        self.ui.sbd_tolerance.setKeyboardTracking(False)
+        _layout.addWidget(self.ui.sbd_tolerance, 0, 1)
+        _layout.setColumnStretch(2, 1)
+        _labels = ['Step', 'Target [mm]', 'Step [mm]'] + [
+            _label for _, _label in _motionanalysis.METRICS]
+        self.ui.tbw_motion = _QTableWidget(0, len(_labels))
+        self.ui.tbw_motion.setHorizontalHeaderLabels(_labels)
+        self.ui.tbw_motion.verticalHeader().setVisible(False)
+        self.ui.tbw_motion.setEditTriggers(_QTableWidget.NoEditTriggers)
+        self.ui.tbw_motion.setMaximumHeight(160)
+        _layout.addWidget(self.ui.tbw_motion, 1, 0, 1, 3)
+        self.ui.gridLayout_3.addWidget(self.ui.gb_motion, 4, 0, 1, 2)
+        self.ui.sbd_tolerance.valueChanged.connect(self.analyze_motion)
+
+    def showEvent(self, event):
+        """Lists the test files when the widget is first shown."""
+        if not self.files_listed:
+            self.files_listed = True
+            self.list_test_files()
+        super().showEvent(event)
 
     def list_test_files(self):
         """List test files and insert in the combobox."""
-        _file_list = _os.listdir()
-        _test_list = []
-        for _file in _file_list:
-            if '.dat' in _file:
-                _test_list.append(_file.split('.')[0])
-
-        _test_list.sort()
+        self.log_index.update()
+        _test_list = self.log_index.test_names()
         self.flag_updating_list = True
         while self.ui.cmb_file.count() > 0:
             self.ui.cmb_file.removeItem(0)
@@ -64,29 +123,48 @@ class AnalysisWidget(_QWidget):
         self.flag_updating_list = False
 
     def load(self):
-        """Loads configuration set."""
+        """Loads a test log. Binary logs are memory mapped and preferred
+        over text logs with the same name."""
         try:
             if not self.flag_updating_list:
-                _filename = self.ui.cmb_file.currentText() + '.dat'
-                if _filename != '.dat':
-                    with open(_filename, 'r') as _f:
-                        _comments = _f.readline().split('Comments: ')[1][:-1]
-                        _points = _f.readline().split(
-                            'Test positions [mm]: ')[1][:-1]
-                    self.df = _pd.read_csv(_filename, sep='\t',
-                                           skiprows=2, header=0)
+                _name = self.ui.cmb_file.currentText()
+                if _name == '':
+                    return
+                _entry = self.log_index.get(_name)
+                if _entry is None:
+                    self.log_index.update()
+                    _entry = self.log_index.get(_name)
+                _key = self.log_cache.key(_entry)
+                _data = self.log_cache.get(_key)
+                if _data is None:
+                    _data = self.read_log(_entry['path'])
+                    self.log_cache.put(_key, _data)
+                self.df = _data
+                _comments = _entry['comments']
+                _points = _entry['test_positions']
                 self.ui.le_comments.setText(_comments)
                 self.ui.le_points.setText(_points)
+                self.log_key = _key
+                self.log_events = _motionanalysis.get_events_name(
+                    _entry['path'])
+                self.test_positions = self.parse_positions(_points)
                 self.list_data()
                 self.print_parameters()
+                self.analyze_motion()
         except Exception:
             _traceback.print_exc(file=_sys.stdout)
             _msg = 'Could not open the file.'
             _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
 
+    def read_log(self, filename):
+        """Reads a text log, or opens a binary log memory mapped."""
+        if filename.endswith(_binarylog.EXTENSION):
+            return _binarylog.BinaryLog(filename)
+        return _textlog.read_log(filename)
+
     def list_data(self):
         """Lists data and inserts into plot combobox."""
-        self.column_names = self.df.columns.values[1:].tolist()
+        self.column_names = list(self.df.columns)[1:]
         _column_names_ax1 = self.column_names.copy()
         for _item in ['ActualPos [mm]', 'PosError [mm]',
                       'Current [A]', 'Torque [%]']:
@@ -104,60 +182,174 @@ class AnalysisWidget(_QWidget):
         self.ui.cmb_plot_2.setCurrentIndex(0)
 
     def plot(self):
-        """Plots test data."""
+        """Plots test data.
+
+        The lines are reused between plots and only a min/max decimated
+        version of the visible range is drawn, so the redraw time depends
+        on the plot width and not on the log length."""
         try:
             if not self.flag_updating_data:
                 _canvas = self.ui.plot.canvas
+                _ax_y1 = _canvas.ax
                 _data = self.ui.cmb_plot.currentText()
                 _data_2 = self.ui.cmb_plot_2.currentText()
-                _ax = _canvas.ax.get_shared_x_axes().get_siblings(_canvas.ax)
-                if len(_ax) == 2:
-                    _ax_y1 = _ax[1]
-                    _ax_y2 = _ax[0]
-                elif len(_ax) == 1:
-                    _ax_y1 = _ax[0]
-                    if _data_2 is not '':
-                        _ax_y2 = self.ui.plot.canvas.ax.twinx()
-                _ax_y1.clear()
+                _relayout = _ax_y1.get_ylabel() != _data
+
                 if _data in ['ActualPos [mm]', 'PosError [mm]',
                              'Current [A]', 'Torque [%]']:
                     _data_split = _data.split(' ')
-                    for _motor in ['A', 'B', 'C', 'D']:
-                        _datam = _data_split[0] + _motor + ' ' + _data_split[1]
-                        _ax_y1.plot(self.df['t [s]'], self.df[_datam],
-                                    label=_datam, alpha=0.8)
+                    _names = [_data_split[0] + _motor + ' ' + _data_split[1]
+                              for _motor in ['A', 'B', 'C', 'D']]
                 else:
-                    _ax_y1.plot(self.df['t [s]'], self.df[_data],
-                                label=_data, alpha=0.8)
+                    _names = [_data]
+                self.set_lines(_ax_y1, self.lines_y1, _names)
                 _ax_y1.set_ylabel(_data)
                 _ax_y1.legend()
-                if _data_2 is not '':
-                    _ax_y2.clear()
-                    _ax_y2.plot(self.df['t [s]'], self.df[_data_2],
-                                'r-', label=_data_2, alpha=0.8)
-                    _ax_y2.set_ylabel(_data_2)
-                    _ax_y2.legend()
-                else:
-                    if len(_ax) == 2:
-                        _ax_y2.remove()
+
+                if _data_2 != '':
+                    if self.ax_y2 is None:
+                        self.ax_y2 = _ax_y1.twinx()
+                    _relayout = any([_relayout,
+                                     not self.ax_y2.get_visible(),
+                                     self.ax_y2.get_ylabel() != _data_2])
+                    self.ax_y2.set_visible(True)
+                    self.set_lines(self.ax_y2, self.lines_y2, [_data_2],
+                                   fmt='r-')
+                    self.ax_y2.set_ylabel(_data_2)
+                    self.ax_y2.legend()
+                elif self.ax_y2 is not None:
+                    _relayout = _relayout or self.ax_y2.get_visible()
+                    self.set_lines(self.ax_y2, self.lines_y2, [])
+                    self.ax_y2.set_visible(False)
+
+                _t = _np.asarray(self.df['t [s]'])
+                if len(_t) > 0:
+                    self.flag_decimating = True
+                    _ax_y1.set_xlim(_t[0], _t[-1])
+                    self.flag_decimating = False
+                self.update_decimation()
+                for _ax in [_ax_y1, self.ax_y2]:
+                    if _ax is not None and _ax.get_visible():
+                        _ax.relim()
+                        _ax.autoscale_view(scalex=False)
+
                 _canvas.ax.set_xlabel('t [s]')
                 _canvas.ax.grid(1)
-                _canvas.fig.tight_layout()
-                _canvas.draw()
+                if _relayout:
+                    _canvas.fig.tight_layout()
+                _canvas.draw_idle()
         except Exception:
+            self.flag_decimating = False
             _traceback.print_exc(file=_sys.stdout)
             _msg = ('Could not plot the data.\nPlease check if this is the'
                     'right file.')
             _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
 
+    def set_lines(self, ax, lines, names, fmt='-'):
+        """Keeps one line per plotted column, reusing the existing ones.
+
+        Args:
+            ax (matplotlib.axes.Axes): axes of the lines.
+            lines (dict): column name -> Line2D, updated in place.
+            names (list): columns to plot.
+            fmt (str): format of new lines."""
+        for _name in list(lines.keys()):
+            if _name not in names:
+                lines.pop(_name).remove()
+        for _name in names:
+            if _name not in lines:
+                lines[_name], = ax.plot([], [], fmt, label=_name, alpha=0.8)
+
+    def update_decimation(self, ax=None):
+        """Updates the lines data with the decimated visible range.
+
+        Args:
+            ax (matplotlib.axes.Axes): axes which limits changed (unused,
+                given by the xlim_changed callback)."""
+        if self.flag_decimating or not hasattr(self, 'df'):
+            return
+        _ax = self.ui.plot.canvas.ax
+        _x_min, _x_max = _ax.get_xlim()
+        _nbins = max(int(_ax.bbox.width), 100)
+        _t = self.df['t [s]']
+        for _lines in [self.lines_y1, self.lines_y2]:
+            for _name, _line in _lines.items():
+                _line.set_data(*_minmax_decimate(
+                    _t, self.df[_name], _x_min, _x_max, _nbins))
+        if ax is not None:
+            self.ui.plot.canvas.draw_idle()
+
     def print_parameters(self):
         """Shows some axis parameters on the UI."""
         _i = 4 * self.ui.cmb_axis.currentIndex()
         _col = self.column_names[_i + 1]
-        self.ui.le_max_poserr.setText('{0:.6f}'.format(self.df[_col].max()))
-        self.ui.le_min_poserr.setText('{0:.6f}'.format(self.df[_col].min()))
+        self.ui.le_max_poserr.setText('{0:.6f}'.format(
+            _np.nanmax(self.df[_col])))
+        self.ui.le_min_poserr.setText('{0:.6f}'.format(
+            _np.nanmin(self.df[_col])))
         _col = self.column_names[_i + 2]
-        self.ui.le_max_current.setText('{0:.2f}'.format(self.df[_col].max()))
+        self.ui.le_max_current.setText('{0:.2f}'.format(
+            _np.nanmax(self.df[_col])))
         _col = self.column_names[_i + 3]
         self.ui.le_max_torque.setText('{0:.5f}'.format(
-            self.df[_col].abs().max()))
+            _np.nanmax(_np.abs(self.df[_col]))))
+
+    @staticmethod
+    def parse_positions(text):
+        """Returns the test positions of a log header as a list."""
+        _positions = []
+        for _value in text.replace(';', ',').split(','):
+            try:
+                _positions.append(float(_value))
+            except ValueError:
+                pass
+        return _positions
+
+    def analyze_motion(self):
+        """Computes (or gets from the cache) the step response of each
+        commanded position of the loaded test and shows it."""
+        try:
+            if not hasattr(self, 'df'):
+                return
+            _tolerance = self.ui.sbd_tolerance.value()
+            _key = None
+            if self.log_key is not None:
+                _key = (self.log_key, _tolerance)
+            _result = self.motion_results.get(_key)
+            if _result is None:
+                _events = None
+                if self.log_events is not None and _os.path.isfile(
+                        self.log_events):
+                    _events = _motionanalysis.read_events(self.log_events)
+                _result = _motionanalysis.analyze_log(
+                    self.df, events=_events, targets=self.test_positions,
+                    tolerance=_tolerance)
+                if _key is not None:
+                    self.motion_results[_key] = _result
+            self.motion_result = _result
+            self.show_motion_table()
+        except Exception:
+            self.motion_result = None
+            self.ui.tbw_motion.setRowCount(0)
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not analyze the test steps.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def show_motion_table(self):
+        """Shows the step response of the selected axis in the table."""
+        if self.motion_result is None:
+            self.ui.tbw_motion.setRowCount(0)
+            return
+        _axis = _motionanalysis.AXIS_NAMES[self.ui.cmb_axis.currentIndex()]
+        _rows = _motionanalysis.get_rows(self.motion_result, _axis)
+        self.ui.tbw_motion.setRowCount(len(_rows))
+        for _i, _row in enumerate(_rows):
+            for _j, _value in enumerate(_row):
+                if _j == 0:
+                    _text = '{0:d}'.format(_value)
+                elif _np.isnan(_value):
+                    _text = ''
+                else:
+                    _text = '{0:.6g}'.format(_value)
+                self.ui.tbw_motion.setItem(_i, _j, _QTableWidgetItem(_text))
+        self.ui.tbw_motion.resizeColumnsToContents()
@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 
 import sys as _sys
-import qtpy.uic as _uic
 import traceback as _traceback
 
+from qtpy.QtCore import (
+    QTimer as _QTimer,
+    )
 from qtpy.QtWidgets import (
     QWidget as _QWidget,
     QMessageBox as _QMessageBox,
     )
 
-from epics import PV as _PV
-from undulator.gui.utils import getUiFile as _getUiFile
+from undulator.devices import undulator as _undulator
+from undulator.devices.transaction import PutTransaction as _PutTransaction
+from undulator.gui.utils import loadUi as _loadUi
 
 
 class ControlWidget(_QWidget):
@@ -21,16 +24,15 @@ class ControlWidget(_QWidget):
         super().__init__(parent)
 
         # setup the ui
-        uifile = _getUiFile(self)
-        self.ui = _uic.loadUi(uifile, self)
+        self.ui = _loadUi(self)
 
         self.updating_couple_flag = False
-        self.coupling_master = _PV('und:CouplingMaster')
-        self.coupling_slaves = _PV('und:CouplingSlaves')
-        self.en_coupling = _PV('und:EnGeneralCoupling')
-        self.coupling_direction = {'slv1': _PV('und:CouplingDirection[0]'),
-                                   'slv2': _PV('und:CouplingDirection[1]'),
-                                   'slv3': _PV('und:CouplingDirection[2]')}
+        self.coupling_master = _undulator.coupling_master
+        self.coupling_slaves = _undulator.coupling_slaves
+        self.en_coupling = _undulator.en_coupling
+        self.coupling_direction = _undulator.coupling_direction
+        self.transaction = None
+        self.transaction_timer = _QTimer()
 
         # connect signals and slots
         self.connect_signals_slots()
@@ -46,6 +48,7 @@ class ControlWidget(_QWidget):
         self.ui.cmb_slave_3.currentIndexChanged.connect(
             self.update_coupling_cmbs)
         self.ui.pbt_couple.clicked.connect(self.couple_axes)
+        self.transaction_timer.timeout.connect(self.check_transaction)
 
     def update_coupling_cmbs(self):
         if not self.updating_couple_flag:
@@ -103,19 +106,50 @@ class ControlWidget(_QWidget):
                 _coupling_direction_2 = 0
             else:
                 _coupling_direction_2 = 1
-            if not _dir_slave_1:
+            if not _dir_slave_3:
                 _coupling_direction_3 = 0
             else:
                 _coupling_direction_3 = 1
 
-            self.coupling_master.put(_coupling_master)
-            self.coupling_slaves.put(_coupling_slaves)
-            self.coupling_direction['slv1'].put(_coupling_direction_1)
-            self.coupling_direction['slv2'].put(_coupling_direction_2)
-            self.coupling_direction['slv3'].put(_coupling_direction_3)
-            self.en_coupling.put(1)
+            # the coupling is only enabled after its parameters were
+            # written and read back
+            _transaction = _PutTransaction(name='Coupling')
+            _transaction.add(self.coupling_master, _coupling_master)
+            _transaction.add(self.coupling_slaves, _coupling_slaves)
+            _transaction.add(self.coupling_direction['slv1'],
+                             _coupling_direction_1)
+            _transaction.add(self.coupling_direction['slv2'],
+                             _coupling_direction_2)
+            _transaction.add(self.coupling_direction['slv3'],
+                             _coupling_direction_3)
+            _transaction.add(self.en_coupling, 1, verify=False, stage=1)
+            self.run_transaction(_transaction)
 
         except Exception:
             _traceback.print_exc(file=_sys.stdout)
             _msg = 'Failure during coupling axis.'
             _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
+
+    def run_transaction(self, transaction):
+        """Runs a put transaction in a background thread; the control
+        buttons are disabled until it finishes."""
+        if self.transaction is not None and not self.transaction.is_done():
+            _msg = 'Please wait for the previous command to finish.'
+            _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
+            return
+        self.ui.pbt_couple.setEnabled(False)
+        self.transaction = transaction
+        self.transaction.start()
+        self.transaction_timer.start(50)
+
+    def check_transaction(self):
+        """Reports the fields not applied when the transaction finishes."""
+        _transaction = self.transaction
+        if _transaction is not None and not _transaction.is_done():
+            return
+        self.transaction_timer.stop()
+        self.ui.pbt_couple.setEnabled(True)
+        if _transaction is not None and not _transaction.ok:
+            _msg = '{0:s} failed:\n{1:s}'.format(
+                _transaction.name, _transaction.report())
+            _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""History plot of the local archive.
+
+Each channel is drawn as its mean with a shaded band between its minimum
+and maximum. When the time range changes (span selection, zoom or pan) the
+archive is read again at the level matching the range and the plot width.
+"""
+
+import sys as _sys
+import time as _time
+import traceback as _traceback
+import numpy as _np
+import pyqtgraph as _pg
+
+from qtpy.QtCore import (
+    QTimer as _QTimer,
+    )
+from qtpy.QtGui import (
+    QColor as _QColor,
+    )
+
+from undulator.data import archive as _archive
+
+
+class HistoryPlot(_pg.PlotWidget):
+    """Plot of archived channels with a date axis."""
+
+    def __init__(self, archive, parent=None):
+        """Initializes the plot.
+
+        Args:
+            archive (Archive): local archive.
+            parent (QWidget): parent widget."""
+        super().__init__(
+            parent, axisItems={'bottom': _pg.DateAxisItem('bottom')})
+        self.archive = archive
+        self.channels = []
+        self.items = []
+        self.curves = []
+        self.level = None
+        self.read_time = 0
+
+        self.showGrid(x=True, y=True)
+        self.legend = self.addLegend()
+        self.getPlotItem().setMouseEnabled(x=True, y=False)
+
+        # range changes are coalesced in one read
+        self.refresh_timer = _QTimer()
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(200)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.getPlotItem().sigXRangeChanged.connect(self.refresh_timer.start)
+
+    def set_channels(self, channels, names, colors):
+        """Selects the plotted channels.
+
+        Args:
+            channels (list): archived channel names.
+            names (list): legend names.
+            colors (list): curve colors."""
+        for _item in self.items:
+            self.removeItem(_item)
+        self.legend.clear()
+        self.items = []
+        self.curves = []
+        for _name, _color in zip(names, colors):
+            _band = _QColor(_color)
+            _band.setAlpha(60)
+            _min = _pg.PlotDataItem(pen=None)
+            _max = _pg.PlotDataItem(pen=None)
+            _fill = _pg.FillBetweenItem(_min.curve, _max.curve, brush=_band)
+            _mean = _pg.PlotDataItem(pen=_pg.mkPen(_color, width=1),
+                                     name=_name)
+            for _item in (_min, _max, _fill, _mean):
+                self.addItem(_item)
+            self.items += [_min, _max, _fill, _mean]
+            self.curves.append((_min, _mean, _max))
+        self.channels = list(channels)
+        self.refresh()
+
+    def set_span(self, span):
+        """Shows the last span seconds."""
+        _now = _time.time()
+        self.setXRange(_now - span, _now, padding=0)
+        self.refresh()
+
+    def refresh(self):
+        """Reads the archive over the visible time range."""
+        self.refresh_timer.stop()
+        if len(self.channels) == 0:
+            return
+        try:
+            _t0 = _time.perf_counter()
+            _t_min, _t_max = self.getPlotItem().viewRange()[0]
+            _times, _vmin, _vmean, _vmax, self.level = self.archive.read(
+                self.channels, _t_min, _t_max,
+                npoints=max(self.width(), 100))
+            # the rows start their periods
+            _x = _times + dict(_archive.LEVELS)[self.level]/2
+            for _j, _curves in enumerate(self.curves):
+                for _curve, _y in zip(_curves, (_vmin, _vmean, _vmax)):
+                    _curve.setData(_x, _np.asarray(_y[:, _j], dtype=float),
+                                   connect='finite')
+            self.read_time = _time.perf_counter() - _t0
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
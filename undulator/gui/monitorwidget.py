@@ -3,9 +3,8 @@
 from qtpy.QtWidgets import (
     QWidget as _QWidget,
     )
-import qtpy.uic as _uic
 
-from undulator.gui.utils import getUiFile as _getUiFile
+from undulator.gui.utils import loadUi as _loadUi
 
 
 class MonitorWidget(_QWidget):
@@ -16,5 +15,4 @@ class MonitorWidget(_QWidget):
         super().__init__(parent)
 
         # setup the ui
-        uifile = _getUiFile(self)
-        self.ui = _uic.loadUi(uifile, self)
+        self.ui = _loadUi(self)
@@ -1,20 +1,342 @@
 # -*- coding: utf-8 -*-
 
+import sys as _sys
+import time as _time
+import threading as _threading
+import traceback as _traceback
+
+from qtpy.QtCore import (
+    QTimer as _QTimer,
+    )
 from qtpy.QtWidgets import (
     QWidget as _QWidget,
+    QGroupBox as _QGroupBox,
+    QGridLayout as _QGridLayout,
+    QLabel as _QLabel,
+    QComboBox as _QComboBox,
+    QLineEdit as _QLineEdit,
+    QPushButton as _QPushButton,
+    QTableWidget as _QTableWidget,
+    QTableWidgetItem as _QTableWidgetItem,
+    QMessageBox as _QMessageBox,
     )
-import qtpy.uic as _uic
 
-from undulator.gui.utils import getUiFile as _getUiFile
+from undulator.data import configuration as _configuration
+from undulator.gui.utils import loadUi as _loadUi
+
+
+class ThdSnapshot(_threading.Thread):
+    """Runs a snapshot operation (CA reads and writes) without blocking the
+    graphical interface."""
+
+    def __init__(self, description, target, *args):
+        """Initializes the thread.
+
+        Args:
+            description (str): operation description, e.g. 'save'.
+            target (function): operation, its return value is kept in
+                result.
+            args: target arguments."""
+        super().__init__(name='ThdSnapshot', daemon=True)
+        self.description = description
+        self.target = target
+        self.args = args
+        self.result = None
+        self.error = None
+
+    def run(self):
+        """Runs the operation, keeping its result or its exception."""
+        try:
+            self.result = self.target(*self.args)
+        except Exception as _e:
+            _traceback.print_exc(file=_sys.stdout)
+            self.error = _e
 
 
 class ParametersWidget(_QWidget):
-    """Control widget class for the Delta Undulator Control GUI."""
+    """Parameters widget class for the Delta Undulator Control GUI."""
 
     def __init__(self, parent=None):
         """Set up the ui."""
         super().__init__(parent)
 
         # setup the ui
-        uifile = _getUiFile(self)
-        self.ui = _uic.loadUi(uifile, self)
+        self.ui = _loadUi(self)
+
+        self.store = _configuration.ConfigurationStore()
+        self.thd_snapshot = None
+        self.snapshot_finish = None
+        self.snapshot_timer = _QTimer()
+        self.snapshot_timer.timeout.connect(self.check_snapshot)
+        self.add_snapshot_widgets()
+        self.list_snapshots()
+
+    def add_snapshot_widgets(self):
+        """Adds the configuration snapshot controls."""
+        self.ui.gb_snapshots = _QGroupBox('Configuration snapshots')
+        _layout = _QGridLayout(self.ui.gb_snapshots)
+        _layout.addWidget(_QLabel('Snapshot:'), 0, 0)
+        self.ui.cmb_snapshot = _QComboBox()
+        self.ui.cmb_snapshot.setMinimumWidth(160)
+        _layout.addWidget(self.ui.cmb_snapshot, 0, 1)
+        self.ui.pbt_compare = _QPushButton('Compare')
+        self.ui.pbt_compare.setToolTip(
+            'Compares the snapshot with the live setpoints')
+        _layout.addWidget(self.ui.pbt_compare, 0, 2)
+        self.ui.pbt_restore = _QPushButton('Restore')
+        self.ui.pbt_restore.setToolTip(
+            'Writes the setpoints that differ from the snapshot')
+        _layout.addWidget(self.ui.pbt_restore, 0, 3)
+        self.ui.pbt_delete_snapshot = _QPushButton('Delete')
+        _layout.addWidget(self.ui.pbt_delete_snapshot, 0, 4)
+        _layout.addWidget(_QLabel('New snapshot:'), 1, 0)
+        self.ui.le_snapshot_name = _QLineEdit()
+        self.ui.le_snapshot_name.setPlaceholderText('name')
+        _layout.addWidget(self.ui.le_snapshot_name, 1, 1)
+        self.ui.le_snapshot_comments = _QLineEdit()
+        self.ui.le_snapshot_comments.setPlaceholderText('comments')
+        _layout.addWidget(self.ui.le_snapshot_comments, 1, 2, 1, 2)
+        self.ui.pbt_save_snapshot = _QPushButton('Save')
+        self.ui.pbt_save_snapshot.setToolTip(
+            'Saves the live setpoints as a snapshot')
+        _layout.addWidget(self.ui.pbt_save_snapshot, 1, 4)
+        self.ui.tbw_snapshot_diff = _QTableWidget(0, 3)
+        self.ui.tbw_snapshot_diff.setHorizontalHeaderLabels(
+            ['Setpoint', 'Snapshot', 'Live'])
+        self.ui.tbw_snapshot_diff.verticalHeader().setVisible(False)
+        self.ui.tbw_snapshot_diff.setEditTriggers(
+            _QTableWidget.NoEditTriggers)
+        self.ui.tbw_snapshot_diff.horizontalHeader().setStretchLastSection(
+            True)
+        self.ui.tbw_snapshot_diff.setMaximumHeight(160)
+        _layout.addWidget(self.ui.tbw_snapshot_diff, 2, 0, 1, 5)
+        self.ui.la_snapshot_status = _QLabel()
+        _layout.addWidget(self.ui.la_snapshot_status, 3, 0, 1, 5)
+        _layout.setColumnStretch(1, 1)
+        self.ui.gridLayout_7.addWidget(self.ui.gb_snapshots, 2, 0, 1, 2)
+
+        self.ui.pbt_compare.clicked.connect(self.compare_snapshot)
+        self.ui.pbt_restore.clicked.connect(self.restore_snapshot)
+        self.ui.pbt_delete_snapshot.clicked.connect(self.delete_snapshot)
+        self.ui.pbt_save_snapshot.clicked.connect(self.save_snapshot)
+        self.ui.cmb_snapshot.currentIndexChanged.connect(
+            self.clear_snapshot_diff)
+
+    def list_snapshots(self, current=None):
+        """Lists the saved snapshots, the most recent first."""
+        try:
+            self.ui.cmb_snapshot.clear()
+            self.ui.cmb_snapshot.addItems(self.store.names())
+            if current is not None:
+                self.ui.cmb_snapshot.setCurrentText(current)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def load_snapshot(self):
+        """Returns the selected snapshot, or None."""
+        _name = self.ui.cmb_snapshot.currentText()
+        if _name == '':
+            return None
+        return self.store.load(_name)
+
+    def clear_snapshot_diff(self):
+        """Clears the comparison table."""
+        self.ui.tbw_snapshot_diff.setRowCount(0)
+        self.ui.la_snapshot_status.setText('')
+
+    def show_snapshot_diff(self, differences):
+        """Shows the (name, snapshot value, live value) differences."""
+        self.ui.tbw_snapshot_diff.setRowCount(len(differences))
+        for _row, _values in enumerate(differences):
+            for _col, _value in enumerate(_values):
+                if _value is None:
+                    _text = 'not read'
+                elif isinstance(_value, str):
+                    _text = _value.split(':', 1)[-1]
+                else:
+                    _text = '{0:g}'.format(_value)
+                self.ui.tbw_snapshot_diff.setItem(
+                    _row, _col, _QTableWidgetItem(_text))
+        self.ui.tbw_snapshot_diff.resizeColumnsToContents()
+
+    def run_snapshot(self, thd, finish):
+        """Runs a snapshot thread; the snapshot buttons are disabled until
+        it finishes.
+
+        Args:
+            thd (ThdSnapshot): snapshot operation thread.
+            finish (function): called with the thread result when the
+                operation succeeds."""
+        if self.thd_snapshot is not None and self.thd_snapshot.is_alive():
+            _msg = 'Please wait for the previous operation to finish.'
+            _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
+            return
+        self.enable_snapshot_buttons(False)
+        self.ui.la_snapshot_status.setText(
+            'Snapshot {0:s} running...'.format(thd.description))
+        self.thd_snapshot = thd
+        self.snapshot_finish = finish
+        self.thd_snapshot.start()
+        self.snapshot_timer.start(50)
+
+    def check_snapshot(self):
+        """Shows the result of the snapshot operation when it finishes."""
+        _thd = self.thd_snapshot
+        if _thd is not None and _thd.is_alive():
+            return
+        self.snapshot_timer.stop()
+        self.enable_snapshot_buttons(True)
+        if _thd is None:
+            return
+        self.thd_snapshot = None
+        self.ui.la_snapshot_status.setText('')
+        if _thd.error is not None:
+            _msg = 'Could not {0:s} the snapshot.\n{1:s}'.format(
+                _thd.description, str(_thd.error))
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+            return
+        try:
+            self.snapshot_finish(_thd.result)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def enable_snapshot_buttons(self, enable):
+        """Enables or disables the snapshot buttons."""
+        for _button in (self.ui.pbt_compare, self.ui.pbt_restore,
+                        self.ui.pbt_delete_snapshot,
+                        self.ui.pbt_save_snapshot):
+            _button.setEnabled(enable)
+
+    def save_snapshot(self):
+        """Reads the live setpoints and saves them as a snapshot."""
+        try:
+            _name = self.ui.le_snapshot_name.text().strip()
+            if _name == '':
+                _name = _time.strftime('%Y_%m_%d_%H_%M_%S')
+            if _name in self.store.names():
+                _msg = 'Replace the snapshot {0:s}?'.format(_name)
+                _reply = _QMessageBox.question(
+                    self, 'Save snapshot', _msg,
+                    _QMessageBox.Yes | _QMessageBox.No, _QMessageBox.No)
+                if _reply != _QMessageBox.Yes:
+                    return
+            _thd = ThdSnapshot('save', self.take_snapshot, _name,
+                               self.ui.le_snapshot_comments.text())
+            self.run_snapshot(_thd, self.show_saved_snapshot)
+        except Exception as _e:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not save the snapshot.\n' + str(_e)
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def take_snapshot(self, name, comments):
+        """Reads the live setpoints and saves them (in the snapshot thread).
+
+        Returns:
+            a tuple (snapshot, elapsed time)."""
+        _t = _time.perf_counter()
+        _snapshot = _configuration.Snapshot.take(name, comments)
+        self.store.save(_snapshot)
+        return _snapshot, _time.perf_counter() - _t
+
+    def show_saved_snapshot(self, result):
+        """Lists the saved snapshot."""
+        _snapshot, _elapsed = result
+        self.ui.le_snapshot_name.clear()
+        self.list_snapshots(_snapshot.name)
+        self.ui.la_snapshot_status.setText(
+            '{0:d} setpoints saved in {1:.0f} ms'.format(
+                len(_snapshot.values), 1e3*_elapsed))
+
+    def compare_snapshot(self):
+        """Shows the setpoints that differ from the selected snapshot."""
+        try:
+            _snapshot = self.load_snapshot()
+            if _snapshot is None:
+                return
+            _thd = ThdSnapshot('compare', _snapshot.compare)
+            self.run_snapshot(
+                _thd, lambda _differences: self.show_comparison(
+                    _snapshot, _differences))
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not compare the snapshot.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def show_comparison(self, snapshot, differences):
+        """Shows the differences between a snapshot and the live values."""
+        self.show_snapshot_diff(differences)
+        self.ui.la_snapshot_status.setText(
+            '{0:d} of {1:d} setpoints differ from {2:s}'.format(
+                len(differences), len(snapshot.values), snapshot.name))
+
+    def restore_snapshot(self):
+        """Writes the setpoints that differ from the selected snapshot,
+        after comparing them with the live values."""
+        try:
+            _snapshot = self.load_snapshot()
+            if _snapshot is None:
+                return
+            _thd = ThdSnapshot('compare', _snapshot.compare)
+            self.run_snapshot(
+                _thd, lambda _differences: self.confirm_restore(
+                    _snapshot, _differences))
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not restore the snapshot.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def confirm_restore(self, snapshot, differences):
+        """Shows the differences and writes them if confirmed."""
+        self.show_snapshot_diff(differences)
+        if len(differences) == 0:
+            self.ui.la_snapshot_status.setText(
+                'The setpoints are equal to ' + snapshot.name)
+            return
+        _msg = 'Write {0:d} setpoints of {1:s}?'.format(
+            len(differences), snapshot.name)
+        _reply = _QMessageBox.question(
+            self, 'Restore snapshot', _msg,
+            _QMessageBox.Yes | _QMessageBox.No, _QMessageBox.No)
+        if _reply != _QMessageBox.Yes:
+            return
+        _thd = ThdSnapshot('restore', self.write_snapshot, snapshot)
+        self.run_snapshot(_thd, self.show_restored_snapshot)
+
+    def write_snapshot(self, snapshot):
+        """Restores a snapshot and compares it again (in the snapshot
+        thread).
+
+        Returns:
+            a tuple (restore result, differences after the restore)."""
+        return snapshot.restore(), snapshot.compare()
+
+    def show_restored_snapshot(self, result):
+        """Shows the restore result and the remaining differences."""
+        _result, _differences = result
+        self.show_snapshot_diff(_differences)
+        self.ui.la_snapshot_status.setText(
+            '{0:d} setpoints written, {1:d} failed in {2:.0f} ms'.format(
+                len(_result['changed']) - len(_result['failed']),
+                len(_result['failed']), 1e3*_result['elapsed']))
+        if len(_result['failed']) > 0:
+            _msg = 'Could not restore: ' + ', '.join(_result['failed'])
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def delete_snapshot(self):
+        """Removes the selected snapshot."""
+        try:
+            _name = self.ui.cmb_snapshot.currentText()
+            if _name == '':
+                return
+            _msg = 'Delete the snapshot {0:s}?'.format(_name)
+            _reply = _QMessageBox.question(
+                self, 'Delete snapshot', _msg,
+                _QMessageBox.Yes | _QMessageBox.No, _QMessageBox.No)
+            if _reply != _QMessageBox.Yes:
+                return
+            self.store.remove(_name)
+            self.list_snapshots()
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not delete the snapshot.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""GUI startup timing.
+
+The phases of the startup (imports, application, window, first tab, first
+event loop) are timed and reported when the window is first shown. If the
+UNDULATOR_STARTUP_LOG environment variable is set, each report is also
+appended as a JSON line to that file, so the time to first window can be
+tracked on each machine.
+"""
+
+import os as _os
+import json as _json
+import time as _time
+import socket as _socket
+
+
+class StartupTimer(object):
+    """Records the duration of the startup phases."""
+
+    def __init__(self):
+        self.t_start = _time.perf_counter()
+        self.t_last = self.t_start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, name):
+        """Ends a phase started at the previous mark."""
+        _now = _time.perf_counter()
+        self.phases.append((name, _now - self.t_last))
+        self.t_last = _now
+
+    def record(self, name, duration):
+        """Records a phase timed elsewhere (e.g. a tab built on demand),
+        which does not change the time of the previous mark."""
+        self.phases.append((name, duration))
+
+    def total(self):
+        """Time (in seconds) from the timer creation to the last mark."""
+        return self.t_last - self.t_start
+
+    def report(self):
+        """Returns the report of the phases as a multiline string."""
+        _lines = ['Startup times:']
+        for _name, _duration in self.phases:
+            _lines.append('  {0:<24s} {1:8.1f} ms'.format(
+                _name, 1e3*_duration))
+        _lines.append('  {0:<24s} {1:8.1f} ms'.format(
+            'time to first window', 1e3*self.total()))
+        return '\n'.join(_lines)
+
+    def to_dict(self):
+        """Returns the phases as a dict."""
+        return {'time': _time.strftime('%Y-%m-%d %H:%M:%S',
+                                       _time.localtime()),
+                'host': _socket.gethostname(),
+                'total': self.total(),
+                'phases': [{'name': _name, 'duration': _duration}
+                           for _name, _duration in self.phases]}
+
+    def finish(self):
+        """Ends the startup: prints the report and appends it to the
+        UNDULATOR_STARTUP_LOG file, if set. Only the first call reports."""
+        if self.reported:
+            return
+        self.reported = True
+        self.mark('first event loop')
+        print(self.report())
+        _filename = _os.environ.get('UNDULATOR_STARTUP_LOG')
+        if _filename:
+            try:
+                with open(_filename, 'a') as _f:
+                    _f.write(_json.dumps(self.to_dict()) + '\n')
+            except OSError as _e:
+                print('Could not save the startup times: ' + str(_e))
+
+
+timer = StartupTimer()
@@ -1,11 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import os as _os
 import sys as _sys
 import numpy as _np
-import time as _time
-import qtpy.uic as _uic
-import serial as _serial
-import threading as _threading
 import traceback as _traceback
 
 from qtpy.QtCore import (
@@ -13,12 +10,27 @@ from qtpy.QtCore import (
     )
 from qtpy.QtWidgets import (
     QWidget as _QWidget,
+    QLabel as _QLabel,
+    QCheckBox as _QCheckBox,
+    QComboBox as _QComboBox,
+    QGroupBox as _QGroupBox,
+    QHBoxLayout as _QHBoxLayout,
+    QVBoxLayout as _QVBoxLayout,
     QMessageBox as _QMessageBox,
+    QDoubleSpinBox as _QDoubleSpinBox,
     )
 
-from epics import PV as _PV
-from undulator.devices import display as _display
-from undulator.gui.utils import getUiFile as _getUiFile
+from undulator import devices as _devices
+from undulator.devices.testengine import (
+    DISPLAY_SETTINGS as _DISPLAY_SETTINGS,
+    ThdReadDisplay,
+    ThdTestAxis,
+    )
+from undulator.devices.acqprocess import (
+    AcquisitionProcess as _AcquisitionProcess,
+    )
+from undulator.data.decimation import minmax_decimate as _minmax_decimate
+from undulator.gui.utils import loadUi as _loadUi
 
 
 class TestsWidget(_QWidget):
@@ -29,18 +41,71 @@ class TestsWidget(_QWidget):
         super().__init__(parent)
 
         # setup the ui
-        uifile = _getUiFile(self)
-        self.ui = _uic.loadUi(uifile, self)
+        self.ui = _loadUi(self)
 
-        self.display = _display
         self.display_timer = _QTimer()
 
         self.thd_read_display = None
         self.test_thd = None
+        self.acq_process = None
+        self.test_in_process = False
+        self.process_timer = _QTimer()
+
+        self.live_timer = _QTimer()
+        self.live_fps = 5
+        self.live_size = 65536
+        self.live_columns = []
+        self.live_lines = {}
+        self.live_count = -1
+
+        self.add_process_widgets()
+        self.add_plot_widgets()
 
         # connect signals and slots
         self.connect_signals_slots()
 
+    @property
+    def display(self):
+        """Heidenhain display, created on first use."""
+        return _devices.display
+
+    def add_process_widgets(self):
+        """Adds the option to run the tests in a separate process."""
+        self.ui.chb_process = _QCheckBox('Separate process')
+        self.ui.chb_process.setToolTip(
+            'Runs the test acquisition in a child process, which also reads '
+            'the display during the test.')
+        self.ui.horizontalLayout.addWidget(self.ui.chb_process)
+
+    def add_plot_widgets(self):
+        """Adds the live plot of the running test."""
+        _group = _QGroupBox('Live plot')
+        _layout = _QVBoxLayout(_group)
+        _controls = _QHBoxLayout()
+        self.ui.cmb_live = _QComboBox()
+        self.ui.cmb_live.setSizeAdjustPolicy(
+            _QComboBox.AdjustToContents)
+        self.ui.sbd_live_window = _QDoubleSpinBox()
+        self.ui.sbd_live_window.setRange(1, 3600)
+        self.ui.sbd_live_window.setValue(60)
+        self.ui.sbd_live_window.setSuffix(' s')
+        _controls.addWidget(_QLabel('Data:'))
+        _controls.addWidget(self.ui.cmb_live)
+        _controls.addStretch()
+        _controls.addWidget(_QLabel('Window:'))
+        _controls.addWidget(self.ui.sbd_live_window)
+        _layout.addLayout(_controls)
+        self.ui.vbl_live = _layout
+        # the canvas (and matplotlib) is only created for the first test
+        self.ui.live_plot = None
+        self.ui.gridLayout_6.addWidget(_group, 1, 0, 1, 2)
+
+    def add_live_canvas(self):
+        """Creates the live plot canvas."""
+        import imautils.gui.mplwidget as _mplwidget
+        self.ui.live_plot = _mplwidget.MplWidget()
+        self.ui.vbl_live.addWidget(self.ui.live_plot)
+
     def connect_signals_slots(self):
         """Connects Qt signals and slots."""
         self.ui.chb_display.stateChanged.connect(self.enable_display)
@@ -54,6 +119,10 @@ class TestsWidget(_QWidget):
         self.ui.pbt_stop_man.clicked.connect(self.stop_manual_test)
         self.ui.pbt_acquire.clicked.connect(self.acquire_manual)
         self.display_timer.timeout.connect(self.update_display)
+        self.process_timer.timeout.connect(self.poll_process)
+        self.live_timer.timeout.connect(self.update_live_plot)
+        self.ui.cmb_live.currentIndexChanged.connect(self.reset_live_plot)
+        self.ui.sbd_live_window.valueChanged.connect(self.reset_live_plot)
 
     def enable_display(self):
         """Enables/Disables Heidenhain display."""
@@ -64,8 +133,14 @@ class TestsWidget(_QWidget):
                 self.disconnect()
 
     def list_ports(self):
-        """Lists device serial ports on the ND-780 display combobox."""
-        _ports = self.display.list_ports()
+        """Lists device serial ports on the ND-780 display combobox. The
+        UNDULATOR_DISPLAY_PORT port (e.g. the pseudo-terminal of the
+        simulated display, not found by the serial port enumeration) is
+        listed first."""
+        _ports = list(self.display.list_ports())
+        _port = _os.environ.get('UNDULATOR_DISPLAY_PORT')
+        if _port:
+            _ports = [_port] + [_p for _p in _ports if _p != _port]
         while self.ui.cmb_port.count() > 0:
             self.ui.cmb_port.removeItem(0)
         self.ui.cmb_port.addItems(_ports)
@@ -75,10 +150,7 @@ class TestsWidget(_QWidget):
         _port = self.ui.cmb_port.currentText()
         _period = self.ui.spd_period.value()
         try:
-            _ans = self.display.connect(port=_port, baudrate=9600,
-                                        bytesize=_serial.SEVENBITS,
-                                        stopbits=_serial.STOPBITS_TWO,
-                                        parity=_serial.PARITY_EVEN)
+            _ans = self.display.connect(port=_port, **_DISPLAY_SETTINGS)
             if _ans is None:
                 _msg = 'Could not connect to the Heidenhain display.'
                 _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
@@ -147,30 +219,23 @@ class TestsWidget(_QWidget):
             _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
             return
 
-        if self.test_thd is not None:
-            if self.test_thd.is_alive():
-                _msg = 'Please wait until the current test finishes.'
-                _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
-                return
+        if self.test_running():
+            _msg = 'Please wait until the current test finishes.'
+            _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
+            return
 
-        self.test_thd = ThdTestAxis(test_pos=_test_pos,
-                                    comments=_comments,
-                                    mode=0)
-        self.test_thd.start()
+        self.start_test(test_pos=_test_pos, comments=_comments, mode=0)
 
     def start_continuous_test(self):
         """Creates a continuous test thread."""
         _comments = self.ui.le_comments.text()
 
-        if self.test_thd is not None:
-            if self.test_thd.is_alive():
-                _msg = 'Please wait until the current test finishes.'
-                _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
-                return
+        if self.test_running():
+            _msg = 'Please wait until the current test finishes.'
+            _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
+            return
 
-        self.test_thd = ThdTestAxis(comments=_comments, mode=1)
-        self.test_thd.continuous_flag = True
-        self.test_thd.start()
+        self.start_test(comments=_comments, mode=1)
 
         self.ui.pbt_stop_cont.setEnabled(True)
         self.ui.pbt_start_cont.setEnabled(False)
@@ -179,7 +244,10 @@ class TestsWidget(_QWidget):
 
     def stop_continuous_test(self):
         """Stops / finishes a continous test thread."""
-        self.test_thd.continuous_flag = False
+        if self.test_in_process:
+            self.acq_process.stop_test()
+        else:
+            self.test_thd.continuous_flag = False
 
         self.ui.pbt_stop_cont.setEnabled(False)
         self.ui.pbt_start_cont.setEnabled(True)
@@ -190,16 +258,12 @@ class TestsWidget(_QWidget):
         """Creates a manual test thread."""
         _comments = self.ui.le_comments.text()
 
-        if self.test_thd is not None:
-            if self.test_thd.is_alive():
-                _msg = 'Please wait until the current test finishes.'
-                _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
-                return
+        if self.test_running():
+            _msg = 'Please wait until the current test finishes.'
+            _QMessageBox.warning(self, 'Warning', _msg, _QMessageBox.Ok)
+            return
 
-        self.test_thd = ThdTestAxis(comments=_comments, mode=2)
-        self.test_thd.manual_flag = True
-        self.test_thd.acquire_flag = True
-        self.test_thd.start()
+        self.start_test(comments=_comments, mode=2)
 
         self.ui.pbt_stop_man.setEnabled(True)
         self.ui.pbt_acquire.setEnabled(True)
@@ -209,7 +273,10 @@ class TestsWidget(_QWidget):
 
     def stop_manual_test(self):
         """Stops / finishes a manual test thread."""
-        self.test_thd.manual_flag = False
+        if self.test_in_process:
+            self.acq_process.stop_test()
+        else:
+            self.test_thd.manual_flag = False
 
         self.ui.pbt_stop_man.setEnabled(False)
         self.ui.pbt_acquire.setEnabled(False)
@@ -219,312 +286,186 @@ class TestsWidget(_QWidget):
 
     def acquire_manual(self):
         """Acquires data in a manual test."""
-        self.test_thd.acquire_flag = True
-
+        if self.test_in_process:
+            self.acq_process.acquire()
+        else:
+            self.test_thd.acquire_flag = True
 
-class ThdReadDisplay(_threading.Thread):
-    """Thread reads Heidenhain display and provides its data to the
-    interface."""
-    def __init__(self, period=0.2):
-        """Initializes the thread.
+    def test_running(self):
+        """Returns True if a test is running, in a thread or in the
+        acquisition process."""
+        if self.test_in_process:
+            return self.acq_process.running
+        return self.test_thd is not None and self.test_thd.is_alive()
 
-        Args:
-            period (float): display reading period in seconds."""
-        super().__init__()
-        self.setDaemon = True
-        self.name = 'ThdReadDisplay'
-
-        self.period = period
-        self.reading_time = 0.2
-        self.run_flag = True
-        self.zero_flag = False
-
-        self.x = _np.nan
-        self.y = _np.nan
-        self.z = _np.nan
-
-    def run(self):
-        _waiting_time = self.period - self.reading_time
-        if _waiting_time < 0:
-            _waiting_time = 0
-        self.run_flag = True
-        while self.run_flag:
-            if self.zero_flag:
-                self.zero_flag = False
-                _display.reset_set_ref()
-            self.x, self.y, self.z = _display.read_display()
-            _time.sleep(_waiting_time)
-
-
-class ThdTestAxis(_threading.Thread):
-    """Thread runs the tests without blocking the graphical interface."""
-    def __init__(self, test_pos=None, comments='', mode=0, wtime=10):
-        """Initizalizes the thread.
+    def start_test(self, test_pos=None, comments='', mode=0):
+        """Starts a test thread, or a test in the acquisition process if
+        the separate process option is checked. In the process, the display
+        is read by the engine, so it is disconnected from the interface.
 
         Args:
             test_pos (list): list with the points to be scanned.
             comments (str): test description.
-            mode (int): 0 for discrete mode;
-                        1 for continuous mode;
-                        2 for manual mode.
-            wtime (float): wainting time (in seconds) between two points.
-        """
-        super().__init__()
-        self.setDaemon = True
-        self.name = "ThdTestAxis"
-
-        if test_pos is None:
-            self.test_pos = [-1, 1, 0]
-        else:
-            self.test_pos = test_pos
-        self.wtime = wtime
-        self.comments = comments
-        if mode in [0, 1, 2]:
-            self.mode = mode
+            mode (int): 0 for discrete, 1 for continuous and 2 for manual
+                mode."""
+        self.test_in_process = self.ui.chb_process.isChecked()
+        if self.test_in_process:
+            _port = None
+            if (self.thd_read_display is not None and
+                    self.thd_read_display.is_alive()):
+                _port = self.ui.cmb_port.currentText()
+                self.disconnect()
+            if self.acq_process is None:
+                self.acq_process = _AcquisitionProcess()
+            self.acq_process.start_test(
+                test_pos=test_pos, comments=comments, mode=mode,
+                display_port=_port,
+                display_period=self.ui.spd_period.value(),
+                live_size=self.live_size)
+            self.process_timer.start(200)
         else:
-            self.mode = 0
-
-        self.continuous_flag = False
-        self.manual_flag = False
-        self.acquire_flag = False
-
-        self.motorA = {'ActualPos': _PV('und:AxisA:ActualPosition'),
-                       'ActualSpd': _PV('und:AxisA:ActualVelocity'),
-                       'Current': _PV('und:AxisA:OutputCurrent'),
-                       'PosError': _PV('und:AxisA:PositionError'),
-                       'Torque': _PV('und:AxisA:TorqueReference'),
-                       'Status': _PV('und:AxisA:AxisStatus'),
-                       'MotionStatus': _PV('und:AxisA:MotionStatus'),
-                       'HomePos': _PV('und:AxisA:HomePos'),
-                       'MovePos': _PV('und:AxisA:MovePos'),
-                       'MoveFlag': _PV('und:AxisA:Move'),
-                       'OvertravelN': _PV('und:OvertravelN1'),
-                       'OvertravelP': _PV('und:OvertravelP1'),
-                       'Moving': _PV('und:AxisA:MoveStatus'),
-                       'ServoOn': _PV('und:AxisA:DriveEnableStatus'),
-                       'BrakeOff': _PV('und:AxisA:BrakeStatus')
-                       }
-
-        self.motorB = {'ActualPos': _PV('und:AxisB:ActualPosition'),
-                       'ActualSpd': _PV('und:AxisB:ActualVelocity'),
-                       'Current': _PV('und:AxisB:OutputCurrent'),
-                       'PosError': _PV('und:AxisB:PositionError'),
-                       'Torque': _PV('und:AxisB:TorqueReference'),
-                       'Status': _PV('und:AxisB:AxisStatus'),
-                       'MotionStatus': _PV('und:AxisB:MotionStatus'),
-                       'HomePos': _PV('und:AxisB:HomePos'),
-                       'MovePos': _PV('und:AxisB:MovePos'),
-                       'MoveFlag': _PV('und:AxisB:Move'),
-                       'OvertravelN': _PV('und:OvertravelN2'),
-                       'OvertravelP': _PV('und:OvertravelP2'),
-                       'Moving': _PV('und:AxisB:MoveStatus'),
-                       'ServoOn': _PV('und:AxisB:DriveEnableStatus'),
-                       'BrakeOff': _PV('und:AxisB:BrakeStatus')
-                       }
-
-        self.motorC = {'ActualPos': _PV('und:AxisC:ActualPosition'),
-                       'ActualSpd': _PV('und:AxisC:ActualVelocity'),
-                       'Current': _PV('und:AxisC:OutputCurrent'),
-                       'PosError': _PV('und:AxisC:PositionError'),
-                       'Torque': _PV('und:AxisC:TorqueReference'),
-                       'Status': _PV('und:AxisC:AxisStatus'),
-                       'MotionStatus': _PV('und:AxisC:MotionStatus'),
-                       'HomePos': _PV('und:AxisC:HomePos'),
-                       'MovePos': _PV('und:AxisC:MovePos'),
-                       'MoveFlag': _PV('und:AxisC:Move'),
-                       'OvertravelN': _PV('und:OvertravelN3'),
-                       'OvertravelP': _PV('und:OvertravelP3'),
-                       'Moving': _PV('und:AxisC:MoveStatus'),
-                       'ServoOn': _PV('und:AxisC:DriveEnableStatus'),
-                       'BrakeOff': _PV('und:AxisC:BrakeStatus')
-                       }
-
-        self.motorD = {'ActualPos': _PV('und:AxisD:ActualPosition'),
-                       'ActualSpd': _PV('und:AxisD:ActualVelocity'),
-                       'Current': _PV('und:AxisD:OutputCurrent'),
-                       'PosError': _PV('und:AxisD:PositionError'),
-                       'Torque': _PV('und:AxisD:TorqueReference'),
-                       'Status': _PV('und:AxisD:AxisStatus'),
-                       'MotionStatus': _PV('und:AxisD:MotionStatus'),
-                       'HomePos': _PV('und:AxisD:HomePos'),
-                       'MovePos': _PV('und:AxisD:MovePos'),
-                       'MoveFlag': _PV('und:AxisD:Move'),
-                       'OvertravelN': _PV('und:OvertravelN4'),
-                       'OvertravelP': _PV('und:OvertravelP4'),
-                       'Moving': _PV('und:AxisD:MoveStatus'),
-                       'ServoOn': _PV('und:AxisD:DriveEnableStatus'),
-                       'BrakeOff': _PV('und:AxisD:BrakeStatus')
-                       }
-
-        self.en_flags = {'EnContactor': _PV('und:EnContactor'),
-                         'EnClear': _PV('und:EnClear'),
-                         'EnServo': _PV('und:EnServo'),
-                         'DisServo': _PV('und:DisServo'),
-                         'EnHome': _PV('und:EnHome'),
-                         'EnCmsMode': _PV('und:EnCmsMode'),
-                         'EnVIMode': _PV('und:EnVIMode'),
-                         'EnHIMode': _PV('und:EnHIMode'),
-                         'EnEPMode': _PV('und:EnEPMode'),
-                         'EnLPMode': _PV('und:EnLPMode'),
-                         'EnMove': _PV('und:EnMove'),
-                         'EnCam': _PV('und:EnCam'),
-                         'EnContactor': _PV('und:EnContactor'),
-                         'EnCoupling': _PV('und:EnGeneralCoupling')}
-
-    def run(self):
-        """Collect information about the undulator axes and saves a log. There
-        are 3 different modes.
-
-            Discrete mode: moves the selected axis to a position in test_pos
-                and waits wtime before moving to the next position in test_pos,
-                until all positions are swept.
-
-            Continuous mode: acquires data continously until a button is
-                pressed to stop the acquisition.
-
-            Manual mode: acquires data only when a button os pressed."""
-        _test_pos = self.test_pos
-        _wtime = self.wtime
-        _comments = self.comments
-        _mode = self.mode
-
-        _upd_interval = 0.02
-        self.data = []
-
-        self.thd_display = None
-        _thd_list = _threading.enumerate()
-        for _t in _thd_list:
-            if _t.name == 'ThdReadDisplay':
-                self.thd_display = _t
-
-        _motor = None
-        if self.motorA['MoveFlag'].get():
-            _motor = self.motorA
-        elif self.motorB['MoveFlag'].get():
-            _motor = self.motorB
-        elif self.motorC['MoveFlag'].get():
-            _motor = self.motorC
-        elif self.motorD['MoveFlag'].get():
-            _motor = self.motorD
-
-        if _motor is not None:
-            _t0 = _time.time()
-
-            # discrete test mode
-            if _mode == 0:
-                for _pos in _test_pos:
-                    self.motorA['MovePos'].put(_pos)
-                    self.motorB['MovePos'].put(_pos)
-                    self.motorC['MovePos'].put(_pos)
-                    self.motorD['MovePos'].put(_pos)
-                    while not all([self.motorA['MovePos'].get() == _pos,
-                                   self.motorB['MovePos'].get() == _pos,
-                                   self.motorC['MovePos'].get() == _pos,
-                                   self.motorD['MovePos'].get() == _pos]):
-                        _t = _time.time() - _t0
-                        _info = self.get_axis_info(_t)
-                        self.data.append(_info)
-                        _time.sleep(_upd_interval)
-                    self.en_flags['EnMove'].put(True)
-                    while not _motor['Moving'].get():
-                        _t = _time.time() - _t0
-                        _info = self.get_axis_info(_t)
-                        self.data.append(_info)
-                        _time.sleep(_upd_interval)
-                    _time.sleep(0.1)
-                    while _motor['Moving'].get():
-                        _t = _time.time() - _t0
-                        _info = self.get_axis_info(_t)
-                        self.data.append(_info)
-                        _time.sleep(_upd_interval)
-                    _t1 = _time.time()
-                    while (_time.time() - _t1) < _wtime:
-                        _t = _time.time() - _t0
-                        _info = self.get_axis_info(_t)
-                        self.data.append(_info)
-                        _time.sleep(_upd_interval)
-
-            # continuous test mode
-            elif _mode == 1:
-                while self.continuous_flag:
-                    _t = _time.time() - _t0
-                    _info = self.get_axis_info(_t)
-                    self.data.append(_info)
-                    _time.sleep(_upd_interval)
-
-            # manual test mode
-            elif _mode == 2:
-                while self.manual_flag:
-                    if self.acquire_flag:
-                        _t = _time.time() - _t0
-                        _info = self.get_axis_info(_t)
-                        self.data.append(_info)
-                        self.acquire_flag = False
-                    _time.sleep(_upd_interval)
-
-            try:
-                self.save_test_log(self.data, _test_pos, _comments)
-            except IndexError:
-                pass
-
-        print('Test successfuly completed.')
-
-    def save_test_log(self, data, test_pos, comments=''):
-        """Saves a test log with the following name:
-        log_year_month_day_hour_min_sec.dat.
-
-        Args:
-            data (list): a list of dict containg the desired values.
-            test_pos (list): a list of the test positions.
-            comments (str): test comments."""
-        _timestamp = _time.strftime('%Y_%m_%d_%H_%M_%S', _time.localtime())
-        _log_name = 'log_' + _timestamp + '.dat'
-        _comments = 'Comments: ' + comments + '\n'
-        _test_pos_str = 'Test positions [mm]: '
-        for _val in test_pos:
-            _test_pos_str = _test_pos_str + str(_val) + ', '
-        _test_pos_str = _test_pos_str[:-2] + '\n'
-        _header = _comments + _test_pos_str + '\t'.join(data[0].keys()) + '\n'
-        with open(_log_name, 'w') as _f:
-            _f.write(_header)
-            for _row in data:
-                _line = ''
-                for _item in _row.values():
-                    _line = _line + str(_item) + '\t'
-                _line = _line[:-1] + '\n'
-                _f.write(_line)
-
-    def get_axis_info(self, t):
-        """Gets the following axis information for each axis: Actual Position,
-        Position Error, Output Current and Torque Reference.
+            self.test_thd = ThdTestAxis(test_pos=test_pos,
+                                        comments=comments,
+                                        mode=mode)
+            self.test_thd.continuous_flag = mode == 1
+            self.test_thd.manual_flag = mode == 2
+            self.test_thd.acquire_flag = mode == 2
+            self.test_thd.live_size = self.live_size
+            self.test_thd.start()
+        self.live_timer.start(int(1000/self.live_fps))
+
+    def poll_process(self):
+        """Handles the status messages of the acquisition process."""
+        try:
+            for _command, _args in self.acq_process.poll():
+                if _command == 'started':
+                    print('Test started: ' + _args['log_name'])
+                elif _command == 'finished':
+                    print('Test finished: ' + str(_args['log_name']))
+                    print('Sampling: ' + _args['sampling'])
+                elif _command in ('failed', 'error'):
+                    print('Acquisition process: ' + _args['message'])
+                    _msg = _args['message'].strip().split('\n')[-1]
+                    _QMessageBox.warning(self, 'Failure', _msg,
+                                         _QMessageBox.Ok)
+            if not self.acq_process.running:
+                self.process_timer.stop()
+        except Exception:
+            self.process_timer.stop()
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Failed to communicate with the acquisition process.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
 
-        Args:
-            t (float): the time (after the test began) the information was
-                retrieved.
-
-        Returns:
-            a dict containg all the information."""
-        _info = {'t [s]': t,
-                 'ActualPosA [mm]': self.motorA['ActualPos'].get(),
-                 'PosErrorA [mm]': self.motorA['PosError'].get(),
-                 'CurrentA [A]': self.motorA['Current'].get(),
-                 'TorqueA [%]': self.motorA['Torque'].get(),
-                 'ActualPosB [mm]': self.motorB['ActualPos'].get(),
-                 'PosErrorB [mm]': self.motorB['PosError'].get(),
-                 'CurrentB [A]': self.motorB['Current'].get(),
-                 'TorqueB [%]': self.motorB['Torque'].get(),
-                 'ActualPosC [mm]': self.motorC['ActualPos'].get(),
-                 'PosErrorC [mm]': self.motorC['PosError'].get(),
-                 'CurrentC [A]': self.motorC['Current'].get(),
-                 'TorqueC [%]': self.motorC['Torque'].get(),
-                 'ActualPosD [mm]': self.motorD['ActualPos'].get(),
-                 'PosErrorD [mm]': self.motorD['PosError'].get(),
-                 'CurrentD [A]': self.motorD['Current'].get(),
-                 'TorqueD [%]': self.motorD['Torque'].get()}
-
-        if self.thd_display is not None:
-            _info['DisplayX [mm]'] = self.thd_display.x
-            _info['DisplayY [mm]'] = self.thd_display.y
-            _info['DisplayZ [mm]'] = self.thd_display.z
-
-        return _info
+    def close_process(self):
+        """Finishes the running test and the acquisition process."""
+        if self.acq_process is not None:
+            self.acq_process.close()
+
+    def get_live_buffer(self):
+        """Returns the live buffer of the current test, or None."""
+        if self.test_in_process:
+            if self.acq_process is None:
+                return None
+            return self.acq_process.buffer
+        if self.test_thd is None:
+            return None
+        return self.test_thd.live_buffer
+
+    def list_live_columns(self, columns):
+        """Lists the plottable columns of the test on the live plot
+        combobox, keeping the current selection if possible."""
+        self.live_columns = list(columns)
+        _names = [_col for _col in self.live_columns[1:]
+                  if not _col.startswith('tIOC')]
+        _names += ['ActualPos [mm]', 'PosError [mm]',
+                   'Current [A]', 'Torque [%]']
+        _current = self.ui.cmb_live.currentText()
+        self.ui.cmb_live.blockSignals(True)
+        self.ui.cmb_live.clear()
+        self.ui.cmb_live.addItems(_names)
+        if _current in _names:
+            self.ui.cmb_live.setCurrentIndex(_names.index(_current))
+        self.ui.cmb_live.blockSignals(False)
+        self.reset_live_plot()
+
+    def showEvent(self, event):
+        """Redraws the live plot, not updated while the tab was hidden."""
+        super().showEvent(event)
+        self.reset_live_plot()
+
+    def reset_live_plot(self):
+        """Forces a redraw on the next live plot update."""
+        self.live_count = -1
+        if not self.live_timer.isActive():
+            self.update_live_plot()
+
+    def update_live_plot(self):
+        """Redraws the live plot with the samples of the rolling window.
+
+        Called at the live frame rate, independent of the sample rate. The
+        rows are read from the live buffer without locking the acquisition,
+        only the selected columns of the window are copied, and the lines
+        are reused with min/max decimated data."""
+        try:
+            _running = self.test_running()
+            if not _running:
+                self.live_timer.stop()
+            if not self.isVisible():
+                # redrawn when the tab is shown again
+                return
+            _buffer = self.get_live_buffer()
+            if _buffer is None:
+                return
+            if _buffer.columns != self.live_columns:
+                self.list_live_columns(_buffer.columns)
+            _count = _buffer.count
+            if _count == 0 or _count == self.live_count:
+                return
+            self.live_count = _count
+
+            _data = self.ui.cmb_live.currentText()
+            if _data in ['ActualPos [mm]', 'PosError [mm]',
+                         'Current [A]', 'Torque [%]']:
+                _data_split = _data.split(' ')
+                _names = [_data_split[0] + _motor + ' ' + _data_split[1]
+                          for _motor in ['A', 'B', 'C', 'D']]
+            else:
+                _names = [_data]
+            _names = [_name for _name in _names if _name in self.live_columns]
+            _cols = [0] + [self.live_columns.index(_name)
+                           for _name in _names]
+
+            _views, _ = _buffer.views()
+            _t_max = _views[-1][-1, 0]
+            _t_min = _t_max - self.ui.sbd_live_window.value()
+            _window = _np.concatenate([
+                _view[_np.searchsorted(_view[:, 0], _t_min):, _cols]
+                for _view in _views])
+
+            if self.ui.live_plot is None:
+                self.add_live_canvas()
+            _canvas = self.ui.live_plot.canvas
+            _ax = _canvas.ax
+            for _name in list(self.live_lines.keys()):
+                if _name not in _names:
+                    self.live_lines.pop(_name).remove()
+            _nbins = max(int(_ax.bbox.width), 100)
+            for _i, _name in enumerate(_names):
+                if _name not in self.live_lines:
+                    self.live_lines[_name], = _ax.plot(
+                        [], [], '-', label=_name, alpha=0.8)
+                self.live_lines[_name].set_data(*_minmax_decimate(
+                    _window[:, 0], _window[:, _i + 1], nbins=_nbins))
+            if _ax.get_ylabel() != _data:
+                _ax.set_ylabel(_data)
+                _ax.set_xlabel('t [s]')
+                _ax.legend(loc='upper left')
+                _ax.grid(1)
+            _ax.set_xlim(max(_t_min, _window[0, 0]),
+                         max(_t_max, _window[0, 0] + 1e-3))
+            _ax.relim()
+            _ax.autoscale_view(scalex=False)
+            _canvas.draw_idle()
+        except Exception:
+            self.live_timer.stop()
+            _traceback.print_exc(file=_sys.stdout)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""Visibility aware update throttling.
+
+The PyDM widgets of a hidden tab keep receiving every CA update and
+evaluating their rules, and the time plot keeps redrawing while the
+window is minimized. The hidden widgets are paused: their channels are
+disconnected, their rules unregistered and their repaints disabled. When
+shown again they reconnect, which reads the current values once, and the
+time plot, whose channels stay connected to keep its history, is redrawn.
+
+Set UNDULATOR_THROTTLE=0 to keep all the widgets updating.
+"""
+
+import os as _os
+import time as _time
+
+from pydm.utilities import (
+    close_widget_connections as _close_widget_connections,
+    establish_widget_connections as _establish_widget_connections,
+    )
+from pydm.widgets.rules import (
+    register_widget_rules as _register_widget_rules,
+    unregister_widget_rules as _unregister_widget_rules,
+    )
+
+
+def enabled():
+    """Returns False if the throttling is disabled by UNDULATOR_THROTTLE."""
+    return _os.environ.get(
+        'UNDULATOR_THROTTLE', '1').lower() not in ('0', 'no', 'false', 'off')
+
+
+def pause_widget(widget):
+    """Stops the channel updates, rules and repaints of a widget and of
+    its children."""
+    widget.setUpdatesEnabled(False)
+    _unregister_widget_rules(widget)
+    _close_widget_connections(widget)
+
+
+def resume_widget(widget):
+    """Reconnects the channels and rules of a paused widget; the current
+    values are read on the connection."""
+    _establish_widget_connections(widget)
+    _register_widget_rules(widget)
+    widget.setUpdatesEnabled(True)
+
+
+def pause_plot(plot):
+    """Stops the redraws of a PyDM plot, which keeps buffering data."""
+    plot.redraw_timer.stop()
+
+
+def resume_plot(plot):
+    """Restarts the redraws of a PyDM plot, redrawing it once."""
+    plot.redraw_timer.start()
+    plot.redrawPlot()
+
+
+class UpdateThrottle(object):
+    """Pauses and resumes widgets as they are hidden and shown."""
+
+    def __init__(self):
+        self.paused = set()
+        self.pauses = 0
+
+    def set_visible(self, widget, visible):
+        """Pauses or resumes a widget, if its state changed.
+
+        Args:
+            widget (QWidget): tab widget or PyDM plot.
+            visible (bool): True if the widget is visible."""
+        if visible and widget in self.paused:
+            self.paused.discard(widget)
+            if hasattr(widget, 'redraw_timer'):
+                resume_plot(widget)
+            else:
+                resume_widget(widget)
+        elif not visible and widget not in self.paused:
+            self.paused.add(widget)
+            self.pauses += 1
+            if hasattr(widget, 'redraw_timer'):
+                pause_plot(widget)
+            else:
+                pause_widget(widget)
+
+    def resume_all(self):
+        """Resumes all the paused widgets."""
+        for _widget in list(self.paused):
+            self.set_visible(_widget, True)
+
+
+class CPUUsage(object):
+    """CPU use of this process (all threads), in percent of one core."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Starts a new measurement interval."""
+        self.t_wall = _time.perf_counter()
+        self.t_cpu = _time.process_time()
+
+    def percent(self):
+        """Returns the CPU use since the last reset."""
+        _wall = _time.perf_counter() - self.t_wall
+        if _wall <= 0:
+            return 0.0
+        return 100*(_time.process_time() - self.t_cpu)/_wall
+
+    def sample(self):
+        """Returns the CPU use since the last sample and starts a new
+        interval."""
+        _percent = self.percent()
+        self.reset()
+        return _percent
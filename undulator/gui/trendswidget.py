@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import os as _os
+import sys as _sys
+import time as _time
+import threading as _threading
+import traceback as _traceback
+
+from qtpy.QtCore import (
+    QTimer as _QTimer,
+    )
+from qtpy.QtWidgets import (
+    QWidget as _QWidget,
+    )
+
+from undulator.data import trendstore as _trendstore
+from undulator.gui.utils import loadUi as _loadUi
+
+
+class ThdIngest(_threading.Thread):
+    """Updates the trend database of a log directory."""
+
+    def __init__(self, directory):
+        """Initializes the thread.
+
+        Args:
+            directory (str): test logs directory."""
+        super().__init__(name='ThdIngest', daemon=True)
+        self.directory = directory
+        self.done = 0
+        self.total = 0
+        self.stats = None
+
+    def progress(self, done, total):
+        """Keeps the number of logs read."""
+        self.done = done
+        self.total = total
+
+    def run(self):
+        """Ingests the new or modified logs."""
+        try:
+            self.stats = _trendstore.ingest(
+                self.directory, progress=self.progress)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+
+class TrendsWidget(_QWidget):
+    """Trends widget class for the Delta Undulator Control GUI."""
+
+    def __init__(self, parent=None):
+        """Set up the ui."""
+        super().__init__(parent)
+
+        # setup the ui
+        self.ui = _loadUi(self)
+
+        self.log_dir = _os.getcwd()
+        self.store = None
+        self.thd_ingest = None
+        self.ingest_timer = _QTimer()
+        self.lines = []
+
+        self.metrics = (list(_trendstore.AXIS_METRICS)
+                        + list(_trendstore.TEST_METRICS))
+        self.ui.cmb_data.addItems([_label for _, _label in self.metrics])
+
+        # the database is plotted when the widget is first shown
+        self.plotted = False
+        self.connect_signals_slots()
+
+    def connect_signals_slots(self):
+        """Connects Qt signals and slots."""
+        self.ui.cmb_data.currentIndexChanged.connect(self.plot)
+        self.ui.cmb_axis.currentIndexChanged.connect(self.plot)
+        self.ui.sb_weeks.valueChanged.connect(self.plot)
+        self.ui.pbt_update.clicked.connect(self.update_database)
+        self.ingest_timer.timeout.connect(self.check_ingest)
+
+    def add_plot_widgets(self):
+        """Adds plot widget to the trends widget."""
+        import imautils.gui.mplwidget as _mplwidget
+        self.ui.plot = _mplwidget.MplWidget()
+        self.ui.vbl_plot.addWidget(self.ui.plot)
+
+    def showEvent(self, event):
+        """Plots the stored trends when the widget is first shown."""
+        if not self.plotted:
+            self.plotted = True
+            self.plot()
+        super().showEvent(event)
+
+    def get_store(self):
+        """Returns the trend database of the log directory."""
+        if self.store is None:
+            self.store = _trendstore.TrendStore(_os.path.join(
+                self.log_dir, _trendstore.DB_NAME))
+        return self.store
+
+    def update_database(self):
+        """Reads the new or modified logs in a background thread."""
+        if self.thd_ingest is not None and self.thd_ingest.is_alive():
+            return
+        self.ui.pbt_update.setEnabled(False)
+        self.ui.la_status.setText('Reading the logs...')
+        self.thd_ingest = ThdIngest(self.log_dir)
+        self.thd_ingest.start()
+        self.ingest_timer.start(200)
+
+    def check_ingest(self):
+        """Shows the ingestion progress and plots when it finishes."""
+        _thd = self.thd_ingest
+        if _thd is None:
+            self.ingest_timer.stop()
+            return
+        if _thd.is_alive():
+            self.ui.la_status.setText('Reading the logs: {0:d}/{1:d}'.format(
+                _thd.done, _thd.total))
+            return
+        self.ingest_timer.stop()
+        self.ui.pbt_update.setEnabled(True)
+        if _thd.stats is None:
+            self.ui.la_status.setText('Could not update the database.')
+        else:
+            self.ui.la_status.setText(
+                '{0:d} logs read, {1:d} removed, {2:d} failed in '
+                '{3:.1f} s'.format(_thd.stats['ingested'],
+                                   _thd.stats['removed'],
+                                   _thd.stats['failed'],
+                                   _thd.stats['elapsed']))
+        self.plot()
+
+    def plot(self):
+        """Plots the selected summary value of the tests in the period."""
+        try:
+            if not self.plotted:
+                return
+            _t0 = _time.perf_counter()
+            _key, _label = self.metrics[self.ui.cmb_data.currentIndex()]
+            _axis_metric = _key in dict(_trendstore.AXIS_METRICS)
+            self.ui.cmb_axis.setEnabled(_axis_metric)
+            if _axis_metric:
+                _axis = self.ui.cmb_axis.currentText()
+                if _axis == 'All':
+                    _axes = list(_trendstore.AXIS_NAMES)
+                else:
+                    _axes = [_axis]
+            else:
+                _axes = [None]
+            _t_min = _time.time() - self.ui.sb_weeks.value()*7*86400
+
+            if not hasattr(self.ui, 'plot'):
+                self.add_plot_widgets()
+            _canvas = self.ui.plot.canvas
+            _ax = _canvas.ax
+            for _line in self.lines:
+                _line.remove()
+            self.lines = []
+            _count = 0
+            for _axis in _axes:
+                _times, _values, _ = self.get_store().query(
+                    _key, _axis, t_min=_t_min)
+                _count = max(_count, len(_times))
+                _name = _label if _axis is None else '{0:s} {1:s}'.format(
+                    _label.split(' [')[0], _axis)
+                _line, = _ax.plot(
+                    _times.astype('datetime64[s]'), _values, 'o-',
+                    markersize=3, label=_name, alpha=0.8)
+                self.lines.append(_line)
+            _ax.set_ylabel(_label)
+            _ax.relim()
+            _ax.autoscale_view()
+            _ax.legend(loc='upper left')
+            _ax.grid(1)
+            _canvas.fig.autofmt_xdate()
+            _canvas.draw_idle()
+            if self.thd_ingest is None or not self.thd_ingest.is_alive():
+                self.ui.la_status.setText(
+                    '{0:d} tests in the period ({1:.0f} ms)'.format(
+                        _count, 1e3*(_time.perf_counter() - _t0)))
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            self.ui.la_status.setText('Could not plot the trends.')
+
+    def closeEvent(self, event):
+        """Closes the trend database."""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        super().closeEvent(event)
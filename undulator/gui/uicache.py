@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""Compiled ui module cache.
+
+The .ui files are compiled to Python modules the first time they are
+loaded (or all at once, running this module after the installation), so
+the widgets are not built parsing the XML on every start. Each module is
+named after the hash of its ui file and of the Qt binding version, and is
+compiled again when either changes.
+
+The cache is in the ui/__uicache__ directory, or in ~/.cache/undulator/ui
+if the package is not writable, and UNDULATOR_UI_CACHE_DIR sets another
+one. Set UNDULATOR_UI_CACHE=0 to load the ui files directly, e.g. while
+editing them in Qt Designer.
+
+Usage:
+    python -m undulator.gui.uicache
+"""
+
+import os as _os
+import sys as _sys
+import glob as _glob
+import hashlib as _hashlib
+import tempfile as _tempfile
+import importlib.util as _importlib_util
+
+_basepath = _os.path.join(
+    _os.path.dirname(_os.path.abspath(__file__)), 'ui')
+
+_modules = {}
+
+
+def enabled():
+    """Returns False if the cache is disabled by UNDULATOR_UI_CACHE."""
+    return _os.environ.get(
+        'UNDULATOR_UI_CACHE', '1').lower() not in ('0', 'no', 'false', 'off')
+
+
+def get_cache_dir():
+    """Returns the cache directory, creating it if needed."""
+    _cache_dir = _os.environ.get('UNDULATOR_UI_CACHE_DIR')
+    if not _cache_dir:
+        _cache_dir = _os.path.join(_basepath, '__uicache__')
+        if not _os.access(_basepath, _os.W_OK):
+            _cache_dir = _os.path.join(
+                _os.path.expanduser('~'), '.cache', 'undulator', 'ui')
+    _os.makedirs(_cache_dir, exist_ok=True)
+    return _cache_dir
+
+
+def get_binding_version():
+    """Returns the Qt binding name and versions, which change the
+    generated code."""
+    import qtpy as _qtpy
+    return '{0:s} {1:s} {2:s}'.format(
+        _qtpy.API_NAME, str(_qtpy.QT_VERSION),
+        str(getattr(_qtpy, 'PYQT_VERSION', None)))
+
+
+def get_hash(uifile):
+    """Returns the cache key of a ui file."""
+    _sha1 = _hashlib.sha1(get_binding_version().encode('utf-8'))
+    with open(uifile, 'rb') as _f:
+        _sha1.update(_f.read())
+    return _sha1.hexdigest()[:16]
+
+
+def get_module_path(uifile, cache_dir=None):
+    """Returns the path of the compiled module of a ui file."""
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    _name = _os.path.splitext(_os.path.basename(uifile))[0]
+    return _os.path.join(
+        cache_dir, '{0:s}_{1:s}.py'.format(_name, get_hash(uifile)))
+
+
+def compile_ui(uifile, cache_dir=None):
+    """Compiles a ui file to the cache, if not compiled yet, and removes
+    the modules of previous versions of the file.
+
+    Returns:
+        the compiled module path."""
+    from qtpy import uic as _uic
+
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    _module_path = get_module_path(uifile, cache_dir)
+    if _os.path.isfile(_module_path):
+        return _module_path
+
+    _name = _os.path.splitext(_os.path.basename(uifile))[0]
+    _fd, _tmp_path = _tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+    try:
+        with _os.fdopen(_fd, 'w', encoding='utf-8') as _f:
+            _uic.compileUi(uifile, _f)
+        # atomic, so concurrent starts never import a partial module
+        _os.replace(_tmp_path, _module_path)
+    except Exception:
+        _os.remove(_tmp_path)
+        raise
+
+    _pattern = _os.path.join(cache_dir, '{0:s}_*.py'.format(_name))
+    for _old_path in _glob.glob(_pattern):
+        if _old_path != _module_path:
+            try:
+                _os.remove(_old_path)
+            except OSError:
+                pass
+    return _module_path
+
+
+def load_module(module_path):
+    """Imports a compiled ui module."""
+    if module_path in _modules:
+        return _modules[module_path]
+    _name = 'undulator_uicache_' + _os.path.splitext(
+        _os.path.basename(module_path))[0]
+    _spec = _importlib_util.spec_from_file_location(_name, module_path)
+    _module = _importlib_util.module_from_spec(_spec)
+    _spec.loader.exec_module(_module)
+    _modules[module_path] = _module
+    return _module
+
+
+def get_ui_class(uifile):
+    """Returns the generated Ui_ class of a ui file, compiling it if
+    needed."""
+    _module = load_module(compile_ui(uifile))
+    for _name, _value in vars(_module).items():
+        if _name.startswith('Ui_') and isinstance(_value, type):
+            return _value
+    raise ValueError('No Ui class in the module of ' + uifile)
+
+
+def compile_all(directory=None, cache_dir=None):
+    """Compiles all the ui files of a directory.
+
+    Returns:
+        a list with the compiled module paths."""
+    if directory is None:
+        directory = _basepath
+    return [compile_ui(_uifile, cache_dir) for _uifile in sorted(
+        _glob.glob(_os.path.join(directory, '*.ui')))]
+
+
+def main():
+    """Compiles the ui files of the package."""
+    _cache_dir = get_cache_dir()
+    for _module_path in compile_all(cache_dir=_cache_dir):
+        print(_module_path)
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
@@ -4,13 +4,18 @@ Created on 27 de set de 2019
 @author: vps
 '''
 
+from undulator.gui.startup import timer as _startup_timer
+
 import os as _os
 import sys as _sys
 import threading as _threading
+from qtpy.QtCore import QTimer as _QTimer
 from qtpy.QtWidgets import QApplication as _QApplication
 
 from undulator.gui.undulatorwindow import UndulatorWindow as _UndulatorWindow
 
+_startup_timer.mark('imports')
+
 # Styles: ["windows", "motif", "cde", "plastique", "windowsxp", or "macintosh"]
 _style = 'windows'
 _width = 800
@@ -44,19 +49,30 @@ class GUIThread(_threading.Thread):
         """Thread target function."""
         if (not _QApplication.instance()):
             self.app = UndulatorApp([])
-            self.window = _UndulatorWindow(width=_width, height=_height)
-            self.window.show()
+            _startup_timer.mark('application')
+            self.window = create_window()
 #             self.window.centralizeWindow()
             _sys.exit(self.app.exec_())
 
 
+def create_window():
+    """Creates and shows the main window, reporting the startup times when
+    the event loop starts."""
+    window = _UndulatorWindow(width=_width, height=_height)
+    _startup_timer.mark('first tab and status bar')
+    window.show()
+    _startup_timer.mark('show')
+    _QTimer.singleShot(0, _startup_timer.finish)
+    return window
+
+
 def run():
     """Run Undulator GUI applicaton."""
     app = None
     if (not _QApplication.instance()):
         app = UndulatorApp([])
-        window = _UndulatorWindow(width=_width, height=_height)
-        window.show()
+        _startup_timer.mark('application')
+        window = create_window()
         window.centralizeWindow()
         _sys.exit(app.exec_())
 
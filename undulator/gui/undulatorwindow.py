@@ -2,18 +2,58 @@
 
 """Main window for the Delta Undulator Control GUI."""
 
+import os as _os
+import sys as _sys
+import time as _time
+import importlib as _importlib
+import traceback as _traceback
+from qtpy.QtCore import (
+    QEvent as _QEvent,
+    QTimer as _QTimer,
+    )
 from qtpy.QtWidgets import (
+    QWidget as _QWidget,
+    QLabel as _QLabel,
+    QComboBox as _QComboBox,
+    QHBoxLayout as _QHBoxLayout,
     QMainWindow as _QMainWindow,
+    QPushButton as _QPushButton,
+    QVBoxLayout as _QVBoxLayout,
+    QFileDialog as _QFileDialog,
+    QMessageBox as _QMessageBox,
+    )
+
+from undulator.devices.axis import (
+    AXIS_NAMES as _AXIS_NAMES,
+    PREFIX as _PREFIX,
     )
-import qtpy.uic as _uic
+from undulator.devices.instrumentation import stats as _ca_stats
+from undulator.gui import throttle as _throttle
+from undulator.gui.startup import timer as _startup_timer
+from undulator.gui.utils import loadUi as _loadUi
+
 
-from undulator.gui.utils import getUiFile as _getUiFile
-from undulator.gui.monitorwidget import MonitorWidget as _MonitorWidget
-from undulator.gui.parameterswidget import ParametersWidget \
-    as _ParametersWidget
-from undulator.gui.controlwidget import ControlWidget as _ControlWidget
-from undulator.gui.analysiswidget import AnalysisWidget as _AnalysisWidget
-from undulator.gui.testswidget import TestsWidget as _TestsWidget
+# tab name, module and widget class; the widgets (and their modules) are
+# only created when the tab is first shown
+TABS = [
+    ('monitor', 'undulator.gui.monitorwidget', 'MonitorWidget'),
+    ('parameters', 'undulator.gui.parameterswidget', 'ParametersWidget'),
+    ('control', 'undulator.gui.controlwidget', 'ControlWidget'),
+    ('tests', 'undulator.gui.testswidget', 'TestsWidget'),
+    ('analysis', 'undulator.gui.analysiswidget', 'AnalysisWidget'),
+    ('trends', 'undulator.gui.trendswidget', 'TrendsWidget'),
+    ]
+
+# history plot span name and seconds; None is the live time plot
+HISTORY_SPANS = [
+    ('Live', None),
+    ('10 minutes', 600),
+    ('1 hour', 3600),
+    ('1 day', 86400),
+    ('1 week', 7*86400),
+    ('1 month', 30*86400),
+    ]
+HISTORY_COLORS = ['white', 'red', 'dodgerblue', 'forestgreen']
 
 
 class UndulatorWindow(_QMainWindow):
@@ -24,31 +64,284 @@ class UndulatorWindow(_QMainWindow):
         super().__init__(parent)
 
         # setup the ui
-        uifile = _getUiFile(self)
-        self.ui = _uic.loadUi(uifile, self)
+        self.ui = _loadUi(self)
         self.resize(width, height)
+        _startup_timer.mark('window ui')
+
+        # define tab names; the widgets are built on first activation
+        self.tab_names = [_tab[0] for _tab in TABS]
+        self.tab_widgets = [None]*len(TABS)
 
-        # define tab names and corresponding widgets
-        self.tab_names = [
-            'monitor',
-            'parameters',
-            'control',
-            'tests',
-            'analysis',
-            ]
-
-        self.tab_widgets = [
-            _MonitorWidget(),
-            _ParametersWidget(),
-            _ControlWidget(),
-            _TestsWidget(),
-            _AnalysisWidget(),
-            ]
+        # PyDM updates of the hidden tabs are paused
+        self.throttle = _throttle.UpdateThrottle()
+        self.throttle_hidden = _throttle.enabled()
+        self.cpu_usage = _throttle.CPUUsage()
+        self.history_plot = None
 
         self.ui.main_tab.clear()
 
-        for i in range(len(self.tab_names)):
-            tab_name = self.tab_names[i]
-            tab = self.tab_widgets[i]
-            setattr(self, tab_name, tab)
-            self.ui.main_tab.addTab(tab, tab_name.capitalize())
+        for tab_name in self.tab_names:
+            setattr(self, tab_name, None)
+            _container = _QWidget()
+            _layout = _QVBoxLayout(_container)
+            _layout.setContentsMargins(0, 0, 0, 0)
+            self.ui.main_tab.addTab(_container, tab_name.capitalize())
+
+        self.ui.main_tab.currentChanged.connect(self.build_tab)
+        self.ui.main_tab.currentChanged.connect(self.update_visibility)
+        self.build_tab(self.ui.main_tab.currentIndex())
+
+        self.add_status_widgets()
+        self.add_fault_capture()
+        self.add_archiver()
+        self.add_history_widgets()
+
+    def build_tab(self, index):
+        """Creates the widget of a tab, if it was not created yet.
+
+        Args:
+            index (int): tab index."""
+        if index < 0 or self.tab_widgets[index] is not None:
+            return
+        _name, _module, _class = TABS[index]
+        try:
+            _t = _time.perf_counter()
+            _widget = getattr(_importlib.import_module(_module), _class)()
+            self.ui.main_tab.widget(index).layout().addWidget(_widget)
+            self.tab_widgets[index] = _widget
+            setattr(self, _name, _widget)
+            _elapsed = _time.perf_counter() - _t
+            _startup_timer.record('tab ' + _name, _elapsed)
+            if _startup_timer.reported:
+                print('{0:s} tab created in {1:.1f} ms'.format(
+                    _name.capitalize(), 1e3*_elapsed))
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not create the {0:s} tab.'.format(_name)
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def update_visibility(self, index=None):
+        """Pauses the PyDM updates of the hidden tabs, and of the time plot
+        if the window is minimized or the history is shown, and resumes the
+        visible ones.
+
+        Args:
+            index (int): current tab index (unused, read from the tab
+                widget)."""
+        try:
+            _minimized = self.isMinimized()
+            _current = self.ui.main_tab.currentIndex()
+            for _index, _widget in enumerate(self.tab_widgets):
+                if _widget is not None:
+                    self.throttle.set_visible(_widget, any([
+                        not self.throttle_hidden,
+                        _index == _current and not _minimized]))
+            _live = self.history_plot is None or self.history_plot.isHidden()
+            self.throttle.set_visible(
+                self.ui.PyDMTimePlot,
+                not self.throttle_hidden or (_live and not _minimized))
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def set_throttling(self, enabled):
+        """Enables or disables the pausing of the hidden widgets."""
+        self.throttle_hidden = enabled
+        self.update_visibility()
+
+    def changeEvent(self, event):
+        """Pauses or resumes the updates when the window is minimized or
+        restored."""
+        if event.type() == _QEvent.WindowStateChange:
+            self.update_visibility()
+        super().changeEvent(event)
+
+    def closeEvent(self, event):
+        """Finishes the acquisition process, the fault capture and the
+        archiver before closing."""
+        try:
+            if self.tests is not None:
+                self.tests.close_process()
+            if self.fault_capture is not None:
+                self.fault_capture.stop()
+            if self.archiver is not None:
+                self.archiver.stop()
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+        event.accept()
+
+    def add_status_widgets(self):
+        """Adds the CA statistics summary and export button to the status
+        bar."""
+        self.ui.pbt_export_stats = _QPushButton('Export CA stats')
+        self.ui.pbt_export_stats.clicked.connect(self.export_stats)
+        self.ui.statusbar.addPermanentWidget(self.ui.pbt_export_stats)
+        self.stats_timer = _QTimer()
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+
+    def add_fault_capture(self):
+        """Starts the fault capture in the working directory, unless
+        UNDULATOR_FAULT_CAPTURE is 0. UNDULATOR_FAULT_TRIGGER sets the
+        trigger expression."""
+        self.fault_capture = None
+        self.ui.la_fault = _QLabel()
+        self.ui.statusbar.addPermanentWidget(self.ui.la_fault)
+        if _os.environ.get('UNDULATOR_FAULT_CAPTURE', '1').lower() in (
+                '0', 'no', 'false', 'off'):
+            return
+        try:
+            from undulator.devices import faultcapture as _faultcapture
+            self.fault_capture = _faultcapture.FaultCapture(
+                trigger=_os.environ.get('UNDULATOR_FAULT_TRIGGER',
+                                        _faultcapture.DEFAULT_TRIGGER))
+            self.fault_capture.start()
+        except Exception:
+            self.fault_capture = None
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not start the fault capture.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def add_archiver(self):
+        """Starts the local archiver, unless UNDULATOR_ARCHIVE is 0.
+        UNDULATOR_ARCHIVE_DIR sets the archive directory."""
+        self.archiver = None
+        if _os.environ.get('UNDULATOR_ARCHIVE', '1').lower() in (
+                '0', 'no', 'false', 'off'):
+            return
+        try:
+            from undulator.devices import archiver as _archiver
+            self.archiver = _archiver.Archiver()
+            self.archiver.start()
+        except RuntimeError as _e:
+            # another GUI is archiving, the history is still shown
+            print(_e)
+        except Exception:
+            self.archiver = None
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not start the archiver.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def add_history_widgets(self):
+        """Adds the history span and data selection below the time
+        plot."""
+        self.ui.cmb_history_span = _QComboBox()
+        self.ui.cmb_history_span.addItems(
+            [_name for _name, _ in HISTORY_SPANS])
+        self.ui.cmb_history_data = _QComboBox()
+        self.ui.cmb_history_data.addItems(['Position', 'Position error'])
+        self.ui.cmb_history_data.setEnabled(False)
+        _layout = _QHBoxLayout()
+        _layout.addWidget(_QLabel('History:'))
+        _layout.addWidget(self.ui.cmb_history_span)
+        _layout.addWidget(_QLabel('Data:'))
+        _layout.addWidget(self.ui.cmb_history_data)
+        _layout.addStretch()
+        self.ui.gridLayout_12.addLayout(_layout, 1, 0)
+        self.ui.cmb_history_span.currentIndexChanged.connect(
+            self.update_history)
+        self.ui.cmb_history_data.currentIndexChanged.connect(
+            self.update_history_data)
+
+    def update_history(self, index=None):
+        """Shows the live time plot or the archived history over the
+        selected span.
+
+        Args:
+            index (int): span index (unused, read from the combo box)."""
+        try:
+            _span = HISTORY_SPANS[self.ui.cmb_history_span.currentIndex()][1]
+            if _span is None:
+                if self.history_plot is not None:
+                    self.history_plot.hide()
+                self.ui.PyDMTimePlot.show()
+                self.ui.cmb_history_data.setEnabled(False)
+            else:
+                if self.history_plot is None:
+                    self.add_history_plot()
+                self.ui.PyDMTimePlot.hide()
+                self.history_plot.show()
+                self.ui.cmb_history_data.setEnabled(True)
+                self.history_plot.set_span(_span)
+            self.update_visibility()
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not show the history.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
+
+    def add_history_plot(self):
+        """Creates the history plot and lists the archived channels."""
+        from undulator.data import archive as _archive
+        from undulator.gui import historyplot as _historyplot
+        if self.archiver is not None:
+            _store = self.archiver.archive
+        else:
+            _store = _archive.Archive()
+        self.history_plot = _historyplot.HistoryPlot(_store)
+        self.ui.gridLayout_12.addWidget(self.history_plot, 0, 0)
+        _axis_channels = self.get_history_channels('ActualPosition') + (
+            self.get_history_channels('PositionError'))
+        for _name in _store.channels():
+            if _name not in _axis_channels:
+                self.ui.cmb_history_data.addItem(_name)
+        self.update_history_data()
+
+    def get_history_channels(self, record):
+        """Returns the archived channels of an axis record."""
+        return ['{0:s}Axis{1:s}:{2:s}'.format(_PREFIX, _axis, record)
+                for _axis in _AXIS_NAMES]
+
+    def update_history_data(self, index=None):
+        """Plots the selected history data.
+
+        Args:
+            index (int): data index (unused, read from the combo box)."""
+        if self.history_plot is None:
+            return
+        try:
+            _index = self.ui.cmb_history_data.currentIndex()
+            if _index < 2:
+                _record = ('ActualPosition', 'PositionError')[_index]
+                _label = ('Pos', 'PosErr')[_index]
+                self.history_plot.set_channels(
+                    self.get_history_channels(_record),
+                    ['Axis {0:s} {1:s}'.format(_axis, _label)
+                     for _axis in _AXIS_NAMES],
+                    HISTORY_COLORS)
+            else:
+                _name = self.ui.cmb_history_data.currentText()
+                self.history_plot.set_channels(
+                    [_name], [_name.split(':', 1)[-1]], HISTORY_COLORS[:1])
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+
+    def update_stats(self):
+        """Shows the CA statistics summary, the CPU use of the GUI and the
+        fault capture state in the status bar."""
+        try:
+            self.ui.statusbar.showMessage('{0:s} | CPU {1:.1f}%'.format(
+                _ca_stats.summary(), self.cpu_usage.sample()))
+            if self.fault_capture is not None:
+                _captures = self.fault_capture.captures
+                _text = 'Faults: {0:s}, {1:d} captured'.format(
+                    self.fault_capture.state, len(_captures))
+                self.ui.la_fault.setText(_text)
+                if len(_captures) > 0:
+                    self.ui.la_fault.setToolTip(
+                        'Last: ' + _os.path.basename(_captures[-1]))
+        except Exception:
+            self.stats_timer.stop()
+            _traceback.print_exc(file=_sys.stdout)
+
+    def export_stats(self):
+        """Saves the full CA statistics to a JSON file."""
+        _filename = _QFileDialog.getSaveFileName(
+            self, 'Export CA statistics', 'ca_stats.json',
+            'JSON files (*.json)')[0]
+        if _filename == '':
+            return
+        try:
+            _ca_stats.export(_filename)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            _msg = 'Could not export the CA statistics.'
+            _QMessageBox.warning(self, 'Failure', _msg, _QMessageBox.Ok)
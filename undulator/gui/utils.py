@@ -2,7 +2,13 @@
 
 """Utils."""
 
+import sys as _sys
+import time as _time
 import os.path as _path
+import traceback as _traceback
+
+from undulator.gui import uicache as _uicache
+from undulator.gui.startup import timer as _startup_timer
 
 _basepath = _path.dirname(_path.abspath(__file__))
 
@@ -27,3 +33,36 @@ def getUiFile(widget):
         basename = '{0:s}.ui'.format(widget.__class__.__name__.lower())
     uifile = _path.join(_basepath, _path.join('ui', basename))
     return uifile
+
+
+def loadUi(widget):
+    """Set up the ui of the widget from its compiled ui module, or from the
+    ui file if the cache is disabled or the module cannot be compiled.
+
+    Args:
+        widget (QWidget)
+
+    Returns:
+        the object with the ui child widgets.
+    """
+    _t = _time.perf_counter()
+    uifile = getUiFile(widget)
+    ui_class = None
+    if _uicache.enabled():
+        try:
+            ui_class = _uicache.get_ui_class(uifile)
+        except Exception:
+            _traceback.print_exc(file=_sys.stdout)
+            print('Loading {0:s} without the ui cache.'.format(
+                _path.basename(uifile)))
+
+    if ui_class is not None:
+        ui = ui_class()
+        ui.setupUi(widget)
+    else:
+        import qtpy.uic as _uic
+        ui = _uic.loadUi(uifile, widget)
+
+    _startup_timer.record(
+        'ui ' + widget.__class__.__name__, _time.perf_counter() - _t)
+    return ui
@@ -0,0 +1 @@
+"""Simulated undulator IOC and Heidenhain display for hardware-free tests."""
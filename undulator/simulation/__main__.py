@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""Runs the simulated undulator IOC (and display) on localhost.
+
+Usage:
+    python -m undulator.simulation [--rate 10] [--latency 0] [--display]
+
+Clients must search on localhost, e.g. EPICS_CA_ADDR_LIST=127.0.0.1 and
+EPICS_CA_AUTO_ADDR_LIST=NO.
+"""
+
+import asyncio as _asyncio
+import argparse as _argparse
+
+from undulator.simulation import ioc as _ioc
+from undulator.simulation.display import SimulatedDisplay as _SimDisplay
+
+
+def main(args=None):
+    """Parses the arguments and serves until interrupted."""
+    _parser = _argparse.ArgumentParser(
+        prog='python -m undulator.simulation',
+        description='Simulated undulator IOC for hardware-free testing.')
+    _parser.add_argument('--db', default=_ioc.DEFAULT_DB,
+                         help='EPICS database file')
+    _parser.add_argument('--prefix', default='und', help='IOC macro value')
+    _parser.add_argument('--rate', type=float, default=10,
+                         help='model and monitor update rate in Hz')
+    _parser.add_argument('--latency', type=float, default=0,
+                         help='CA read/write latency in seconds')
+    _parser.add_argument('--display', action='store_true',
+                         help='also simulate the ND-780 display on a pty')
+    _parser.add_argument('--display-latency', type=float, default=0.05,
+                         help='display answer latency in seconds')
+    _args = _parser.parse_args(args)
+
+    _display = None
+    if _args.display:
+        _display = _SimDisplay(latency=_args.display_latency)
+
+        def _hook(simulator):
+            _display.position_source = lambda: simulator.positions()[:3]
+            _display.start()
+            print('Simulated ND-780 display on {0:s}, start the GUI with '
+                  'UNDULATOR_DISPLAY_PORT={0:s} to select it.'.format(
+                      _display.port))
+    else:
+        _hook = None
+
+    try:
+        _asyncio.run(_ioc.serve(_args.db, _args.prefix, _args.rate,
+                                _args.latency, simulator_hook=_hook))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if _display is not None:
+            _display.close()
+
+
+if __name__ == '__main__':
+    main()
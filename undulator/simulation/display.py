@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""Simulated Heidenhain ND-780 display on a pseudo-terminal."""
+
+import os as _os
+import time as _time
+import threading as _threading
+import numpy as _np
+
+
+STX = b'\x02'
+ESC = b'\x1b'
+
+
+class SimulatedDisplay(_threading.Thread):
+    """Thread emulating the serial interface of an ND-780 display.
+
+    A pseudo-terminal is opened and its slave device name (port) can be
+    given to TestsWidget.connect. An output request (Ctrl-B or the
+    'ESC A0200' command) is answered after the configured latency with one
+    'X=', 'Y=' and 'Z=' line per axis. Key commands ('ESC T....') are
+    accepted and ignored.
+    """
+
+    def __init__(self, position_source=None, latency=0.05, noise=1e-5):
+        """Opens the pseudo-terminal.
+
+        Args:
+            position_source (function): returns the (x, y, z) positions in
+                mm; defaults to zeros.
+            latency (float): answer delay in seconds.
+            noise (float): reading noise amplitude in mm."""
+        super().__init__()
+        self.daemon = True
+        self.name = 'SimulatedDisplay'
+
+        self.position_source = position_source
+        self.latency = latency
+        self.noise = noise
+        self.run_flag = True
+        self.requests = 0
+
+        self.master, self.slave = _os.openpty()
+        self.port = _os.ttyname(self.slave)
+
+    def get_positions(self):
+        """Returns the (x, y, z) positions shown by the display."""
+        if self.position_source is None:
+            _pos = _np.zeros(3)
+        else:
+            _pos = _np.asarray(self.position_source(), dtype=float)
+        return _pos + self.noise*_np.random.randn(3)
+
+    def format_output(self):
+        """Returns the display output for the current positions."""
+        _lines = []
+        for _axis, _value in zip('XYZ', self.get_positions()):
+            _lines.append('{0:s}={1:s}{2:12.5f} R\r\n'.format(
+                _axis, '-' if _value < 0 else '+', abs(_value)))
+        return ''.join(_lines).encode('ascii')
+
+    def run(self):
+        _buffer = b''
+        while self.run_flag:
+            try:
+                _buffer += _os.read(self.master, 1024)
+            except OSError:
+                break
+            while len(_buffer) > 0:
+                if _buffer.startswith(STX):
+                    _buffer = _buffer[1:]
+                    self.answer()
+                elif _buffer.startswith(ESC):
+                    _end = _buffer.find(b'\r')
+                    if _end < 0:
+                        break
+                    _command = _buffer[1:_end]
+                    _buffer = _buffer[_end + 1:]
+                    if _command.startswith(b'A'):
+                        self.answer()
+                else:
+                    _buffer = _buffer[1:]
+
+    def answer(self):
+        """Writes the display output after the configured latency."""
+        self.requests += 1
+        _time.sleep(self.latency)
+        _os.write(self.master, self.format_output())
+
+    def close(self):
+        """Stops the thread and closes the pseudo-terminal."""
+        self.run_flag = False
+        for _fd in (self.slave, self.master):
+            try:
+                _os.close(_fd)
+            except OSError:
+                pass
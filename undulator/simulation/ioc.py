@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+"""Simulated undulator soft IOC.
+
+The records of undulator.db are served over Channel Access with caproto,
+and a simple axis model replaces the PLC: moves follow a trapezoidal
+profile at MoveSpeed/MoveAccel, ActualPosition lags the profile with a
+first order following error (PositionError), and current and torque
+follow the acceleration and speed.
+"""
+
+import time as _time
+import asyncio as _asyncio
+import numpy as _np
+
+from caproto import (
+    ChannelDouble as _ChannelDouble,
+    ChannelEnum as _ChannelEnum,
+    )
+from caproto.asyncio.server import start_server as _start_server
+
+from undulator.data.dbparser import (
+    DEFAULT_DB,
+    read_db as _read_db,
+    )
+
+
+AXIS_NAMES = ('A', 'B', 'C', 'D')
+TRAVEL_LIMIT = 12
+
+
+class _LatencyMixin(object):
+    """Delays CA reads and writes to emulate the IOC/PLC latency."""
+
+    latency = 0
+
+    async def read(self, data_type):
+        if self.latency > 0:
+            await _asyncio.sleep(self.latency)
+        return await super().read(data_type)
+
+    async def write_from_dbr(self, *args, **kwargs):
+        if self.latency > 0:
+            await _asyncio.sleep(self.latency)
+        return await super().write_from_dbr(*args, **kwargs)
+
+
+class SimChannelDouble(_LatencyMixin, _ChannelDouble):
+    """Double channel with configurable latency."""
+
+
+class SimChannelEnum(_LatencyMixin, _ChannelEnum):
+    """Enum (bi/bo) channel with configurable latency."""
+
+
+def make_pvdb(records, latency=0):
+    """Creates the caproto channels of the database records.
+
+    Args:
+        records (dict): record name -> Record, from dbparser.
+        latency (float): delay (in seconds) added to reads and writes.
+
+    Returns:
+        a dict PV name -> channel."""
+    _pvdb = {}
+    for _name, _record in records.items():
+        if _record.rtype in ('bi', 'bo'):
+            _enums = [_record.fields.get('ZNAM', '0'),
+                      _record.fields.get('ONAM', '1')]
+            _channel = SimChannelEnum(value=_enums[0], enum_strings=_enums)
+        else:
+            _channel = SimChannelDouble(
+                value=0.0, precision=int(_record.fields.get('PREC', '3')),
+                units=_record.fields.get('EGU', ''))
+        _channel.latency = latency
+        _pvdb[_name] = _channel
+    return _pvdb
+
+
+class AxisModel(object):
+    """Motion model of one undulator axis."""
+
+    __slots__ = ('cmd', 'pos', 'vel', 'acc', 'target', 'moving', 'tau',
+                 'k_current', 'k_torque', 'noise')
+
+    def __init__(self, tau=0.01, noise=1e-6):
+        """Initializes the axis at rest at zero.
+
+        Args:
+            tau (float): following error time constant (in seconds).
+            noise (float): position noise amplitude (in mm)."""
+        self.cmd = 0.0
+        self.pos = 0.0
+        self.vel = 0.0
+        self.acc = 0.0
+        self.target = 0.0
+        self.moving = False
+        self.tau = tau
+        self.k_current = 0.5
+        self.k_torque = 2.0
+        self.noise = noise
+
+    def start(self, target):
+        """Starts a move to the target position."""
+        self.target = float(target)
+        self.moving = True
+
+    def step(self, dt, speed, accel):
+        """Advances the model by dt seconds.
+
+        Args:
+            dt (float): time step in seconds.
+            speed (float): maximum speed in mm/s.
+            accel (float): acceleration in mm/s^2."""
+        _dist = self.target - self.cmd
+        _vel = self.vel
+        if self.moving:
+            # speed allowed to stop at the target with the given accel
+            _v_stop = _np.sqrt(2*accel*abs(_dist))
+            _v_goal = _np.sign(_dist)*min(speed, _v_stop)
+            _dv = _np.clip(_v_goal - _vel, -accel*dt, accel*dt)
+            _vel = _vel + _dv
+            if abs(_dist) <= abs(_vel)*dt or abs(_dist) < 1e-9:
+                self.cmd = self.target
+                _vel = 0.0
+            else:
+                self.cmd += _vel*dt
+        self.acc = (_vel - self.vel)/dt
+        self.vel = _vel
+        # steady state of a first order lag following the profile
+        self.pos = self.cmd - self.tau*self.vel
+        self.pos += self.noise*_np.random.randn()
+        if self.moving and self.cmd == self.target:
+            if abs(self.cmd - self.pos) < 1e-4:
+                self.moving = False
+
+    @property
+    def error(self):
+        """Position error in mm."""
+        return self.cmd - self.pos
+
+    @property
+    def current(self):
+        """Output current in A."""
+        return self.k_current*(abs(self.acc) + 2*abs(self.vel) + 0.2)
+
+    @property
+    def torque(self):
+        """Torque reference in %."""
+        return self.k_torque*(self.acc + 5*self.vel)
+
+
+class UndulatorSimulator(object):
+    """Updates the simulated records from the axis models."""
+
+    def __init__(self, pvdb, prefix='und', rate=10):
+        """Initializes the simulator.
+
+        Args:
+            pvdb (dict): PV name -> caproto channel.
+            prefix (str): PV prefix.
+            rate (float): model and monitor update rate in Hz."""
+        self.pvdb = pvdb
+        self.prefix = prefix
+        self.rate = rate
+        self.axes = {_name: AxisModel() for _name in AXIS_NAMES}
+
+    def pv(self, name):
+        """Returns a channel by its name without prefix."""
+        return self.pvdb[self.prefix + ':' + name]
+
+    def get(self, name):
+        """Returns a channel value; enums return their index."""
+        _channel = self.pv(name)
+        if isinstance(_channel, _ChannelEnum):
+            return _channel.enum_strings.index(_channel.value)
+        return _channel.value
+
+    async def put(self, name, value):
+        """Writes a channel value, posting monitors if it changed."""
+        _channel = self.pv(name)
+        if isinstance(_channel, _ChannelEnum):
+            value = _channel.enum_strings[int(bool(value))]
+        if _channel.value != value:
+            await _channel.write(value)
+
+    async def initialize(self):
+        """Sets the initial values: servo on, brakes off, default speeds."""
+        for _name in AXIS_NAMES:
+            await self.put('Axis{0:s}:DriveEnableStatus'.format(_name), 1)
+            await self.put('Axis{0:s}:BrakeStatus'.format(_name), 1)
+        await self.put('MoveSpeed', 1.0)
+        await self.put('MoveAccel', 5.0)
+        await self.put('RunFlag', 1)
+
+    async def step(self, dt):
+        """Handles the command flags and advances the axis models."""
+        if self.get('EnMove'):
+            for _name, _axis in self.axes.items():
+                _prefix = 'Axis' + _name + ':'
+                if self.get(_prefix + 'Move'):
+                    _axis.start(self.get(_prefix + 'MovePos'))
+            await self.put('EnMove', 0)
+        if self.get('Stop'):
+            for _axis in self.axes.values():
+                _axis.start(_axis.cmd)
+            await self.put('Stop', 0)
+        if self.get('EnServo') or self.get('DisServo'):
+            _on = bool(self.get('EnServo'))
+            for _name in AXIS_NAMES:
+                await self.put(
+                    'Axis{0:s}:DriveEnableStatus'.format(_name), _on)
+            await self.put('EnServo', 0)
+            await self.put('DisServo', 0)
+
+        _speed = self.get('MoveSpeed') or 1.0
+        _accel = self.get('MoveAccel') or 5.0
+        for _i, (_name, _axis) in enumerate(self.axes.items()):
+            _prefix = 'Axis' + _name + ':'
+            if self.get(_prefix + 'DriveEnableStatus'):
+                _axis.step(dt, _speed, _accel)
+            await self.put(_prefix + 'ActualPosition', _axis.pos)
+            await self.put(_prefix + 'ActualVelocity', _axis.vel)
+            await self.put(_prefix + 'PositionError', _axis.error)
+            await self.put(_prefix + 'OutputCurrent', _axis.current)
+            await self.put(_prefix + 'TorqueReference', _axis.torque)
+            await self.put(_prefix + 'MoveStatus', _axis.moving)
+            await self.put('OvertravelN{0:d}'.format(_i + 1),
+                           _axis.pos < -TRAVEL_LIMIT)
+            await self.put('OvertravelP{0:d}'.format(_i + 1),
+                           _axis.pos > TRAVEL_LIMIT)
+
+    def positions(self):
+        """Returns the actual positions of the axes."""
+        return [_axis.pos for _axis in self.axes.values()]
+
+    async def run(self):
+        """Runs the update loop on absolute deadlines."""
+        await self.initialize()
+        _dt = 1/self.rate
+        _next = _time.monotonic()
+        while True:
+            await self.step(_dt)
+            _next += _dt
+            await _asyncio.sleep(max(_next - _time.monotonic(), 0))
+
+
+async def serve(db=DEFAULT_DB, prefix='und', rate=10, latency=0,
+                interfaces=('127.0.0.1',), simulator_hook=None):
+    """Serves the simulated IOC until cancelled.
+
+    Args:
+        db (str): database file name.
+        prefix (str): value of the IOC macro.
+        rate (float): model and monitor update rate in Hz.
+        latency (float): delay (in seconds) added to CA reads and writes.
+        interfaces (tuple): network interfaces to serve on.
+        simulator_hook (function): called with the UndulatorSimulator
+            before the server starts."""
+    _records = _read_db(db, {'IOC': prefix})
+    _pvdb = make_pvdb(_records, latency)
+    _simulator = UndulatorSimulator(_pvdb, prefix, rate)
+    if simulator_hook is not None:
+        simulator_hook(_simulator)
+    await _asyncio.gather(
+        _start_server(_pvdb, interfaces=list(interfaces)),
+        _simulator.run())
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""Command line test runner.
+
+Runs the discrete, continuous and manual tests of the Tests tab without
+the graphical interface, writing the same logs in the working (or the
+given) directory. The moving axis is the one with the Move flag set, as in
+the GUI.
+
+Examples:
+    undulator-test discrete --points=-1,1,0 --wtime 10
+    undulator-test continuous --duration 3600 --rate 50 --port /dev/ttyUSB0
+    undulator-test manual --comments "manual check"
+"""
+
+import os as _os
+import sys as _sys
+import time as _time
+import argparse as _argparse
+
+
+MODES = ('discrete', 'continuous', 'manual')
+POSITION_LIMIT = 11
+
+
+def _float_list(text):
+    return [float(_value) for _value in text.split(',') if _value.strip()]
+
+
+def parse_args(args=None):
+    """Parses the command line arguments."""
+    _parser = _argparse.ArgumentParser(
+        prog='undulator-test',
+        description='Runs undulator axis tests without the GUI.')
+    _parser.add_argument('mode', choices=MODES, help='test mode')
+    _parser.add_argument('--points', type=_float_list, default=[-1, 1, 0],
+                         help='comma separated test positions in mm, e.g. '
+                              '--points=-1,1,0 '
+                              '(discrete mode)')
+    _parser.add_argument('--wtime', type=float, default=10,
+                         help='waiting time at each point in seconds '
+                              '(discrete mode)')
+    _parser.add_argument('--duration', type=float, default=None,
+                         help='test duration in seconds (continuous mode, '
+                              'defaults to running until Ctrl-C)')
+    _parser.add_argument('--rate', type=float, default=50,
+                         help='sampling rate in Hz')
+    _parser.add_argument('--policy', default='skip',
+                         choices=['skip', 'catchup'],
+                         help='late sample policy')
+    _parser.add_argument('--comments', default='', help='test comments')
+    _parser.add_argument('--port', default=None,
+                         help='Heidenhain display serial port')
+    _parser.add_argument('--display-period', type=float, default=0.2,
+                         help='display reading period in seconds')
+    _parser.add_argument('--binary', action='store_true',
+                         help='also saves a binary log')
+    _parser.add_argument('--log-dir', default=None,
+                         help='directory of the logs, defaults to the '
+                              'working directory')
+    _parser.add_argument('--timeout', type=float, default=10,
+                         help='PV connection timeout in seconds')
+    return _parser.parse_args(args)
+
+
+def run_test(thd, mode, duration=None):
+    """Runs a test thread until it finishes, the duration elapses or
+    Ctrl-C is pressed.
+
+    Args:
+        thd (ThdTestAxis): test thread, not started.
+        mode (str): test mode.
+        duration (float): continuous test duration in seconds."""
+    if mode == 'continuous':
+        thd.continuous_flag = True
+    elif mode == 'manual':
+        thd.manual_flag = True
+    thd.start()
+    try:
+        if mode == 'continuous':
+            _t_end = None
+            if duration is not None:
+                _t_end = _time.monotonic() + duration
+            while thd.is_alive() and (
+                    _t_end is None or _time.monotonic() < _t_end):
+                thd.join(0.5)
+        elif mode == 'manual':
+            print('Press Enter to acquire a sample, q and Enter to finish.')
+            for _line in _sys.stdin:
+                if _line.strip().lower() == 'q' or not thd.is_alive():
+                    break
+                thd.acquire_flag = True
+        else:
+            while thd.is_alive():
+                thd.join(0.5)
+    except KeyboardInterrupt:
+        print('Finishing the test...')
+        thd.abort_flag = True
+    finally:
+        thd.continuous_flag = False
+        thd.manual_flag = False
+        thd.join()
+
+
+def main(args=None):
+    """Runs a test with the command line arguments.
+
+    Returns:
+        the exit status."""
+    _args = parse_args(args)
+    if _args.mode == 'discrete':
+        if len(_args.points) == 0:
+            print('Please give the test positions.')
+            return 2
+        if max(abs(_p) for _p in _args.points) > POSITION_LIMIT:
+            print('Positions out of bounds. All the points must be within '
+                  '+/- {0:g} mm.'.format(POSITION_LIMIT))
+            return 2
+    if _args.rate <= 0:
+        print('The sampling rate must be positive.')
+        return 2
+
+    if _args.log_dir is not None:
+        _os.chdir(_args.log_dir)
+
+    # imported here, so --help does not start Channel Access
+    from undulator.devices import pvs as _pvs
+    from undulator.devices import testengine as _testengine
+
+    _thd = _testengine.ThdTestAxis(
+        test_pos=_args.points, comments=_args.comments,
+        mode=MODES.index(_args.mode), wtime=_args.wtime,
+        upd_interval=1/_args.rate, policy=_args.policy)
+    _thd.binary_log = _args.binary
+
+    _not_connected = _pvs.wait_for_connection(_args.timeout)
+    if len(_not_connected) > 0:
+        print('Channels not connected: ' + ', '.join(_not_connected))
+    if _thd.undulator.moving_axis() is None:
+        print('No axis selected: please set the Move flag of the axis.')
+        return 1
+
+    _thd_display = None
+    if _args.port is not None:
+        _thd_display = _testengine.connect_display(
+            _args.port, _args.display_period)
+        if _thd_display is None:
+            print('Could not connect to the Heidenhain display.')
+            return 1
+
+    try:
+        run_test(_thd, _args.mode, _args.duration)
+    finally:
+        if _thd_display is not None:
+            _testengine.disconnect_display(_thd_display)
+
+    if _thd.log_name is not None:
+        print('Log: ' + _os.path.abspath(_thd.log_name))
+        print('Sampling: ' + _thd.get_sampling_summary())
+    return 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())